@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存PCM音频处理
+将字节或NumPy数组形式的音频统一为16kHz单声道16位PCM，供评测直接以raw格式上传，
+不需要在磁盘上生成中间文件。NumPy在函数内导入，只用到格式常量的命令行入口不加载NumPy
+"""
+
+import wave
+
+# 讯飞语音评测要求的音频格式
+TARGET_SAMPLE_RATE = 16000
+TARGET_CHANNELS = 1
+
+# 16kHz单声道16位PCM的码率(bit/s)
+PCM_BITRATE = TARGET_SAMPLE_RATE * 16 * TARGET_CHANNELS
+
+def resample(samples, orig_rate, target_rate=TARGET_SAMPLE_RATE):
+    """
+    基于FFT的重采样，频域截断同时起到抗混叠作用
+
+    Args:
+        samples (np.ndarray): 一维浮点音频
+        orig_rate (int): 原采样率
+        target_rate (int): 目标采样率
+
+    Returns:
+        np.ndarray: 重采样后的浮点音频
+    """
+    import numpy as np
+
+    if orig_rate == target_rate or len(samples) == 0:
+        return samples
+    target_len = int(round(len(samples) * target_rate / float(orig_rate)))
+    spectrum = np.fft.rfft(samples)
+    keep = target_len // 2 + 1
+    if keep <= len(spectrum):
+        spectrum = spectrum[:keep]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(keep - len(spectrum), dtype=spectrum.dtype)])
+    return np.fft.irfft(spectrum, target_len) * (target_len / float(len(samples)))
+
+def to_pcm16_mono(audio, sample_rate=TARGET_SAMPLE_RATE, channels=1):
+    """
+    将内存中的音频转换为16kHz单声道int16数组
+
+    Args:
+        audio: 小端int16交错PCM字节，或NumPy数组(int16/浮点，形状为(n,)或(n, channels))
+        sample_rate (int): 音频采样率
+        channels (int): 声道数(字节输入时使用)
+
+    Returns:
+        np.ndarray: 一维int16数组
+    """
+    import numpy as np
+
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        samples = np.frombuffer(audio, dtype="<i2")
+        if channels > 1:
+            samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    else:
+        samples = np.asarray(audio)
+
+    # 已经符合要求时直接返回，不复制数据
+    if samples.ndim == 1 and samples.dtype == np.int16 and sample_rate == TARGET_SAMPLE_RATE:
+        return samples
+
+    if np.issubdtype(samples.dtype, np.integer):
+        scale = float(np.iinfo(samples.dtype).max) + 1
+        data = samples.astype(np.float64) / scale
+    else:
+        data = samples.astype(np.float64)
+
+    # 多声道取平均值混为单声道
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+
+    data = resample(data, sample_rate)
+    return np.clip(np.round(data * 32768), -32768, 32767).astype(np.int16)
+
+def read_wav(path):
+    """
+    读取WAV文件，保留原始采样率和声道
+
+    Args:
+        path (str): WAV文件路径
+
+    Returns:
+        tuple: (整数样本数组，形状为(n,)或(n, channels), 采样率)
+    """
+    import numpy as np
+
+    with wave.open(path, "rb") as wf:
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+
+    if width == 1:
+        # 8位WAV为无符号整数
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2")
+    elif width == 3:
+        bytes3 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        samples = (bytes3[:, 0].astype(np.int32) << 8 | bytes3[:, 1].astype(np.int32) << 16
+                   | bytes3[:, 2].astype(np.int32) << 24)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4")
+    else:
+        raise ValueError(f"不支持的采样位宽: {width}")
+
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    return samples, rate
+
+def read_wav_pcm(path):
+    """
+    读取WAV文件并转换为16kHz单声道int16数组
+
+    Args:
+        path (str): WAV文件路径
+
+    Returns:
+        np.ndarray: 一维int16数组
+    """
+    samples, rate = read_wav(path)
+    return to_pcm16_mono(samples, rate)
+
+def pcm_bytes(pcm):
+    """
+    返回int16数组的小端字节视图(零拷贝)
+
+    Args:
+        pcm (np.ndarray): 一维int16数组
+
+    Returns:
+        memoryview: 字节视图
+    """
+    import numpy as np
+
+    pcm = np.ascontiguousarray(pcm, dtype="<i2")
+    return memoryview(pcm).cast("B")
@@ -8,11 +8,128 @@
 import os
 import argparse
 import json
-import time
-import pandas as pd
-from test_ise import IseTest, analyze_result
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from test_ise import IseTest, analyze_result, CATEGORY_TYPES
+from pacing import PACING_MODES, DEFAULT_FRAME_SIZE, DEFAULT_FRAME_INTERVAL
+from rate_limit import RateLimiter
+from result_cache import ResultCache
+from results_store import ResultsStore
+from run_journal import RunJournal, job_key, load_journal
+from ise_metrics import MetricsCollector
+from preflight import PREFLIGHT_MODES, SKIPPED_ERROR, preflight_result
+from vad import DEFAULT_PADDING
+from job_manifest import directory_jobs, iter_manifest
+from credential_pool import CredentialPool, PoolExhausted
+from report_writer import ReportWriter
 
-def batch_test(audio_dir, test_type, text, output_dir=None):
+def save_file_result(output_dir, file_name, analyzed, result_xml):
+    """
+    将单个文件的摘要和原始XML保存为文本文件
+    
+    Returns:
+        str: 摘要文件路径
+    """
+    base_name = os.path.splitext(file_name)[0]
+    
+    # 保存解析后的结果
+    summary_path = os.path.join(output_dir, f"{base_name}_summary.txt")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        f.write("=== 评测结果摘要 ===\n")
+        for key, value in analyzed.items():
+            if key != "原始数据":
+                f.write(f"{key}: {value}\n")
+    
+    # 保存原始XML，预检跳过的文件没有XML
+    if result_xml:
+        xml_path = os.path.join(output_dir, f"{base_name}_xml.txt")
+        with open(xml_path, "w", encoding="utf-8") as f:
+            f.write(result_xml)
+    
+    return summary_path
+
+def evaluate_file(audio_file, test_type, text, output_dir, index=0, total=1, ise_kwargs=None,
+                  limiter=None, store=None, run_id=None, metrics=None, name=None, tags=None, pool=None):
+    """
+    测评单个音频文件并保存摘要和原始XML
+    
+    Args:
+        audio_file (str): 音频文件路径
+        test_type (str): 测评类型
+        text (str): 测评文本
+        output_dir (str): 输出目录
+        index (int): 文件序号
+        total (int): 文件总数，流式读取清单时为None
+        ise_kwargs (dict): 传给IseTest的额外参数
+        limiter (RateLimiter): 请求限速器，命中缓存或预检跳过时不占用配额
+        store (ResultsStore): 结果库，指定时结果追加到库中而不是写文本文件
+        run_id (str): 结果库中的批次ID
+        metrics (MetricsCollector): 会话耗时汇总
+        name (str): 结果名称，默认为音频文件名
+        tags (dict): 附加到分析结果中的字段，如清单行号和朗读者
+        pool (CredentialPool): 凭证池，指定时每个会话从池中选择凭证并按凭证限速，不再使用limiter
+    
+    Returns:
+        tuple: (结果名称, 分析结果)，失败时返回None
+    
+    Raises:
+        PoolExhausted: 凭证池中所有凭证的配额均已用尽
+    """
+    progress = f"{index+1}/{total}" if total else f"{index+1}"
+    print(f"\n[{progress}] 测试文件: {audio_file}")
+    file_name = name or os.path.basename(audio_file)
+    
+    try:
+        # 执行测评
+        tester = IseTest(audio_file, test_type, text, **(ise_kwargs or {}))
+        credential = None
+        if not tester.load_cached() and not tester.preflight_failed():
+            if pool is not None:
+                credential = pool.acquire()
+                tester.set_credential(credential)
+            elif limiter is not None:
+                limiter.acquire()
+        try:
+            result_xml = tester.run()
+        finally:
+            if credential is not None:
+                pool.release(credential, tester.metrics.error_code)
+        if metrics is not None:
+            metrics.add(tester.metrics)
+        
+        if result_xml:
+            # 分析结果，预检提示的问题一并记录
+            analyzed = analyze_result(result_xml)
+            report = tester.preflight_report
+            if report is not None and not report.ok:
+                analyzed["预检"] = report.describe()
+        elif tester.preflight_failed():
+            # 预检跳过的文件记录预测的异常
+            analyzed = preflight_result(tester.preflight_report)
+        else:
+            print(f"未能获取 {file_name} 的评测结果")
+            return None
+        if tags:
+            analyzed.update(tags)
+        
+        # 保存结果
+        if store is not None:
+            store.append(run_id, index, file_name, analyzed, result_xml, audio_file, test_type, text)
+            print(f"保存结果: {store.path} ({file_name})")
+        else:
+            summary_path = save_file_result(output_dir, file_name, analyzed, result_xml)
+            print(f"保存结果: {summary_path}")
+        return file_name, analyzed
+    
+    except PoolExhausted:
+        raise
+    except Exception as e:
+        print(f"处理文件 {audio_file} 时出错: {str(e)}")
+        return None
+
+def batch_test(audio_dir, test_type, text, output_dir=None, workers=1, rps=1.0, ise_kwargs=None,
+               cache=None, store=None, export=True, journal_path=None, resume=False, metrics_path=None,
+               pool=None):
     """
     批量测试目录下的所有音频文件
     
@@ -21,6 +138,17 @@ def batch_test(audio_dir, test_type, text, output_dir=None):
         test_type (str): 测评类型
         text (str): 测评文本
         output_dir (str): 输出目录
+        workers (int): 同时进行的评测会话数
+        rps (float): 每秒最多发起的评测请求数，<= 0 表示不限速
+        ise_kwargs (dict): 传给IseTest的额外参数，如host_url
+        cache (ResultCache): 评测结果缓存
+        store (ResultsStore): 结果库，指定时结果逐条追加到库中，不再生成单个文件的
+            摘要/XML文件和all_results.json
+        export (bool): 是否生成comparison.csv/xlsx对比报告
+        journal_path (str): 检查点日志路径，默认为输出目录下的journal.jsonl
+        resume (bool): 续跑模式，跳过日志中已完成的(音频, 文本, 类型)组合
+        metrics_path (str): 会话耗时明细路径，默认为输出目录下的session_metrics.jsonl，
+            同时在旁边写入Prometheus文本格式的session_metrics.prom
     
     Returns:
         dict: 测试结果
@@ -29,73 +157,174 @@ def batch_test(audio_dir, test_type, text, output_dir=None):
     if not output_dir:
         output_dir = os.path.join(os.path.dirname(audio_dir), "results")
     
+    # 查找所有音频文件
+    jobs = directory_jobs(audio_dir, test_type, text)
+    if not jobs:
+        print(f"在 {audio_dir} 中未找到音频文件")
+        return {}
+    
+    print(f"发现 {len(jobs)} 个音频文件")
+    if store is not None:
+        run_id = store.start_run(audio_dir, test_type, text)
+    else:
+        run_id = None
+    return run_jobs(jobs, output_dir, workers, rps, ise_kwargs, cache, store, run_id, export,
+                    journal_path, resume, metrics_path, pool)
+
+def batch_test_manifest(manifest, output_dir=None, workers=1, rps=1.0, ise_kwargs=None, cache=None,
+                        store=None, export=True, journal_path=None, resume=False, metrics_path=None,
+                        default_type="en_sentence", default_text="nice to meet you.", pool=None):
+    """
+    按任务清单批量测试，每个音频使用清单中各自的文本和类型
+    
+    Args:
+        manifest (str): CSV或JSONL任务清单，列为audio/text/type/speaker
+        default_type (str): 清单行中没有类型时使用的测评类型
+        default_text (str): 清单行中没有文本时使用的评测文本
+        其他参数同batch_test
+    
+    Returns:
+        dict: 测试结果，结果名称为"文件名_r行号"，分析结果中附加row/text/test_type/speaker字段
+    """
+    if not output_dir:
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(manifest)), "results")
+    
+    # 清单逐行送入调度，不预先读取全部任务
+    jobs = iter_manifest(manifest, default_type, default_text, CATEGORY_TYPES)
+    run_id = store.start_run(manifest) if store is not None else None
+    return run_jobs(jobs, output_dir, workers, rps, ise_kwargs, cache, store, run_id, export,
+                    journal_path, resume, metrics_path, pool)
+
+def run_jobs(jobs, output_dir, workers=1, rps=1.0, ise_kwargs=None, cache=None, store=None, run_id=None,
+             export=True, journal_path=None, resume=False, metrics_path=None, pool=None):
+    """
+    并发执行评测任务并汇总结果
+    
+    Args:
+        jobs: Job的列表或迭代器，迭代器按需读取
+        output_dir (str): 输出目录
+        run_id (str): 结果库中的批次ID
+        其他参数同batch_test
+    
+    Returns:
+        dict: {结果名称: 分析结果}，按任务顺序排列
+    """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    # 查找所有音频文件
-    audio_files = []
-    for root, _, files in os.walk(audio_dir):
-        for file in files:
-            if file.endswith((".mp3", ".wav")):
-                audio_files.append(os.path.join(root, file))
+    # 并发执行测评，结果按任务顺序汇总，与串行执行保持一致
+    total = len(jobs) if isinstance(jobs, list) else None
+    outcomes = {}
+    limiter = RateLimiter(rps)
+    in_flight = threading.BoundedSemaphore(max(1, workers))
+    ise_kwargs = dict(ise_kwargs or {})
+    if cache is not None:
+        ise_kwargs["cache"] = cache
     
-    if not audio_files:
-        print(f"在 {audio_dir} 中未找到音频文件")
-        return {}
+    # 检查点日志，续跑时读取已完成的任务
+    if not journal_path:
+        journal_path = os.path.join(output_dir, "journal.jsonl")
+    finished = load_journal(journal_path) if resume else {}
+    journal = RunJournal(journal_path, append=resume)
     
-    print(f"发现 {len(audio_files)} 个音频文件")
-    results = {}
+    # 会话分阶段耗时
+    if not metrics_path:
+        metrics_path = os.path.join(output_dir, "session_metrics.jsonl")
+    metrics = MetricsCollector(metrics_path, append=resume)
     
-    # 批量测试每个音频文件
-    for i, audio_file in enumerate(audio_files):
-        print(f"\n[{i+1}/{len(audio_files)}] 测试文件: {audio_file}")
-        
+    # 对比报告的行在结果到达时写入磁盘，结束时再排序输出
+    report = ReportWriter(output_dir) if export else None
+    
+    def run_one(job):
         try:
-            # 执行测评
-            tester = IseTest(audio_file, test_type, text)
-            result_xml = tester.run()
-            
-            if result_xml:
-                # 分析结果
-                analyzed = analyze_result(result_xml)
-                
-                # 保存结果
-                file_name = os.path.basename(audio_file)
-                base_name = os.path.splitext(file_name)[0]
-                
-                # 保存解析后的结果
-                summary_path = os.path.join(output_dir, f"{base_name}_summary.txt")
-                with open(summary_path, "w", encoding="utf-8") as f:
-                    f.write("=== 评测结果摘要 ===\n")
-                    for key, value in analyzed.items():
-                        if key != "原始数据":
-                            f.write(f"{key}: {value}\n")
-                
-                # 保存原始XML
-                xml_path = os.path.join(output_dir, f"{base_name}_xml.txt")
-                with open(xml_path, "w", encoding="utf-8") as f:
-                    f.write(result_xml)
-                
-                # 保存到总结果
-                results[file_name] = analyzed
+            outcome = evaluate_file(job.audio, job.test_type, job.text, output_dir,
+                                    job.index, total, ise_kwargs, limiter,
+                                    store, run_id, metrics, job.name, job.tags(), pool)
+            if outcome:
+                journal.record(job.audio, job.text, job.test_type, outcome[0], outcome[1])
+                if report is not None:
+                    report.add(outcome[0], outcome[1], job.index)
+            outcomes[job.index] = outcome
+        except PoolExhausted:
+            # 未评测的任务不写入检查点，配额恢复后可续跑
+            outcomes[job.index] = None
+        finally:
+            in_flight.release()
+    
+    submitted = 0
+    skipped = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for job in jobs:
+                submitted += 1
+                entry = finished.get(job_key(job.audio, job.text, job.test_type))
+                if entry is not None:
+                    # 已完成的任务直接使用日志中的结果
+                    outcomes[job.index] = (entry["file_name"], entry["result"])
+                    if report is not None:
+                        report.add(entry["file_name"], entry["result"], job.index)
+                    if store is not None:
+                        store.append(run_id, job.index, entry["file_name"], entry["result"],
+                                     audio_path=job.audio, test_type=job.test_type, text=job.text)
+                    skipped += 1
+                    continue
                 
-                print(f"保存结果: {summary_path}")
-            else:
-                print(f"未能获取 {file_name} 的评测结果")
-            
-            # 避免频繁请求
-            time.sleep(1)
-        
-        except Exception as e:
-            print(f"处理文件 {audio_file} 时出错: {str(e)}")
+                # 限制同时进行的会话数，每秒发起的请求数在会话内限制；
+                # 清单任务在有空闲会话时才继续读取
+                in_flight.acquire()
+                if pool is not None and pool.exhausted:
+                    in_flight.release()
+                    submitted -= 1
+                    print("\n凭证池配额已全部用尽，停止提交新的任务，配额恢复后可使用--resume续跑")
+                    break
+                executor.submit(run_one, job)
+    finally:
+        journal.close()
+        metrics.close()
+    
+    if resume:
+        print(f"\n续跑: 跳过 {skipped} 个已完成的任务，本次评测 {submitted - skipped} 个")
     
-    # 保存所有结果到JSON文件
-    json_path = os.path.join(output_dir, "all_results.json")
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    results = {}
+    for index in sorted(outcomes):
+        outcome = outcomes[index]
+        if outcome:
+            file_name, analyzed = outcome
+            results[file_name] = analyzed
+    
+    if store is not None:
+        store.flush()
+        print(f"\n结果已写入结果库: {store.path} (批次 {run_id})")
+    else:
+        # 保存所有结果到JSON文件
+        json_path = os.path.join(output_dir, "all_results.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
     
     # 生成对比报告
-    generate_comparison(results, output_dir)
+    if report is not None:
+        report.finish()
+    
+    # 汇总会话耗时
+    preflight = ise_kwargs.get("preflight", "off")
+    if preflight == "skip":
+        saved = metrics.count("preflight")
+        flagged = sum(1 for analyzed in results.values()
+                      if "预检" in analyzed and analyzed.get("error") != SKIPPED_ERROR)
+        print(f"\n预检: 跳过 {saved} 个预计评测失败的文件，节省 {saved} 次评测调用；"
+              f"{flagged} 个文件预计可能失败，仍然评测并已在结果中标记")
+    elif preflight == "flag":
+        flagged = sum(1 for analyzed in results.values() if "预检" in analyzed)
+        print(f"\n预检: {flagged} 个文件预计评测失败，已在结果中标记")
+    metrics.print_summary()
+    if pool is not None:
+        pool.print_summary()
+    prom_path = os.path.splitext(metrics_path)[0] + ".prom"
+    metrics.write_prometheus(prom_path)
+    print(f"会话耗时明细: {metrics_path}，Prometheus指标: {prom_path}")
+    
+    if cache is not None:
+        cache.print_stats()
     
     return results
 
@@ -104,88 +333,115 @@ def generate_comparison(results, output_dir):
     生成评测结果对比报告
     
     Args:
-        results (dict): 所有评测结果
+        results (dict): 所有评测结果，也可以是按顺序产生(结果名称, 分析结果)的迭代器
         output_dir (str): 输出目录
     """
-    if not results:
-        print("无结果可对比")
-        return
-    
-    # 提取所有维度
-    all_dimensions = set()
-    for result in results.values():
-        all_dimensions.update(result.keys())
-    
-    # 排除非分数字段
-    excluded_fields = {"error", "原始数据", "评测状态", "异常情况", "time_len", "content", "beg_pos", "end_pos", "word_count"}
-    dimensions = [d for d in all_dimensions if d not in excluded_fields]
-    
-    # 从各个结果中提取分数
-    comparison_data = []
-    for file_name, result in results.items():
-        row = {"音频文件": file_name}
-        for dim in dimensions:
-            if dim in result:
-                try:
-                    row[dim] = float(result[dim])
-                except (ValueError, TypeError):
-                    row[dim] = result[dim]
-            else:
-                row[dim] = None
-        comparison_data.append(row)
-    
-    # 转换为DataFrame
-    if comparison_data:
-        df = pd.DataFrame(comparison_data)
-        
-        # 排序
-        df = df.sort_values(by="总分", ascending=False)
-        
-        # 保存为CSV
-        csv_path = os.path.join(output_dir, "comparison.csv")
-        df.to_csv(csv_path, index=False, encoding="utf-8-sig")
-        
-        # 保存为Excel
-        excel_path = os.path.join(output_dir, "comparison.xlsx")
-        df.to_excel(excel_path, index=False)
-        
-        print(f"对比报告已保存到: {csv_path} 和 {excel_path}")
-        
-        # 打印简单摘要
-        print("\n=== 评测结果对比 ===")
-        print(df[["音频文件", "总分"]].to_string(index=False))
-        
-        # 分析是否能区分不同speaker
-        if len(df) > 1:
-            score_range = df["总分"].max() - df["总分"].min()
-            if score_range > 10:
-                print("\n系统能够明显区分不同的朗读者，分数差异较大")
-            elif 5 < score_range <= 10:
-                print("\n系统可以区分不同的朗读者，但分数差异不大")
-            else:
-                print("\n系统对不同朗读者的区分度较低")
+    items = results.items() if isinstance(results, dict) else results
+    writer = ReportWriter(output_dir)
+    for file_name, analyzed in items:
+        writer.add(file_name, analyzed)
+    writer.finish()
 
-def main():
+def main(argv=None):
     """
     主函数
+    
+    Args:
+        argv (list): 命令行参数，None时使用sys.argv
     """
     parser = argparse.ArgumentParser(description="讯飞语音评测批量测试工具")
-    parser.add_argument("--dir", type=str, required=True, help="音频文件目录")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", type=str, help="音频文件目录")
+    source.add_argument("--manifest", type=str,
+                        help="任务清单(CSV或JSONL，列为audio/text/type/speaker)，每个音频使用各自的文本和类型")
     parser.add_argument("--type", type=str, default="en_sentence", 
                         choices=["en_word", "en_sentence", "en_chapter", "cn_word", "cn_sentence", "cn_chapter"],
-                        help="测评类型")
-    parser.add_argument("--text", type=str, default="nice to meet you.", help="测评文本")
+                        help="测评类型(清单模式下为行中缺省时的类型)")
+    parser.add_argument("--text", type=str, default="nice to meet you.", help="测评文本(清单模式下为行中缺省时的文本)")
     parser.add_argument("--output", type=str, help="输出目录")
+    parser.add_argument("--workers", type=int,
+                        help="同时进行的评测会话数(默认为1，使用凭证池时为各凭证并发上限之和)")
+    parser.add_argument("--rps", type=float, default=1.0, help="每秒最多发起的评测请求数(<=0不限速，使用凭证池时按凭证限速)")
+    parser.add_argument("--credentials", type=str,
+                        help="凭证池配置(JSON)，会话分配到负载最低的凭证，每个凭证有各自的并发、速率和每日配额")
+    parser.add_argument("--quota-db", type=str, help="凭证每日配额计数数据库(默认为凭证配置旁的.quota.db)")
+    parser.add_argument("--host-url", type=str, help="评测服务地址(可指向本地模拟服务)")
+    parser.add_argument("--pacing", type=str, default="fixed", choices=PACING_MODES,
+                        help="音频帧发送节奏: fixed固定间隔, realtime按音频码率实时发送, fast不等待")
+    parser.add_argument("--frame-size", type=int, default=DEFAULT_FRAME_SIZE, help="每帧音频字节数")
+    parser.add_argument("--frame-interval", type=float, default=DEFAULT_FRAME_INTERVAL,
+                        help="fixed模式下每帧发送间隔(秒)")
+    parser.add_argument("--prefetch-frames", type=int, default=0,
+                        help="后台线程预先编码的音频帧数，0表示不预取")
+    parser.add_argument("--preflight", type=str, default="off", choices=PREFLIGHT_MODES,
+                        help="本地音频质量预检: off不预检, flag在结果中标记, skip跳过预计失败的文件")
+    parser.add_argument("--trim-silence", action="store_true", help="上传前在内存中裁剪首尾静音")
+    parser.add_argument("--trim-padding", type=float, default=DEFAULT_PADDING,
+                        help="裁剪静音时在语音前后保留的秒数")
+    parser.add_argument("--store", type=str, help="结果库路径，结果逐条追加到库中，替代单个文件的摘要/XML输出")
+    parser.add_argument("--no-export", action="store_true", help="不生成comparison.csv/xlsx对比报告")
+    parser.add_argument("--journal", type=str, help="检查点日志路径(默认为输出目录下的journal.jsonl)")
+    parser.add_argument("--resume", action="store_true", help="续跑，跳过检查点日志中已完成的文件")
+    parser.add_argument("--metrics", type=str,
+                        help="会话耗时明细路径(默认为输出目录下的session_metrics.jsonl，同名.prom为Prometheus指标)")
+    parser.add_argument("--cache", type=str, help="结果缓存数据库路径，相同音频和参数直接返回缓存结果")
+    parser.add_argument("--cache-max-mb", type=float, default=512, help="结果缓存容量上限(MB)")
+    parser.add_argument("--cache-max-age", type=float, help="缓存结果最长保留天数")
+    parser.add_argument("--pcm-cache", type=str, help="解码PCM缓存目录，预检、裁剪和WAV上传共用解码结果")
+    parser.add_argument("--pcm-cache-max-mb", type=float, default=2048, help="解码PCM缓存容量上限(MB)")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
-    # 检查目录是否存在
-    if not os.path.exists(args.dir):
-        print(f"错误: 目录 {args.dir} 不存在")
+    # 检查目录或清单是否存在
+    source = args.dir or args.manifest
+    if not os.path.exists(source):
+        print(f"错误: {'目录' if args.dir else '清单'} {source} 不存在")
         return
     
     # 执行批量测试
-    batch_test(args.dir, args.type, args.text, args.output)
+    ise_kwargs = {
+        "host_url": args.host_url,
+        "pacing": args.pacing,
+        "frame_size": args.frame_size,
+        "frame_interval": args.frame_interval,
+        "prefetch_frames": args.prefetch_frames,
+        "preflight": args.preflight,
+        "trim_padding": args.trim_padding if args.trim_silence else None,
+    }
+    cache = None
+    if args.cache:
+        max_age = args.cache_max_age * 86400 if args.cache_max_age else None
+        cache = ResultCache(args.cache, int(args.cache_max_mb * 1024 * 1024), max_age)
+    
+    pcm_cache = None
+    if args.pcm_cache:
+        from pcm_cache import PcmCache
+
+        pcm_cache = PcmCache(args.pcm_cache, int(args.pcm_cache_max_mb * 1024 * 1024))
+        ise_kwargs["pcm_cache"] = pcm_cache
+    
+    store = ResultsStore(args.store) if args.store else None
+    
+    pool = CredentialPool.from_file(args.credentials, args.quota_db) if args.credentials else None
+    workers = args.workers or (pool.capacity if pool is not None else 1)
+    
+    if args.manifest:
+        batch_test_manifest(args.manifest, args.output, workers, args.rps, ise_kwargs, cache, store,
+                            not args.no_export, args.journal, args.resume, args.metrics, args.type, args.text,
+                            pool)
+    else:
+        batch_test(args.dir, args.type, args.text, args.output, workers, args.rps, ise_kwargs, cache,
+                   store, not args.no_export, args.journal, args.resume, args.metrics, pool)
+    
+    if pool is not None:
+        pool.close()
+    if cache is not None:
+        cache.close()
+    if pcm_cache is not None:
+        pcm_cache.print_stats()
+        pcm_cache.close()
+    if store is not None:
+        store.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频帧编码微基准
+对比逐帧构建字典+json.dumps的原始写法与预编译外壳的FrameEncoder的每秒帧数
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ise_frames import iter_frames, prefetch, FrameEncoder
+from pacing import DEFAULT_FRAME_SIZE
+
+def legacy_encode_frames(audio_data, frame_size):
+    """
+    原IseTest.on_open中的编码方式
+    """
+    frames = [audio_data[i:i+frame_size] for i in range(0, len(audio_data), frame_size)]
+    for i, frame in enumerate(frames):
+        if i == 0:
+            aus, data = 1, {"status": 1, "data": str(base64.b64encode(frame).decode()),
+                            "data_type": 1, "encoding": "raw"}
+        elif i == len(frames) - 1:
+            aus, data = 4, {"status": 2, "data": str(base64.b64encode(frame).decode())}
+        else:
+            aus, data = 2, {"status": 1, "data": str(base64.b64encode(frame).decode()),
+                            "data_type": 1, "encoding": "raw"}
+        yield json.dumps({"business": {"cmd": "auw", "aus": aus, "aue": "lame"}, "data": data}).encode("utf-8")
+
+def encoder_frames(audio_data, frame_size, depth=0):
+    encoder = FrameEncoder("lame")
+    for message, _, _ in prefetch(encoder.encode_frames(iter_frames(audio_data, frame_size)), depth):
+        yield message
+
+def measure(func, repeat):
+    """
+    多次运行取最快一次，返回(帧数, 耗时)
+    """
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in func())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="音频帧编码微基准")
+    parser.add_argument("--size-mb", type=float, default=8, help="测试音频大小(MB)")
+    parser.add_argument("--frame-size", type=int, default=DEFAULT_FRAME_SIZE, help="每帧字节数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数")
+    parser.add_argument("--prefetch", type=int, default=8, help="后台预编码队列长度")
+
+    args = parser.parse_args()
+
+    audio_data = os.urandom(int(args.size_mb * 1024 * 1024))
+
+    # 先确认两种编码方式的输出等价
+    legacy = list(legacy_encode_frames(audio_data[:args.frame_size * 3], args.frame_size))
+    fast = list(encoder_frames(audio_data[:args.frame_size * 3], args.frame_size))
+    assert [json.loads(m) for m in legacy] == [json.loads(m) for m in fast], "编码结果不一致"
+
+    cases = [
+        ("原始写法(dict+json.dumps)", lambda: legacy_encode_frames(audio_data, args.frame_size)),
+        ("FrameEncoder", lambda: encoder_frames(audio_data, args.frame_size)),
+        (f"FrameEncoder+预取{args.prefetch}", lambda: encoder_frames(audio_data, args.frame_size, args.prefetch)),
+    ]
+
+    print(f"音频大小: {args.size_mb} MB, 帧大小: {args.frame_size} 字节")
+    baseline = None
+    for name, func in cases:
+        count, elapsed = measure(func, args.repeat)
+        rate = count / elapsed
+        baseline = baseline or rate
+        print(f"{name:<28}{rate:>12.0f} 帧/秒  {rate / baseline:>6.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令行启动耗时基准
+在子进程中多次运行 ise_cli.py <子命令> --help，取中位数减去空解释器的启动时间，
+与各子命令的预算比较；同时用 -X importtime 检查不应加载的重量级依赖，超出预算或加载了依赖时返回非零退出码
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT, "ise_cli.py")
+
+# 重量级依赖，只应在真正需要时导入
+HEAVY = ("pandas", "websocket", "pyaudio", "pydub", "openpyxl")
+
+# 子命令: (参数, 预算毫秒(不含解释器启动), 不应导入的模块)
+CASES = {
+    "help": (["--help"], 60, HEAVY + ("numpy",)),
+    "evaluate": (["evaluate", "--help"], 150, HEAVY + ("numpy",)),
+    "batch": (["batch", "--help"], 200, HEAVY + ("numpy",)),
+    "record": (["record", "--help"], 150, HEAVY + ("numpy",)),
+    "convert": (["convert", "--help"], 150, HEAVY + ("numpy",)),
+    "process": (["process", "--help"], 150, HEAVY + ("numpy",)),
+    "queue": (["queue", "--db", ":memory:", "worker", "--help"], 200, HEAVY + ("numpy",)),
+}
+
+def run_once(args, importtime=False):
+    """
+    运行一次子进程
+
+    Returns:
+        tuple: (耗时秒数, 标准错误输出)
+    """
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + args
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} 退出码 {completed.returncode}: {completed.stderr[-500:]}")
+    return elapsed, completed.stderr
+
+def median_time(args, repeat):
+    return statistics.median(run_once(args)[0] for _ in range(repeat))
+
+def imported_modules(args):
+    """
+    通过 -X importtime 的输出获取导入的顶层模块
+    """
+    _, stderr = run_once(args, importtime=True)
+    modules = set()
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            modules.add(name.split(".")[0])
+    return modules
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="命令行启动耗时基准")
+    parser.add_argument("--only", type=str, help="只运行指定的子命令，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=7, help="每个子命令的运行次数")
+    parser.add_argument("--scale", type=float, default=1.0, help="预算倍数，较慢的机器上可放宽")
+
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(CASES)
+    for name in names:
+        if name not in CASES:
+            parser.error(f"未知的子命令: {name}")
+
+    interpreter = median_time(["-c", "pass"], args.repeat)
+    print(f"解释器启动: {interpreter * 1000:.1f} ms (以下耗时已扣除)\n")
+    print(f"{'子命令':<10}{'耗时ms':>10}{'预算ms':>10}  结果")
+
+    failed = 0
+    for name in names:
+        cli_args, budget, forbidden = CASES[name]
+        cost = (median_time([CLI] + cli_args, args.repeat) - interpreter) * 1000
+        budget *= args.scale
+        loaded = sorted(set(forbidden) & imported_modules([CLI] + cli_args))
+        problems = []
+        if cost > budget:
+            problems.append("超出预算")
+        if loaded:
+            problems.append("加载了 " + ", ".join(loaded))
+        failed += bool(problems)
+        print(f"{name:<12}{cost:>10.1f}{budget:>10.0f}  {'; '.join(problems) or 'OK'}")
+
+    if failed:
+        print(f"\n{failed} 个子命令未达标")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测结果XML解析基准
+对比原ET.fromstring实现与基于iterparse的ise_xml解析器的耗时和峰值内存
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import make_result_xml
+from ise_xml import parse_result
+from test_ise import analyze_result
+
+def legacy_analyze(xml_str):
+    """
+    原analyze_result中的ET.fromstring解析部分
+    """
+    root = ET.fromstring(xml_str)
+    result = {"总分": root.get("total_score")}
+    for child in root:
+        if child.tag in ("read_sentence", "read_chapter", "read_word"):
+            result.update(child.attrib)
+    return result
+
+def legacy_full_tree(xml_str):
+    """
+    用ET.fromstring遍历所有层级并转换分数
+    """
+    root = ET.fromstring(xml_str)
+    rows = []
+    for elem in root.iter():
+        rows.append({k: float(v) if k.endswith("score") else v for k, v in elem.attrib.items()})
+    return rows
+
+def measure(func, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="评测结果XML解析基准")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数")
+    parser.add_argument("--chapter-sentences", type=int, default=200, help="篇章XML的句子数")
+
+    args = parser.parse_args()
+
+    fixtures = [
+        ("句子", make_result_xml(1, 4)),
+        ("篇章", make_result_xml(args.chapter_sentences, 12, "read_chapter")),
+    ]
+    cases = [
+        ("ET.fromstring 顶层属性", legacy_analyze),
+        ("analyze_result(ise_xml)", analyze_result),
+        ("ET.fromstring 全部层级", legacy_full_tree),
+        ("parse_result 全部层级", parse_result),
+    ]
+
+    for label, xml_str in fixtures:
+        print(f"\n{label}XML: {len(xml_str) / 1024:.1f} KB")
+        for name, func in cases:
+            elapsed, peak = measure(func, xml_str, args.repeat)
+            print(f"  {name:<26}{elapsed * 1000:>10.3f} ms{peak / 1024:>12.1f} KB峰值")
+
+if __name__ == "__main__":
+    main()
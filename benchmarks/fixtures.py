@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试使用的合成数据
+"""
+
+import math
+import random
+import struct
+import wave
+
+WORDS = ["nice", "to", "meet", "you", "the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog"]
+
+def make_result_xml(sentences=1, words_per_sentence=4, category="read_sentence", seed=0):
+    """
+    生成与讯飞评测结果结构一致的XML，包含句子/单词/音节/音素各层级
+
+    Args:
+        sentences (int): 句子数
+        words_per_sentence (int): 每句单词数
+        category (str): 评测类别
+        seed (int): 随机数种子
+
+    Returns:
+        str: XML字符串
+    """
+    rng = random.Random(seed)
+    score = lambda: "%.6f" % rng.uniform(40, 100)
+    parts = []
+    pos = 0
+    total_words = sentences * words_per_sentence
+    for s in range(sentences):
+        words = [rng.choice(WORDS) for _ in range(words_per_sentence)]
+        sentence_beg = pos
+        word_parts = []
+        for w, word in enumerate(words):
+            word_beg = pos
+            syll_parts = []
+            for syll in range(2):
+                phones = "".join(
+                    f'<phone beg_pos="{pos + p * 5}" content="{word[p % len(word)]}" dp_message="0" '
+                    f'end_pos="{pos + p * 5 + 5}" gwpp="{score()}"/>'
+                    for p in range(3))
+                syll_parts.append(
+                    f'<syll beg_pos="{pos}" content="{word}" end_pos="{pos + 15}" serr_msg="0" '
+                    f'syll_accent="0" syll_score="{score()}">{phones}</syll>')
+                pos += 15
+            word_parts.append(
+                f'<word beg_pos="{word_beg}" content="{word}" dp_message="0" end_pos="{pos}" '
+                f'global_index="{s * words_per_sentence + w}" index="{w}" total_score="{score()}">'
+                f'{"".join(syll_parts)}</word>')
+        parts.append(
+            f'<sentence beg_pos="{sentence_beg}" content="{" ".join(words)}" end_pos="{pos}" '
+            f'index="{s}" total_score="{score()}" word_count="{words_per_sentence}">'
+            f'{"".join(word_parts)}</sentence>')
+    summary = (f'accuracy_score="{score()}" beg_pos="0" content="" end_pos="{pos}" except_info="0" '
+               f'fluency_score="{score()}" integrity_score="{score()}" is_rejected="false" '
+               f'standard_score="{score()}" total_score="{score()}" word_count="{total_words}"')
+    return ('<?xml version="1.0" ?>\n<xml_result>'
+            f'<{category} lan="en" type="study" version="7,0,0,1024"><rec_paper>'
+            f'<read_chapter {summary}>{"".join(parts)}</read_chapter>'
+            f'</rec_paper></{category}></xml_result>')
+
+def make_analyzed_results(count, speakers=None, seed=0):
+    """
+    生成与analyze_result输出格式一致的批量结果，用于对比报告相关的基准
+
+    Args:
+        count (int): 结果数
+        speakers (int): 朗读者数，默认每10条结果一个朗读者
+        seed (int): 随机数种子
+
+    Returns:
+        dict: {文件名: 分析结果}
+    """
+    rng = random.Random(seed)
+    speakers = speakers or max(1, count // 10)
+    results = {}
+    for i in range(count):
+        speaker = i % speakers
+        base = 55 + speaker % 40
+        score = lambda: "%.6f" % min(100.0, max(0.0, rng.gauss(base, 5)))
+        results[f"speaker{speaker}_take{i}.mp3"] = {
+            "总分": score(),
+            "content": "nice to meet you.",
+            "beg_pos": "0",
+            "end_pos": str(rng.randint(150, 400)),
+            "word_count": "4",
+            "准确度": score(),
+            "流畅度": score(),
+            "完整度": score(),
+            "标准度": score(),
+            "评测状态": "正常",
+        }
+    return results
+
+def write_wav(path, seconds=5.0, sample_rate=44100, channels=2, seed=0):
+    """
+    写入带噪声的正弦波WAV文件
+
+    Args:
+        path (str): 输出路径
+        seconds (float): 时长
+        sample_rate (int): 采样率
+        channels (int): 声道数
+        seed (int): 随机数种子
+
+    Returns:
+        str: 输出路径
+    """
+    rng = random.Random(seed)
+    frames = bytearray()
+    for n in range(int(seconds * sample_rate)):
+        value = 8000 * math.sin(2 * math.pi * 220 * n / sample_rate) + rng.uniform(-500, 500)
+        frames += struct.pack("<h", int(value)) * channels
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(bytes(frames))
+    return path
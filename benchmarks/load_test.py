@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测客户端压测工具
+启动本地模拟评测服务，在不同并发度下运行test_ise.IseTest和batch_test.batch_test，
+统计每秒会话数和p50/p95/p99延迟
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_ise_server import MockConfig, MockIseServer
+from test_ise import IseTest
+from pacing import PACING_MODES, DEFAULT_FRAME_SIZE
+import batch_test
+
+def percentile(sorted_values, p):
+    """
+    计算已排序数据的百分位数(线性插值)
+    """
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+def summarize(name, concurrency, latencies, elapsed, failures):
+    """
+    汇总一轮压测结果
+    """
+    latencies = sorted(latencies)
+    return {
+        "target": name,
+        "concurrency": concurrency,
+        "sessions": len(latencies),
+        "failures": failures,
+        "elapsed": elapsed,
+        "sessions_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+def run_ise_sessions(url, audio_file, test_type, text, sessions, concurrency, ise_kwargs=None):
+    """
+    并发运行多个IseTest会话，记录客户端端到端延迟
+    """
+    def one_session(_):
+        start = time.perf_counter()
+        result = IseTest(audio_file, test_type, text, host_url=url, **(ise_kwargs or {})).run()
+        return time.perf_counter() - start, bool(result)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(one_session, range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in outcomes if ok]
+    failures = sum(1 for _, ok in outcomes if not ok)
+    return summarize("IseTest", concurrency, latencies, elapsed, failures)
+
+def run_batch(server, audio_file, test_type, text, sessions, concurrency, ise_kwargs=None):
+    """
+    用batch_test批量评测临时目录中的音频副本，延迟取自模拟服务端的会话时长
+    """
+    work_dir = tempfile.mkdtemp(prefix="ise_load_")
+    try:
+        audio_dir = os.path.join(work_dir, "audio")
+        os.makedirs(audio_dir)
+        ext = os.path.splitext(audio_file)[1] or ".mp3"
+        for i in range(sessions):
+            shutil.copyfile(audio_file, os.path.join(audio_dir, f"sample{i:05d}{ext}"))
+
+        server.reset_stats()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = batch_test.batch_test(audio_dir, test_type, text,
+                                            os.path.join(work_dir, "results"),
+                                            workers=concurrency, rps=0,
+                                            ise_kwargs=dict(ise_kwargs or {}, host_url=server.url))
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return summarize("batch_test", concurrency, list(server.durations), elapsed,
+                     sessions - len(results))
+
+def print_report(rows):
+    """
+    打印压测结果表格
+    """
+    print("\n=== 压测结果 ===")
+    print(f"{'目标':<12}{'并发':>6}{'会话':>8}{'失败':>6}{'会话/秒':>10}"
+          f"{'p50(s)':>10}{'p95(s)':>10}{'p99(s)':>10}")
+    for row in rows:
+        print(f"{row['target']:<12}{row['concurrency']:>6}{row['sessions']:>8}{row['failures']:>6}"
+              f"{row['sessions_per_sec']:>10.2f}{row['p50']:>10.3f}{row['p95']:>10.3f}{row['p99']:>10.3f}")
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="评测客户端压测工具")
+    parser.add_argument("--audio", type=str,
+                        default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                             "ise_python3", "1.mp3"),
+                        help="压测使用的音频文件")
+    parser.add_argument("--type", type=str, default="en_sentence", help="测评类型")
+    parser.add_argument("--text", type=str, default="nice to meet you.", help="测评文本")
+    parser.add_argument("--sessions", type=int, default=20, help="每轮会话数")
+    parser.add_argument("--concurrency", type=str, default="1,4,16", help="并发度列表，逗号分隔")
+    parser.add_argument("--target", type=str, default="all", choices=["all", "ise", "batch"],
+                        help="压测对象")
+    parser.add_argument("--delay", type=float, default=0.1, help="模拟服务评分处理时间(秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="处理时间随机抖动(秒)")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--pacing", type=str, default="fixed", choices=PACING_MODES, help="音频帧发送节奏")
+    parser.add_argument("--frame-size", type=int, default=DEFAULT_FRAME_SIZE, help="每帧音频字节数")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.audio):
+        print(f"错误: 音频文件 {args.audio} 不存在")
+        return
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    ise_kwargs = {"pacing": args.pacing, "frame_size": args.frame_size}
+    server = MockIseServer(config=MockConfig(delay=args.delay, jitter=args.jitter, seed=args.seed))
+    url = server.start()
+    print(f"模拟评测服务: {url}")
+
+    rows = []
+    try:
+        for level in levels:
+            if args.target in ("all", "ise"):
+                print(f"压测 IseTest, 并发 {level} ...")
+                rows.append(run_ise_sessions(url, args.audio, args.type, args.text,
+                                             args.sessions, level, ise_kwargs))
+            if args.target in ("all", "batch"):
+                print(f"压测 batch_test, 并发 {level} ...")
+                rows.append(run_batch(server, args.audio, args.type, args.text,
+                                      args.sessions, level, ise_kwargs))
+    finally:
+        server.stop()
+
+    print(f"节奏模式: {args.pacing}, 帧大小: {args.frame_size}")
+    print_report(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+客户端热点路径微基准套件
+覆盖URL签名、音频帧切分与编码、analyze_result、generate_comparison和convert_to_mp3，
+全部使用生成的数据离线运行；结果可保存为基准线，之后用--compare对比并标出性能回退
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import make_result_xml, make_analyzed_results, write_wav
+
+# 默认基准线文件
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+class Skip(Exception):
+    """
+    当前环境无法运行该基准(如缺少ffmpeg)
+    """
+
+def bench_generate_url():
+    from test_ise import generate_url
+
+    def run():
+        generate_url("bench_secret", "bench_key", "ws://127.0.0.1:8765/v2/open-ise")
+    return run, 200
+
+def bench_encode_frames():
+    from ise_frames import iter_frames, FrameEncoder, AUS_LAST
+    from pacing import DEFAULT_FRAME_SIZE
+
+    # 约60秒40kbps的MP3
+    audio_data = os.urandom(300 * 1024)
+    encoder = FrameEncoder("lame")
+
+    def run():
+        for _, _, aus in encoder.encode_frames(iter_frames(audio_data, DEFAULT_FRAME_SIZE)):
+            if aus == AUS_LAST:
+                break
+    return run, 5
+
+def _bench_analyze(sentences, words):
+    def factory():
+        from test_ise import analyze_result
+
+        xml_str = make_result_xml(sentences, words, "read_sentence" if sentences == 1 else "read_chapter")
+
+        def run():
+            analyze_result(xml_str)
+        return run, 20 if sentences == 1 else 2
+    return factory
+
+def _bench_comparison(count):
+    def factory():
+        from batch_test import generate_comparison
+
+        results = make_analyzed_results(count)
+        output_dir = tempfile.mkdtemp(prefix="ise_bench_")
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_comparison(results, output_dir)
+        run.cleanup = lambda: shutil.rmtree(output_dir, ignore_errors=True)
+        return run, 1
+    return factory
+
+def bench_convert_to_mp3():
+    if not (shutil.which("ffmpeg") or shutil.which("avconv")):
+        raise Skip("未找到ffmpeg")
+    try:
+        from collect_audio import convert_to_mp3
+    except ImportError as e:
+        raise Skip(f"无法导入collect_audio: {e}")
+
+    work_dir = tempfile.mkdtemp(prefix="ise_bench_")
+    wav_file = write_wav(os.path.join(work_dir, "fixture.wav"), seconds=5.0)
+    mp3_file = os.path.join(work_dir, "fixture.mp3")
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_to_mp3(wav_file, mp3_file)
+    run.cleanup = lambda: shutil.rmtree(work_dir, ignore_errors=True)
+    return run, 1
+
+# 基准名: 构造函数，构造函数返回(被测函数, 每轮调用次数)
+BENCHMARKS = {
+    "generate_url": bench_generate_url,
+    "encode_frames_300k": bench_encode_frames,
+    "analyze_result_sentence": _bench_analyze(1, 8),
+    "analyze_result_chapter": _bench_analyze(40, 15),
+    "generate_comparison_1k": _bench_comparison(1000),
+    "generate_comparison_10k": _bench_comparison(10000),
+    "generate_comparison_100k": _bench_comparison(100000),
+    "convert_to_mp3": bench_convert_to_mp3,
+}
+
+def measure(func, number, repeat):
+    """
+    运行repeat轮，每轮调用number次
+
+    Returns:
+        dict: 单次调用的最快/中位耗时(秒)
+    """
+    func()  # 预热
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return {"best": min(samples), "median": statistics.median(samples), "number": number, "repeat": repeat}
+
+def run_benchmarks(names, repeat):
+    """
+    运行指定的基准
+
+    Returns:
+        dict: {基准名: 测量结果}，跳过的基准不包含在内
+    """
+    results = {}
+    for name in names:
+        try:
+            func, number = BENCHMARKS[name]()
+        except Skip as e:
+            print(f"{name:<28}跳过: {e}")
+            continue
+        try:
+            # 耗时长的基准减少重复次数
+            rounds = repeat if number > 1 else max(1, min(repeat, 3))
+            results[name] = measure(func, number, rounds)
+        finally:
+            cleanup = getattr(func, "cleanup", None)
+            if cleanup:
+                cleanup()
+        print(f"{name:<28}{results[name]['best'] * 1000:>12.3f} ms  (中位 {results[name]['median'] * 1000:.3f} ms)")
+    return results
+
+# 环境中不影响耗时、不参与对比的字段
+ENVIRONMENT_IGNORED = ("created_at",)
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def environment_diff(stored, current):
+    """
+    对比基准线环境与当前环境，只比较双方都记录了的字段
+
+    Returns:
+        list: (字段, 基准线的值, 当前的值)
+    """
+    return [(key, stored[key], current[key]) for key in sorted(stored)
+            if key in current and key not in ENVIRONMENT_IGNORED and stored[key] != current[key]]
+
+def compare(results, baseline, threshold):
+    """
+    与基准线对比，单次耗时超过基准线(1 + threshold)倍视为回退
+
+    Returns:
+        list: 回退的基准名
+    """
+    regressions = []
+    print(f"\n{'基准':<26}{'基准线(ms)':>12}{'本次(ms)':>12}{'比值':>8}")
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<28}{'-':>12}{current['best'] * 1000:>12.3f}{'新增':>8}")
+            continue
+        ratio = current["best"] / reference["best"] if reference["best"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  回退"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            flag = "  提升"
+        print(f"{name:<28}{reference['best'] * 1000:>12.3f}{current['best'] * 1000:>12.3f}{ratio:>8.2f}{flag}")
+    return regressions
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="客户端热点路径微基准套件")
+    parser.add_argument("--only", type=str, action="append", help="只运行名称包含该字符串的基准，可重复指定")
+    parser.add_argument("--repeat", type=int, default=5, help="每个基准的测量轮数")
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH, help="基准线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基准线")
+    parser.add_argument("--compare", action="store_true", help="与基准线对比，有回退时以非零状态退出")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定回退的相对变慢比例")
+    parser.add_argument("--ignore-environment", action="store_true",
+                        help="基准线环境与当前环境不同时仍然对比(默认拒绝对比)")
+    parser.add_argument("--list", action="store_true", help="列出所有基准")
+
+    args = parser.parse_args()
+
+    if args.list:
+        for name in BENCHMARKS:
+            print(name)
+        return 0
+
+    names = [name for name in BENCHMARKS if not args.only or any(part in name for part in args.only)]
+    if not names:
+        print("没有匹配的基准")
+        return 1
+
+    baseline = None
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"错误: 基准线 {args.baseline} 不存在，请先使用--save-baseline")
+            return 1
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"基准线环境: {baseline.get('environment', {})}")
+        diff = environment_diff(baseline.get("environment", {}), environment())
+        if diff:
+            print("警告: 基准线记录于不同的环境，耗时不可直接比较:")
+            for key, stored, current in diff:
+                print(f"  {key}: 基准线 {stored}, 当前 {current}")
+            if not args.ignore_environment:
+                print("请先在本机使用--save-baseline重新生成基准线，或使用--ignore-environment强制对比")
+                return 2
+
+    results = run_benchmarks(names, args.repeat)
+
+    if args.save_baseline:
+        stored = {"environment": environment(), "results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            # 只保留同一环境下记录的其他基准
+            if not environment_diff(previous.get("environment", {}), stored["environment"]):
+                stored["results"] = previous.get("results", {})
+        stored["results"].update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(stored, f, ensure_ascii=False, indent=2)
+        print(f"\n基准线已保存到: {args.baseline}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline.get("results", {}), args.threshold)
+        if regressions:
+            print(f"\n性能回退: {', '.join(regressions)}")
+            return 1
+        print("\n未发现性能回退")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
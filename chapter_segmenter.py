@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长篇章音频的分段并行评测
+按停顿切分篇章音频并与参考文本的句子对齐，各段作为独立的评测会话并发评测，
+再将各段结果XML合并为一个篇章级结果，beg_pos/end_pos换算为整段音频中的位置
+"""
+
+import argparse
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_pcm import TARGET_SAMPLE_RATE, read_wav_pcm, to_pcm16_mono
+from rate_limit import RateLimiter
+from vad import frame_db, speech_bounds, to_float_mono, SPEECH_MARGIN_DB, MIN_SPEECH_DB
+
+# beg_pos/end_pos的单位为10ms，16kHz下为160个样本
+POS_SAMPLES = TARGET_SAMPLE_RATE // 100
+
+# 可作为切分点的最短停顿(秒)
+DEFAULT_MIN_PAUSE = 0.25
+
+# 篇章类型对应的分段评测类型，单句的段按句子评测，多句的段仍按篇章评测
+SEGMENT_TYPES = {
+    "en_chapter": ("en_sentence", "en_chapter"),
+    "cn_chapter": ("cn_sentence", "cn_chapter"),
+}
+
+# 合并时按加权平均计算的分数字段
+SCORE_ATTRS = ("total_score", "accuracy_score", "fluency_score", "integrity_score",
+               "standard_score", "phone_score", "tone_score")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;。！？；])\s*")
+
+def split_sentences(text):
+    """
+    按句末标点切分参考文本
+
+    Returns:
+        list: 句子列表
+    """
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+def _text_length(sentence):
+    # 英文按单词计，中文按字计
+    words = sentence.split()
+    return len(words) if len(words) > 1 else len(sentence)
+
+def find_pauses(pcm, sample_rate=TARGET_SAMPLE_RATE, min_pause=DEFAULT_MIN_PAUSE):
+    """
+    找出音频中的停顿
+
+    Args:
+        pcm (np.ndarray): 单声道音频
+        sample_rate (int): 采样率
+        min_pause (float): 最短停顿时长(秒)
+
+    Returns:
+        list: [(停顿中点样本位置, 停顿时长秒)]，不含首尾的静音
+    """
+    levels, frame_len = frame_db(to_float_mono(pcm), sample_rate)
+    if not len(levels):
+        return []
+    threshold = max(np.percentile(levels, 10) + SPEECH_MARGIN_DB, MIN_SPEECH_DB)
+    silent = np.r_[False, levels <= threshold, False]
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+
+    pauses = []
+    min_frames = int(np.ceil(min_pause * sample_rate / frame_len))
+    for start, end in zip(starts, ends):
+        if start == 0 or end == len(levels) or end - start < min_frames:
+            continue
+        pauses.append(((start + end) * frame_len // 2, (end - start) * frame_len / float(sample_rate)))
+    return pauses
+
+def _align(costs):
+    """
+    将较短的序列(行)单调地一一匹配到较长序列(列)，使总代价最小
+
+    Returns:
+        list: [(行, 列)]
+    """
+    rows, cols = costs.shape
+    dp = np.full((rows + 1, cols + 1), np.inf)
+    dp[0, :] = 0.0
+    for i in range(1, rows + 1):
+        for j in range(i, cols + 1):
+            dp[i, j] = min(dp[i, j - 1], dp[i - 1, j - 1] + costs[i - 1, j - 1])
+
+    pairs = []
+    i, j = rows, cols
+    while i > 0:
+        if dp[i, j] == dp[i, j - 1] and j > i:
+            j -= 1
+        else:
+            pairs.append((i - 1, j - 1))
+            i -= 1
+            j -= 1
+    return pairs[::-1]
+
+class ChapterSegment(object):
+    """
+    一个分段
+
+    Attributes:
+        index (int): 段序号
+        start (int): 起始样本
+        end (int): 结束样本
+        sentences (list): 该段对应的句子
+        xml (str): 评测结果XML
+        error (dict): 评测失败时的错误信息
+    """
+
+    def __init__(self, index, start, end, sentences):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.sentences = sentences
+        self.xml = None
+        self.error = None
+
+    @property
+    def text(self):
+        return " ".join(self.sentences)
+
+    @property
+    def duration(self):
+        return (self.end - self.start) / float(TARGET_SAMPLE_RATE)
+
+    def __repr__(self):
+        return f"ChapterSegment({self.index}, {self.start / float(TARGET_SAMPLE_RATE):.2f}s-" \
+               f"{self.end / float(TARGET_SAMPLE_RATE):.2f}s, {self.text!r})"
+
+def segment_chapter(pcm, text, min_pause=DEFAULT_MIN_PAUSE):
+    """
+    按停顿切分音频并与参考文本的句子对齐
+
+    切分点取停顿的中点。停顿多于句子间隔时，按各句文本长度估计每个句子边界的时间，
+    选出与之最接近且较长的停顿；停顿少于句子间隔时，相邻句子合并到同一段
+
+    Args:
+        pcm (np.ndarray): 16kHz单声道int16音频
+        text (str): 参考文本
+        min_pause (float): 可作为切分点的最短停顿(秒)
+
+    Returns:
+        list: ChapterSegment列表，覆盖整段音频
+    """
+    sentences = split_sentences(text)
+    pauses = find_pauses(pcm, TARGET_SAMPLE_RATE, min_pause)
+    if len(sentences) < 2 or not pauses:
+        return [ChapterSegment(0, 0, len(pcm), sentences or [text])]
+
+    # 按文本长度估计句子边界在语音区间中的位置
+    bounds = speech_bounds(pcm, TARGET_SAMPLE_RATE, padding=0.0) or (0, len(pcm))
+    lengths = np.array([_text_length(s) for s in sentences], dtype=np.float64)
+    expected = bounds[0] + (bounds[1] - bounds[0]) * np.cumsum(lengths)[:-1] / lengths.sum()
+
+    # 距离按语音区间长度归一化，停顿越长代价越小
+    positions = np.array([p for p, _ in pauses], dtype=np.float64)
+    lengths_s = np.array([d for _, d in pauses])
+    span = float(max(1, bounds[1] - bounds[0]))
+    costs = np.abs(expected[:, None] - positions[None, :]) / span - 0.1 * np.minimum(lengths_s, 1.0)[None, :]
+
+    if len(pauses) >= len(expected):
+        pairs = _align(costs)
+        cuts = [(int(positions[p]), b + 1) for b, p in pairs]
+    else:
+        pairs = _align(costs.T)
+        cuts = [(int(positions[p]), b + 1) for p, b in pairs]
+
+    segments = []
+    start, first = 0, 0
+    for cut, sentence_end in cuts:
+        segments.append(ChapterSegment(len(segments), start, cut, sentences[first:sentence_end]))
+        start, first = cut, sentence_end
+    segments.append(ChapterSegment(len(segments), start, len(pcm), sentences[first:]))
+    return segments
+
+def _paper_node(root):
+    rec_paper = root.find(".//rec_paper")
+    if rec_paper is None or not len(rec_paper):
+        return None
+    return rec_paper[0]
+
+def _rebase(elem, offset):
+    for node in elem.iter():
+        for attr in ("beg_pos", "end_pos"):
+            value = node.get(attr)
+            if value is not None and value.lstrip("-").isdigit():
+                node.set(attr, str(int(value) + offset))
+
+def merge_results(segments, text, category="read_chapter", lan="en"):
+    """
+    合并各段的评测结果XML
+
+    Args:
+        segments (list): 已评测的ChapterSegment
+        text (str): 完整参考文本
+        category (str): 合并后的评测类别
+        lan (str): 语言
+
+    Returns:
+        str: 与讯飞篇章评测结果结构一致的XML
+    """
+    sentences = []
+    weights = []
+    summaries = []
+    version = "7,0,0,1024"
+    for segment in segments:
+        root = ET.fromstring(segment.xml)
+        top = root[0] if len(root) else None
+        if top is not None and top.get("version"):
+            version = top.get("version")
+        paper = _paper_node(root)
+        if paper is None:
+            continue
+        offset = segment.start // POS_SAMPLES
+        _rebase(paper, offset)
+        summaries.append(paper.attrib)
+        weight = paper.get("word_count")
+        weights.append(float(weight) if weight and weight.isdigit() and int(weight) > 0
+                       else max(1, len(segment.text.split())))
+        children = [child for child in paper if child.tag == "sentence"]
+        if not children:
+            # 没有句子层级时用整段的评分作为一个句子
+            children = [ET.Element("sentence", dict(paper.attrib))]
+        for child in children:
+            child.tail = None
+        sentences.extend(children)
+
+    # 重新编号句子和单词
+    global_index = 0
+    for index, sentence in enumerate(sentences):
+        sentence.set("index", str(index))
+        for word in sentence.iter("word"):
+            if word.get("global_index") is not None:
+                word.set("global_index", str(global_index))
+            global_index += 1
+
+    # 整体评分按各段词数加权平均
+    summary = {"content": text}
+    total_weight = sum(weights)
+    for attr in SCORE_ATTRS:
+        values = [(float(s[attr]), w) for s, w in zip(summaries, weights) if s.get(attr) not in (None, "")]
+        if values:
+            summary[attr] = "%.6f" % (sum(v * w for v, w in values) / sum(w for _, w in values))
+    if summaries:
+        summary["beg_pos"] = summaries[0].get("beg_pos", "0")
+        summary["end_pos"] = summaries[-1].get("end_pos", "0")
+        except_info = [s.get("except_info") for s in summaries if s.get("except_info") not in (None, "", "0")]
+        summary["except_info"] = except_info[0] if except_info else "0"
+        summary["is_rejected"] = "true" if any(s.get("is_rejected") == "true" for s in summaries) else "false"
+        summary["word_count"] = str(int(total_weight))
+
+    root = ET.Element("xml_result")
+    top = ET.SubElement(root, category, {"lan": lan, "type": "study", "version": version})
+    rec_paper = ET.SubElement(top, "rec_paper")
+    paper = ET.SubElement(rec_paper, category, summary)
+    paper.extend(sentences)
+    return '<?xml version="1.0" ?>\n' + ET.tostring(root, encoding="unicode")
+
+def evaluate_chapter(audio, text, test_type="en_chapter", workers=4, sample_rate=TARGET_SAMPLE_RATE,
+                     channels=1, rps=0, min_pause=DEFAULT_MIN_PAUSE, ise_kwargs=None):
+    """
+    分段并行评测篇章音频
+
+    Args:
+        audio: 音频文件路径，或内存中的PCM字节/NumPy数组
+        text (str): 参考文本
+        test_type (str): 篇章评测类型，en_chapter或cn_chapter
+        workers (int): 同时进行的分段评测会话数
+        sample_rate (int): 内存音频的采样率
+        channels (int): 内存音频的声道数(字节输入时使用)
+        rps (float): 每秒最多发起的评测请求数，<= 0 表示不限速
+        min_pause (float): 可作为切分点的最短停顿(秒)
+        ise_kwargs (dict): 传给IseTest的其他参数，其中的pcm_cache也用于解码整段音频
+
+    Returns:
+        tuple: (合并后的XML，有分段失败时为None, ChapterSegment列表)
+    """
+    from test_ise import IseTest
+
+    if test_type not in SEGMENT_TYPES:
+        raise ValueError(f"分段评测只支持篇章类型: {test_type}")
+
+    pcm_cache = (ise_kwargs or {}).get("pcm_cache")
+    if isinstance(audio, str) and pcm_cache is not None:
+        # 各段是缓存文件内存映射的切片，上传时不复制
+        pcm = pcm_cache.load(audio)
+    elif isinstance(audio, str):
+        if audio.lower().endswith(".wav"):
+            pcm = read_wav_pcm(audio)
+        else:
+            from preflight import decode_audio
+
+            samples, rate, _ = decode_audio(audio)
+            pcm = to_pcm16_mono(samples, rate)
+    else:
+        pcm = to_pcm16_mono(audio, sample_rate, channels)
+
+    segments = segment_chapter(pcm, text, min_pause)
+    sentence_type, chapter_type = SEGMENT_TYPES[test_type]
+    limiter = RateLimiter(rps)
+    print(f"篇章音频切分为 {len(segments)} 段，并发数 {workers}")
+
+    def run_segment(segment):
+        limiter.acquire()
+        segment_type = sentence_type if len(segment.sentences) == 1 else chapter_type
+        tester = IseTest.from_pcm(pcm[segment.start:segment.end], TARGET_SAMPLE_RATE, 1, segment_type,
+                                  segment.text, **(ise_kwargs or {}))
+        segment.xml = tester.run()
+        if not segment.xml:
+            segment.error = tester.error or {"message": "未获取到有效结果"}
+        return segment
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(run_segment, segments))
+    print(f"分段评测耗时: {time.perf_counter() - start_time:.3f}秒")
+
+    failed = [segment for segment in segments if segment.error]
+    if failed:
+        for segment in failed:
+            print(f"第 {segment.index + 1} 段评测失败: {segment.error}")
+        return None, segments
+    lan = "cn" if test_type.startswith("cn") else "en"
+    return merge_results(segments, text, "read_chapter", lan), segments
+
+def main():
+    """
+    主函数
+    """
+    from pacing import PACING_MODES
+
+    parser = argparse.ArgumentParser(description="长篇章音频分段并行评测")
+    parser.add_argument("--audio", type=str, required=True, help="音频文件路径")
+    parser.add_argument("--type", type=str, default="en_chapter", choices=list(SEGMENT_TYPES), help="测评类型")
+    parser.add_argument("--text", type=str, required=True, help="参考文本")
+    parser.add_argument("--text-file", action="store_true", help="--text为文本文件路径")
+    parser.add_argument("--workers", type=int, default=4, help="同时进行的分段评测会话数")
+    parser.add_argument("--rps", type=float, default=0, help="每秒最多发起的评测请求数(<=0不限速)")
+    parser.add_argument("--min-pause", type=float, default=DEFAULT_MIN_PAUSE, help="可作为切分点的最短停顿(秒)")
+    parser.add_argument("--host-url", type=str, help="评测服务地址(可指向本地模拟服务)")
+    parser.add_argument("--pacing", type=str, default="fixed", choices=PACING_MODES, help="音频帧发送节奏")
+    parser.add_argument("--output", type=str, help="合并后XML的输出路径")
+    parser.add_argument("--pcm-cache", type=str, help="解码PCM缓存目录")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.audio):
+        print(f"错误: 音频文件 {args.audio} 不存在")
+        return
+
+    text = args.text
+    if args.text_file:
+        with open(args.text, "r", encoding="utf-8") as f:
+            text = f.read()
+
+    pcm_cache = None
+    if args.pcm_cache:
+        from pcm_cache import PcmCache
+
+        pcm_cache = PcmCache(args.pcm_cache)
+    xml, segments = evaluate_chapter(args.audio, text, args.type, args.workers, rps=args.rps,
+                                     min_pause=args.min_pause,
+                                     ise_kwargs={"host_url": args.host_url, "pacing": args.pacing,
+                                                 "pcm_cache": pcm_cache})
+    if pcm_cache is not None:
+        pcm_cache.close()
+    for segment in segments:
+        print(segment)
+    if not xml:
+        print("未获取到完整的评测结果")
+        return
+
+    output = args.output or f"result_{os.path.splitext(os.path.basename(args.audio))[0]}_{args.type}_xml.txt"
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(xml)
+    print(f"合并后的XML结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
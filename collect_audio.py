@@ -7,15 +7,22 @@
 
 import os
 import argparse
-import pyaudio
 import wave
 import time
-import pydub
-from pydub import AudioSegment
 import threading
-import tempfile
+import hashlib
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def record_audio(output_file, duration=5, sample_rate=16000, channels=1, format_type=pyaudio.paInt16):
+# 目录处理清单文件名
+MANIFEST_NAME = ".process_manifest.json"
+
+# 处理过程中保存清单的间隔，中断后已完成的文件不必重新处理
+MANIFEST_SAVE_FILES = 50
+MANIFEST_SAVE_SECONDS = 10.0
+
+def record_audio(output_file, duration=5, sample_rate=16000, channels=1, format_type=None):
     """
     录制音频
     
@@ -24,8 +31,13 @@ def record_audio(output_file, duration=5, sample_rate=16000, channels=1, format_
         duration (int): 录制时长(秒)
         sample_rate (int): 采样率
         channels (int): 声道数
-        format_type: 音频格式类型
+        format_type: 音频格式类型，默认为pyaudio.paInt16
     """
+    # 只在录音时导入，没有PortAudio时其他命令仍可使用
+    import pyaudio
+    
+    if format_type is None:
+        format_type = pyaudio.paInt16
     chunk = 1024  # 每个缓冲区的帧数
     
     # 初始化PyAudio
@@ -93,6 +105,37 @@ def record_audio(output_file, duration=5, sample_rate=16000, channels=1, format_
     print(f"录音已保存到: {output_file}")
     return output_file
 
+def record_live(output_file, duration=5, test_type="en_sentence", text=None, host_url=None):
+    """
+    录音的同时进行评测，录音数据边录边上传
+    
+    Args:
+        output_file (str): 录音保存路径
+        duration (int): 录制时长(秒)
+        test_type (str): 测评类型
+        text (str): 测评文本
+        host_url (str): 评测服务地址
+    
+    Returns:
+        str: 录音文件路径
+    """
+    from live_eval import MicrophoneSource, live_evaluate
+    from test_ise import analyze_result
+    
+    source = MicrophoneSource(duration, keep=True)
+    print(f"开始录音并评测，持续 {duration} 秒...")
+    result, _ = live_evaluate(source, test_type, text, {"host_url": host_url})
+    source.save_wav(output_file)
+    
+    if result:
+        print("\n=== 评测结果摘要 ===")
+        for key, value in analyze_result(result).items():
+            if key != "原始数据":
+                print(f"{key}: {value}")
+    else:
+        print("未获取到评测结果")
+    return output_file
+
 def convert_to_mp3(wav_file, output_file=None, bitrate="40k"):
     """
     将WAV文件转换为MP3
@@ -105,6 +148,8 @@ def convert_to_mp3(wav_file, output_file=None, bitrate="40k"):
     Returns:
         str: MP3文件路径
     """
+    from pydub import AudioSegment
+    
     if not output_file:
         output_file = os.path.splitext(wav_file)[0] + ".mp3"
     
@@ -125,14 +170,77 @@ def convert_to_mp3(wav_file, output_file=None, bitrate="40k"):
     print(f"已转换为MP3: {output_file}")
     return output_file
 
-def process_directory(input_dir, output_dir=None, convert=True):
+def file_sha256(path):
+    """
+    计算文件内容的SHA-256
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(manifest_path):
+    """
+    读取处理清单，不存在或损坏时返回空清单
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"警告: 清单文件 {manifest_path} 无法读取，将重新处理所有文件")
+        return {}
+
+def save_manifest(manifest, manifest_path):
+    """
+    原子地写入处理清单
+    """
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def _process_file(wav_file, output_file, params, sha256=None):
+    """
+    转换或复制单个文件，在子进程中执行
+    
+    Returns:
+        dict: 处理结果
+    """
+    start = time.time()
+    try:
+        if sha256 is None:
+            sha256 = file_sha256(wav_file)
+        if params["convert"]:
+            convert_to_mp3(wav_file, output_file, params["bitrate"])
+        else:
+            shutil.copy2(wav_file, output_file)
+            print(f"已复制: {output_file}")
+        return {"input": wav_file, "output": output_file, "sha256": sha256,
+                "ok": True, "seconds": time.time() - start}
+    except Exception as e:
+        return {"input": wav_file, "output": output_file, "sha256": sha256,
+                "ok": False, "error": str(e), "seconds": time.time() - start}
+
+def process_directory(input_dir, output_dir=None, convert=True, jobs=1, bitrate="40k", force=False):
     """
     处理目录中的所有WAV文件，转换为MP3
     
+    输出文件按输入目录中的相对路径存放，不同子目录中的同名文件不会互相覆盖；
+    处理结果记录在输出目录的清单文件中，输入文件和输出参数未变化时跳过
+    
     Args:
         input_dir (str): 输入目录
         output_dir (str): 输出目录
         convert (bool): 是否转换为MP3
+        jobs (int): 并行处理的进程数
+        bitrate (str): MP3比特率
+        force (bool): 忽略清单，重新处理所有文件
+    
+    Returns:
+        dict: 本次处理的统计信息
     """
     if not os.path.exists(input_dir):
         print(f"错误: 目录 {input_dir} 不存在")
@@ -157,26 +265,99 @@ def process_directory(input_dir, output_dir=None, convert=True):
     
     print(f"找到 {len(wav_files)} 个WAV文件")
     
-    # 处理每个文件
-    for i, wav_file in enumerate(wav_files):
-        print(f"\n[{i+1}/{len(wav_files)}] 处理: {wav_file}")
-        file_name = os.path.basename(wav_file)
-        base_name = os.path.splitext(file_name)[0]
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {} if force else load_manifest(manifest_path)
+    params = {"convert": convert, "bitrate": bitrate if convert else None,
+              "sample_rate": 16000 if convert else None, "channels": 1 if convert else None}
+    
+    # 对比清单，筛选需要处理的文件
+    pending = []
+    skipped = 0
+    for wav_file in wav_files:
+        relative = os.path.relpath(wav_file, input_dir)
+        output_file = os.path.join(output_dir, os.path.splitext(relative)[0] + ".mp3" if convert else relative)
         
-        if convert:
-            # 转换为MP3
-            output_file = os.path.join(output_dir, base_name + ".mp3")
-            convert_to_mp3(wav_file, output_file)
-        else:
-            # 仅复制
-            import shutil
-            output_file = os.path.join(output_dir, file_name)
-            shutil.copy2(wav_file, output_file)
-            print(f"已复制: {output_file}")
+        key = os.path.abspath(wav_file)
+        stat = os.stat(wav_file)
+        entry = manifest.get(key)
+        sha256 = None
+        if entry and entry.get("params") == params and entry.get("output") == output_file \
+                and os.path.exists(output_file) and entry.get("size") == stat.st_size:
+            if entry.get("mtime") == stat.st_mtime:
+                skipped += 1
+                continue
+            # 修改时间变化时按内容哈希判断是否真的改变
+            sha256 = file_sha256(wav_file)
+            if sha256 == entry.get("sha256"):
+                entry["mtime"] = stat.st_mtime
+                skipped += 1
+                continue
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        pending.append((wav_file, output_file, stat, sha256))
+    
+    if skipped:
+        print(f"跳过 {skipped} 个未变化的文件")
+    
+    # 多进程并行处理
+    converted = 0
+    failed = 0
+    input_bytes = 0
+    start = time.time()
+    unsaved = 0
+    saved_at = start
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, jobs)) as executor:
+            futures = {
+                executor.submit(_process_file, wav_file, output_file, params, sha256): stat
+                for wav_file, output_file, stat, sha256 in pending
+            }
+            for i, future in enumerate(as_completed(futures)):
+                stat = futures[future]
+                outcome = future.result()
+                print(f"[{i+1}/{len(pending)}] 处理: {outcome['input']}")
+                if outcome["ok"]:
+                    converted += 1
+                    input_bytes += stat.st_size
+                    manifest[os.path.abspath(outcome["input"])] = {
+                        "size": stat.st_size,
+                        "mtime": stat.st_mtime,
+                        "sha256": outcome["sha256"],
+                        "params": params,
+                        "output": outcome["output"],
+                    }
+                    unsaved += 1
+                else:
+                    failed += 1
+                    print(f"处理文件 {outcome['input']} 时出错: {outcome['error']}")
+                # 定期保存清单，中断或崩溃时已完成的文件不会被重新处理
+                if unsaved >= MANIFEST_SAVE_FILES or (unsaved and time.time() - saved_at >= MANIFEST_SAVE_SECONDS):
+                    save_manifest(manifest, manifest_path)
+                    unsaved = 0
+                    saved_at = time.time()
+    finally:
+        save_manifest(manifest, manifest_path)
+    elapsed = time.time() - start
+    
+    summary = {
+        "converted": converted,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": elapsed,
+        "files_per_sec": converted / elapsed if elapsed > 0 else 0.0,
+        "mb_per_sec": input_bytes / 1024 / 1024 / elapsed if elapsed > 0 else 0.0,
+    }
+    print("\n=== 处理摘要 ===")
+    print(f"处理: {converted}, 跳过: {skipped}, 失败: {failed}, 进程数: {max(1, jobs)}")
+    print(f"耗时: {elapsed:.2f}秒, 吞吐量: {summary['files_per_sec']:.2f} 文件/秒, "
+          f"{summary['mb_per_sec']:.2f} MB/秒")
+    return summary
 
-def main():
+def main(argv=None):
     """
     主函数
+    
+    Args:
+        argv (list): 命令行参数，None时使用sys.argv
     """
     parser = argparse.ArgumentParser(description="音频收集与处理工具")
     subparsers = parser.add_subparsers(dest="command", help="命令")
@@ -187,6 +368,16 @@ def main():
     record_parser.add_argument("--duration", type=int, default=5, help="录制时长(秒)")
     record_parser.add_argument("--sample-rate", type=int, default=16000, help="采样率")
     record_parser.add_argument("--convert", action="store_true", help="转换为MP3")
+    record_parser.add_argument("--live", action="store_true", help="录音的同时上传评测，停止录音后很快得到评分")
+    record_parser.add_argument("--type", type=str, default="en_sentence", help="边录边评测时的测评类型")
+    record_parser.add_argument("--text", type=str, default="nice to meet you.", help="边录边评测时的测评文本")
+    record_parser.add_argument("--host-url", type=str, help="评测服务地址(可指向本地模拟服务)")
+    record_parser.add_argument("--until-stop", action="store_true",
+                               help="不限时长，按回车结束，录音逐块写入磁盘，内存占用不随时长增长")
+    record_parser.add_argument("--silence-timeout", type=float, help="持续这么多秒没有语音时结束录音")
+    record_parser.add_argument("--split", action="store_true",
+                               help="在停顿处切分为每句一个文件(输出名_001.wav等)")
+    record_parser.add_argument("--min-pause", type=float, default=0.8, help="切分的最短停顿(秒)")
     
     # 转换命令
     convert_parser = subparsers.add_parser("convert", help="转换音频格式")
@@ -198,8 +389,14 @@ def main():
     process_parser.add_argument("--input", type=str, required=True, help="输入目录")
     process_parser.add_argument("--output", type=str, help="输出目录")
     process_parser.add_argument("--no-convert", action="store_true", help="不转换为MP3")
+    process_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="并行处理的进程数")
+    process_parser.add_argument("--bitrate", type=str, default="40k", help="MP3比特率")
+    process_parser.add_argument("--force", action="store_true", help="忽略清单，重新处理所有文件")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    
+    if args.command == "record" and args.live and (args.until_stop or args.split or args.silence_timeout):
+        parser.error("--live不能与--until-stop、--split或--silence-timeout同时使用")
     
     if args.command == "record":
         # 设置默认输出文件
@@ -207,12 +404,23 @@ def main():
             timestamp = time.strftime("%Y%m%d_%H%M%S")
             args.output = f"recording_{timestamp}.wav"
         
-        # 录制音频
-        wav_file = record_audio(args.output, args.duration, args.sample_rate)
+        if args.until_stop or args.split or args.silence_timeout:
+            # 长时间录音，逐块写入磁盘，可按回车或静音超时结束
+            from recorder import record_long
+            
+            wav_files = record_long(args.output, None if args.until_stop else args.duration, args.split,
+                                    args.min_pause, silence_timeout=args.silence_timeout)
+        elif args.live:
+            # 边录边评测，录音固定为16kHz单声道，同时保存为WAV
+            wav_files = [record_live(args.output, args.duration, args.type, args.text, args.host_url)]
+        else:
+            # 录制音频
+            wav_files = [record_audio(args.output, args.duration, args.sample_rate)]
         
         # 转换为MP3
         if args.convert:
-            convert_to_mp3(wav_file)
+            for wav_file in wav_files:
+                convert_to_mp3(wav_file)
     
     elif args.command == "convert":
         if not os.path.exists(args.input):
@@ -222,7 +430,7 @@ def main():
         convert_to_mp3(args.input, args.output)
     
     elif args.command == "process":
-        process_directory(args.input, args.output, not args.no_convert)
+        process_directory(args.input, args.output, not args.no_convert, args.jobs, args.bitrate, args.force)
     
     else:
         parser.print_help()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多应用凭证池
+配置多组APPID/API Key/API Secret，每组有各自的并发上限、令牌桶速率和每日调用配额，
+配额计数保存在SQLite中，跨进程、跨运行累计；批量评测时每个会话选择当前负载最低的凭证，
+配额用尽或服务端返回授权不足的凭证自动退出轮换
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from rate_limit import RateLimiter
+
+# 表示应用授权或配额不足的错误码，返回后当天不再使用该凭证
+QUOTA_ERROR_CODES = (11200, 11201)
+
+class PoolExhausted(Exception):
+    """
+    所有凭证的配额均已用尽
+    """
+
+class Credential(object):
+    """
+    一组应用凭证及其限制
+
+    Args:
+        appid (str): APPID
+        api_key (str): API Key
+        api_secret (str): API Secret
+        concurrency (int): 同时进行的会话数上限
+        rps (float): 每秒最多发起的会话数，<= 0 表示不限速
+        daily_quota (int): 每日调用次数上限，None表示不限
+    """
+
+    def __init__(self, appid, api_key, api_secret, concurrency=1, rps=1.0, daily_quota=None):
+        self.appid = appid
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.concurrency = max(1, int(concurrency))
+        self.daily_quota = daily_quota
+        self.limiter = RateLimiter(rps)
+        self.in_flight = 0
+        self.sessions = 0
+        self.errors = 0
+        self.exhausted = False
+
+    @property
+    def load(self):
+        """
+        当前负载，即进行中的会话占并发上限的比例
+        """
+        return self.in_flight / float(self.concurrency)
+
+    def __repr__(self):
+        return f"Credential({self.appid!r}, concurrency={self.concurrency}, daily_quota={self.daily_quota})"
+
+class QuotaStore(object):
+    """
+    每日配额计数，多个进程共用同一数据库时计数仍然准确
+
+    Args:
+        path (str): SQLite数据库路径
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "appid TEXT NOT NULL, day TEXT NOT NULL, used INTEGER NOT NULL DEFAULT 0, "
+            "exhausted INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (appid, day))"
+        )
+
+    def reserve(self, appid, day, quota):
+        """
+        占用一次配额
+
+        Returns:
+            bool: 是否占用成功，配额已用尽或已标记用尽时返回False
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT OR IGNORE INTO usage (appid, day) VALUES (?, ?)", (appid, day))
+                cursor = self._conn.execute(
+                    "UPDATE usage SET used = used + 1 WHERE appid = ? AND day = ? AND exhausted = 0 "
+                    "AND (? IS NULL OR used < ?)",
+                    (appid, day, quota, quota)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount == 1
+
+    def mark_exhausted(self, appid, day):
+        """
+        标记凭证当天的配额已用尽
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO usage (appid, day) VALUES (?, ?)", (appid, day))
+            self._conn.execute("UPDATE usage SET exhausted = 1 WHERE appid = ? AND day = ?", (appid, day))
+
+    def usage(self, appid, day):
+        """
+        Returns:
+            tuple: (当天已用次数, 是否已标记用尽)
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT used, exhausted FROM usage WHERE appid = ? AND day = ?",
+                                     (appid, day)).fetchone()
+        return (row[0], bool(row[1])) if row else (0, False)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def today():
+    """
+    配额计数使用的日期(本地时间)
+    """
+    return time.strftime("%Y-%m-%d")
+
+class CredentialPool(object):
+    """
+    凭证池，可在多个线程间共享
+
+    Args:
+        credentials (list): Credential列表
+        state_path (str): 配额计数数据库路径，None时只在本进程内计数
+    """
+
+    def __init__(self, credentials, state_path=None):
+        if not credentials:
+            raise ValueError("凭证池为空")
+        self.credentials = list(credentials)
+        self.store = QuotaStore(state_path) if state_path else None
+        self._used = {}
+        self._cond = threading.Condition()
+        day = today()
+        for credential in self.credentials:
+            used, exhausted = self.store.usage(credential.appid, day) if self.store else (0, False)
+            credential.exhausted = exhausted or (credential.daily_quota is not None
+                                                 and used >= credential.daily_quota)
+            if credential.exhausted:
+                print(f"凭证 {credential.appid} 今日配额已用尽，不参与轮换")
+
+    @classmethod
+    def from_file(cls, path, state_path=None):
+        """
+        从JSON配置文件读取凭证池
+
+        配置格式: {"credentials": [{"appid": ..., "api_key": ..., "api_secret": ...,
+        "concurrency": 10, "rps": 5, "daily_quota": 500}, ...]}，
+        未指定state_path时配额计数保存在配置文件旁的 <配置名>.quota.db
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        entries = config["credentials"] if isinstance(config, dict) else config
+        credentials = [
+            Credential(entry["appid"], entry["api_key"], entry["api_secret"],
+                       entry.get("concurrency", 1), entry.get("rps", 1.0), entry.get("daily_quota"))
+            for entry in entries
+        ]
+        if state_path is None:
+            state_path = os.path.splitext(path)[0] + ".quota.db"
+        return cls(credentials, state_path)
+
+    @property
+    def capacity(self):
+        """
+        未用尽凭证的并发上限之和
+        """
+        return sum(c.concurrency for c in self.credentials if not c.exhausted)
+
+    @property
+    def exhausted(self):
+        """
+        是否所有凭证都已用尽
+        """
+        return all(c.exhausted for c in self.credentials)
+
+    def _reserve(self, credential, day):
+        if credential.daily_quota is None and self.store is None:
+            return True
+        if self.store is not None:
+            return self.store.reserve(credential.appid, day, credential.daily_quota)
+        used = self._used.get(credential.appid, 0)
+        if used >= credential.daily_quota:
+            return False
+        self._used[credential.appid] = used + 1
+        return True
+
+    def _drain(self, credential, day):
+        credential.exhausted = True
+        if self.store is not None:
+            self.store.mark_exhausted(credential.appid, day)
+        print(f"凭证 {credential.appid} 配额已用尽，退出轮换")
+        self._cond.notify_all()
+
+    def acquire(self):
+        """
+        选择负载最低且有空闲并发的凭证并占用一次配额，所有凭证都满载时等待，
+        随后按该凭证的速率限制等待令牌
+
+        Returns:
+            Credential: 选中的凭证，使用后必须调用release()
+
+        Raises:
+            PoolExhausted: 所有凭证的配额均已用尽
+        """
+        day = today()
+        with self._cond:
+            while True:
+                available = [c for c in self.credentials if not c.exhausted]
+                if not available:
+                    raise PoolExhausted("所有凭证的配额均已用尽")
+                idle = [c for c in available if c.in_flight < c.concurrency]
+                if not idle:
+                    self._cond.wait()
+                    continue
+                # 负载相同时优先选择令牌已就绪的凭证
+                credential = min(idle, key=lambda c: (c.load, c.limiter.wait_time()))
+                if not self._reserve(credential, day):
+                    self._drain(credential, day)
+                    continue
+                credential.in_flight += 1
+                credential.sessions += 1
+                break
+        credential.limiter.acquire()
+        return credential
+
+    def release(self, credential, error_code=None):
+        """
+        会话结束后归还凭证
+
+        Args:
+            credential (Credential): acquire()返回的凭证
+            error_code (int): 服务端返回的错误码，授权或配额不足时该凭证退出轮换
+        """
+        with self._cond:
+            credential.in_flight -= 1
+            if error_code:
+                credential.errors += 1
+                if error_code in QUOTA_ERROR_CODES and not credential.exhausted:
+                    self._drain(credential, today())
+            self._cond.notify_all()
+
+    def print_summary(self):
+        """
+        打印各凭证的使用情况
+        """
+        day = today()
+        print("\n=== 凭证池 ===")
+        print(f"{'APPID':<20}{'并发':>6}{'本次会话':>10}{'错误':>6}{'今日已用':>10}{'每日配额':>10}  状态")
+        for c in self.credentials:
+            used = self.store.usage(c.appid, day)[0] if self.store else self._used.get(c.appid, c.sessions)
+            quota = c.daily_quota if c.daily_quota is not None else "-"
+            print(f"{c.appid:<20}{c.concurrency:>6}{c.sessions:>10}{c.errors:>6}{used:>10}{quota:>10}  "
+                  f"{'已用尽' if c.exhausted else '可用'}")
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="查看凭证池的今日配额使用情况")
+    parser.add_argument("config", type=str, help="凭证池配置文件(JSON)")
+    parser.add_argument("--state", type=str, help="配额计数数据库路径，默认为 <配置名>.quota.db")
+
+    args = parser.parse_args()
+
+    pool = CredentialPool.from_file(args.config, args.state)
+    pool.print_summary()
+    pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统一命令行入口
+ise evaluate/batch/record/convert/process/queue 分别转到test_ise、batch_test、collect_audio和work_queue，
+子命令对应的模块在选中时才导入，查看帮助或执行convert时不会加载pandas、websocket和pyaudio
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+# 子命令: (模块, 传给模块main的前置参数, 说明)
+COMMANDS = {
+    "evaluate": ("test_ise", [], "评测单个音频"),
+    "batch": ("batch_test", [], "批量评测目录或任务清单中的音频"),
+    "record": ("collect_audio", ["record"], "录制音频，可边录边评测或长时间录音"),
+    "convert": ("collect_audio", ["convert"], "将WAV转换为16kHz单声道MP3"),
+    "process": ("collect_audio", ["process"], "批量处理目录中的WAV文件"),
+    "queue": ("work_queue", [], "分布式批量评测任务队列"),
+}
+
+def build_parser(prog="ise"):
+    """
+    构建顶层参数解析器，只列出子命令，不导入子命令模块
+    """
+    commands = "\n".join(f"  {name:<10}{desc}" for name, (_, _, desc) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description=f"讯飞语音评测测试工具\n\n子命令:\n{commands}",
+        epilog=f"子命令的参数见 {prog} <子命令> --help",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS.keys(), metavar="command", help="子命令")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="子命令的参数")
+    return parser
+
+def main(argv=None):
+    """
+    主函数
+
+    Args:
+        argv (list): 命令行参数，None时使用sys.argv
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    prog = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "ise"
+    if prog.endswith(".py"):
+        prog = "ise"
+    args = build_parser(prog).parse_args(argv)
+
+    # 安装为命令后sys.path不含当前目录，config.py按当前目录查找
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    module_name, prefix, _ = COMMANDS[args.command]
+    module = importlib.import_module(module_name)
+    # 子命令的用法提示显示为"ise evaluate ..."
+    sys.argv[0] = prog if prefix else f"{prog} {args.command}"
+    return module.main(prefix + args.args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频帧切分与编码
+以生成器方式从文件或内存缓冲区中逐帧读取音频，内存占用与音频长度无关；
+auw消息使用预编译的JSON外壳，只拼接每帧的base64数据
+"""
+
+import base64
+import json
+import queue
+import threading
+
+from pacing import DEFAULT_FRAME_SIZE
+
+def iter_frames(source, frame_size=DEFAULT_FRAME_SIZE):
+    """
+    逐帧读取音频数据，通过预读一帧判断最后一帧
+
+    Args:
+        source: 支持read()的文件对象，或bytes/memoryview/mmap等缓冲区
+        frame_size (int): 每帧字节数
+
+    Yields:
+        tuple: (帧序号, 帧数据, 是否最后一帧)，缓冲区输入时帧数据为零拷贝的memoryview
+    """
+    if hasattr(source, "read"):
+        chunks = iter(lambda: source.read(frame_size), b"")
+    else:
+        view = memoryview(source).cast("B")
+        chunks = (view[i:i + frame_size] for i in range(0, len(view), frame_size))
+
+    current = next(chunks, None)
+    if current is None:
+        return
+
+    index = 0
+    for following in chunks:
+        yield index, current, False
+        current = following
+        index += 1
+    yield index, current, True
+
+# 帧位置: 第一帧、中间帧、最后一帧
+AUS_FIRST = 1
+AUS_CONTINUE = 2
+AUS_LAST = 4
+
+_PLACEHOLDER = "@@AUDIO@@"
+
+class FrameEncoder(object):
+    """
+    音频帧(auw)消息编码器
+    预先生成第一帧、中间帧和最后一帧的JSON外壳，编码时只拼接base64数据，
+    输出与逐帧构建字典再json.dumps的结果等价
+
+    Args:
+        aue (str): 音频编码格式
+    """
+
+    def __init__(self, aue="lame"):
+        self.aue = aue
+        self._envelopes = {}
+        for aus in (AUS_FIRST, AUS_CONTINUE, AUS_LAST):
+            if aus == AUS_LAST:
+                data = {"status": 2, "data": _PLACEHOLDER}
+            else:
+                data = {"status": 1, "data": _PLACEHOLDER, "data_type": 1, "encoding": "raw"}
+            message = json.dumps({"business": {"cmd": "auw", "aus": aus, "aue": aue}, "data": data})
+            prefix, suffix = message.split(_PLACEHOLDER)
+            self._envelopes[aus] = (prefix.encode("utf-8"), suffix.encode("utf-8"))
+
+    def encode(self, frame, aus):
+        """
+        编码一个音频帧
+
+        Args:
+            frame: 音频数据
+            aus (int): 帧位置
+
+        Returns:
+            bytes: UTF-8编码的JSON消息，可直接作为文本帧发送
+        """
+        prefix, suffix = self._envelopes[aus]
+        return prefix + base64.b64encode(frame) + suffix
+
+    def encode_frames(self, frames):
+        """
+        编码iter_frames产生的帧序列
+
+        Args:
+            frames: iter_frames的输出
+
+        Yields:
+            tuple: (消息, 音频字节数, 帧位置)
+        """
+        for index, frame, is_last in frames:
+            if index == 0:
+                yield self.encode(frame, AUS_FIRST), len(frame), AUS_FIRST
+                if is_last:
+                    # 只有一帧时补发一个空的最后一帧，通知服务端音频结束
+                    yield self.encode(b"", AUS_LAST), 0, AUS_LAST
+            elif is_last:
+                yield self.encode(frame, AUS_LAST), len(frame), AUS_LAST
+            else:
+                yield self.encode(frame, AUS_CONTINUE), len(frame), AUS_CONTINUE
+
+def prefetch(iterable, depth):
+    """
+    在后台线程中预先计算后续元素，当前元素发送时下一批已编码完成
+
+    Args:
+        iterable: 数据源
+        depth (int): 预取队列长度，<= 0 时直接返回原迭代器
+
+    Yields:
+        原迭代器的元素
+    """
+    if depth <= 0:
+        yield from iterable
+        return
+
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        worker.join()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测会话分阶段耗时统计
+记录每个会话的URL签名、建立连接、握手完成、首帧/末帧发送、首条服务端消息和最终结果的时间点，
+批量评测时汇总为JSON Lines明细和Prometheus文本格式的直方图
+"""
+
+import json
+import os
+import threading
+import time
+
+# 会话时间点，按发生顺序排列
+EVENTS = ("connect", "handshake", "first_frame", "last_frame", "first_message", "final_result", "closed")
+
+# 阶段名: (起始时间点, 结束时间点)
+PHASES = {
+    "handshake": ("connect", "handshake"),          # TCP/TLS连接和WebSocket握手
+    "upload": ("first_frame", "last_frame"),        # 音频上传，包含节奏控制的等待
+    "first_message": ("connect", "first_message"),  # 从发起连接到收到第一条服务端消息
+    "scoring": ("last_frame", "final_result"),      # 末帧发出后等待服务端评分
+    "total": ("connect", "closed"),                 # 会话总耗时
+}
+
+# Prometheus直方图的桶边界(秒)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def percentile(sorted_values, p):
+    """
+    计算已排序数据的百分位数(线性插值)
+    """
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+class SessionMetrics(object):
+    """
+    单个评测会话的时间点和计数
+
+    Attributes:
+        audio (str): 音频文件
+        sign_time (float): URL签名耗时(秒)
+        events (dict): {时间点: 距会话开始的秒数}
+        status (str): ok/error/cached/failed/preflight
+        error_code (int): 服务端返回的错误码
+        frames (int): 发送的音频帧数
+        bytes_sent (int): 发送的音频字节数
+        trimmed_bytes (int): 静音裁剪去掉的字节数
+        trimmed_seconds (float): 静音裁剪去掉的时长(秒)
+    """
+
+    def __init__(self, audio=None):
+        self.audio = audio
+        self.sign_time = None
+        self.started_at = None
+        self.events = {}
+        self.status = None
+        self.error_code = None
+        self.frames = 0
+        self.bytes_sent = 0
+        self.trimmed_bytes = 0
+        self.trimmed_seconds = 0.0
+        self._start = None
+
+    def start(self):
+        """
+        开始计时，之前记录的时间点被清空
+        """
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.events = {}
+
+    def mark(self, event, overwrite=False):
+        """
+        记录时间点，默认只保留第一次
+        """
+        if self._start is None:
+            self.start()
+        if overwrite or event not in self.events:
+            self.events[event] = time.perf_counter() - self._start
+
+    def sent(self, nbytes):
+        """
+        记录一帧音频已发送
+        """
+        self.mark("first_frame")
+        self.frames += 1
+        self.bytes_sent += nbytes
+
+    def finish(self, status):
+        """
+        结束会话并记录状态
+        """
+        self.mark("closed")
+        self.status = status
+
+    def phases(self):
+        """
+        计算各阶段耗时
+
+        Returns:
+            dict: {阶段名: 秒}，缺少时间点的阶段不包含在内
+        """
+        phases = {}
+        if self.sign_time is not None:
+            phases["sign"] = self.sign_time
+        for name, (begin, end) in PHASES.items():
+            if begin in self.events and end in self.events:
+                phases[name] = self.events[end] - self.events[begin]
+        return phases
+
+    def describe(self):
+        """
+        各阶段耗时的简短描述，用于打印
+        """
+        return ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases().items())
+
+    def to_dict(self):
+        return {
+            "audio": self.audio,
+            "started_at": self.started_at,
+            "status": self.status,
+            "error_code": self.error_code,
+            "frames": self.frames,
+            "bytes_sent": self.bytes_sent,
+            "trimmed_bytes": self.trimmed_bytes,
+            "trimmed_seconds": self.trimmed_seconds,
+            "events": self.events,
+            "phases": self.phases(),
+        }
+
+class MetricsCollector(object):
+    """
+    汇总多个会话的耗时，可在多个线程间共享
+
+    Args:
+        jsonl_path (str): 会话明细的JSON Lines路径，每个会话结束后追加一行，None表示不写明细
+        append (bool): 追加到已有文件还是重新开始
+    """
+
+    def __init__(self, jsonl_path=None, append=False):
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._status = {}
+        self._totals = {"bytes_sent": 0, "trimmed_bytes": 0, "trimmed_seconds": 0.0}
+        self._file = None
+        if jsonl_path:
+            directory = os.path.dirname(os.path.abspath(jsonl_path))
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            self._file = open(jsonl_path, "a" if append else "w", encoding="utf-8")
+
+    def add(self, metrics):
+        """
+        加入一个会话的统计
+        """
+        record = metrics.to_dict()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._status[metrics.status] = self._status.get(metrics.status, 0) + 1
+            for name in self._totals:
+                self._totals[name] += record[name]
+            # 命中缓存和预检跳过的会话没有网络阶段，不计入直方图
+            if metrics.status not in ("cached", "preflight"):
+                for name, seconds in record["phases"].items():
+                    self._phases.setdefault(name, []).append(seconds)
+            if self._file is not None:
+                self._file.write(line)
+                self._file.flush()
+
+    def count(self, status):
+        """
+        指定状态的会话数
+        """
+        with self._lock:
+            return self._status.get(status, 0)
+
+    def summary(self):
+        """
+        各阶段耗时的统计摘要
+
+        Returns:
+            dict: {阶段名: {count, mean, p50, p90, p99, max}}
+        """
+        with self._lock:
+            phases = {name: sorted(values) for name, values in self._phases.items()}
+        summary = {}
+        for name, values in phases.items():
+            summary[name] = {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "max": values[-1],
+            }
+        return summary
+
+    def print_summary(self):
+        summary = self.summary()
+        with self._lock:
+            status = dict(self._status)
+            totals = dict(self._totals)
+        if not status:
+            return
+        print("\n=== 会话分阶段耗时(秒) ===")
+        print("会话状态: " + ", ".join(f"{name} {count}" for name, count in status.items()))
+        print(f"上传音频: {totals['bytes_sent']} 字节")
+        if totals["trimmed_bytes"]:
+            print(f"静音裁剪: 去除 {totals['trimmed_bytes']} 字节, {totals['trimmed_seconds']:.2f} 秒")
+        print(f"{'阶段':<14}{'次数':>6}{'平均':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'最大':>9}")
+        for name, stats in summary.items():
+            print(f"{name:<16}{stats['count']:>6}{stats['mean']:>9.3f}{stats['p50']:>9.3f}"
+                  f"{stats['p90']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}")
+
+    def prometheus_text(self):
+        """
+        生成Prometheus文本格式的指标
+        """
+        with self._lock:
+            phases = {name: list(values) for name, values in self._phases.items()}
+            status = dict(self._status)
+
+        lines = [
+            "# HELP ise_session_phase_seconds Duration of each ISE session phase.",
+            "# TYPE ise_session_phase_seconds histogram",
+        ]
+        for name, values in phases.items():
+            for bound in BUCKETS:
+                count = sum(1 for value in values if value <= bound)
+                lines.append(f'ise_session_phase_seconds_bucket{{phase="{name}",le="{bound}"}} {count}')
+            lines.append(f'ise_session_phase_seconds_bucket{{phase="{name}",le="+Inf"}} {len(values)}')
+            lines.append(f'ise_session_phase_seconds_sum{{phase="{name}"}} {sum(values)}')
+            lines.append(f'ise_session_phase_seconds_count{{phase="{name}"}} {len(values)}')
+
+        lines.append("# HELP ise_sessions_total ISE sessions by final status.")
+        lines.append("# TYPE ise_sessions_total counter")
+        for name, count in status.items():
+            lines.append(f'ise_sessions_total{{status="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        将指标写入Prometheus文本格式文件(可供node_exporter textfile收集)
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and not self._file.closed:
+                self._file.close()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测结果XML流式解析
+基于iterparse逐个节点解析句子/单词/音节/音素各层级，转换为紧凑的记录对象，
+解析过的元素立即释放，篇章级结果也只占用与记录数相当的内存
+"""
+
+import io
+import xml.etree.ElementTree as ET
+
+# 评测类别节点
+CATEGORY_TAGS = ("read_syllable", "read_word", "read_sentence", "read_chapter")
+
+# 分数字段
+SCORE_FIELDS = ("total_score", "accuracy_score", "fluency_score", "integrity_score",
+                "standard_score", "phone_score", "tone_score")
+
+# 节点标签到层级的映射，rec_paper下的类别节点为整体评分
+LEVELS = {
+    "rec_paper": "paper",
+    "sentence": "sentence",
+    "word": "word",
+    "syll": "syll",
+    "phone": "phone",
+}
+
+def _to_float(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def _to_int(value):
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+class IseRecord(object):
+    """
+    单个评测节点的紧凑记录，分数已转换为数值
+
+    Attributes:
+        tag (str): XML标签
+        level (str): 层级，category/paper/summary/sentence/word/syll/phone
+        depth (int): 节点深度，根节点xml_result的子节点为1
+        parent (int): 父记录在记录列表中的序号，没有时为None
+        content (str): 文本内容
+        beg_pos (int): 起始位置(10ms为单位)
+        end_pos (int): 结束位置(10ms为单位)
+        total_score等 (float): 各维度分数
+        word_count (int): 词数
+        dp_message (int): 增漏读信息
+        except_info (int): 异常信息码
+        is_rejected (bool): 是否被拒识
+    """
+
+    __slots__ = ("tag", "level", "depth", "parent", "content", "beg_pos", "end_pos") + SCORE_FIELDS + (
+        "word_count", "dp_message", "except_info", "is_rejected")
+
+    def __init__(self, tag, level, depth, parent, attrib):
+        self.tag = tag
+        self.level = level
+        self.depth = depth
+        self.parent = parent
+        self.content = attrib.get("content")
+        self.beg_pos = _to_int(attrib.get("beg_pos"))
+        self.end_pos = _to_int(attrib.get("end_pos"))
+        for field in SCORE_FIELDS:
+            setattr(self, field, _to_float(attrib.get(field)))
+        self.word_count = _to_int(attrib.get("word_count"))
+        self.dp_message = _to_int(attrib.get("dp_message"))
+        self.except_info = _to_int(attrib.get("except_info"))
+        rejected = attrib.get("is_rejected")
+        self.is_rejected = None if rejected is None else rejected == "true"
+
+    def scores(self):
+        """
+        返回非空的分数字典
+        """
+        return {field: getattr(self, field) for field in SCORE_FIELDS if getattr(self, field) is not None}
+
+    def __repr__(self):
+        return f"IseRecord({self.level}, content={self.content!r}, total_score={self.total_score})"
+
+class IseResult(object):
+    """
+    解析后的评测结果
+
+    Attributes:
+        total_score (str): 根节点的total_score属性(原始字符串)
+        top_nodes (list): 根节点下各子节点的(标签, 原始属性)
+        records (list): 按文档顺序排列的IseRecord
+    """
+
+    __slots__ = ("total_score", "top_nodes", "records")
+
+    def __init__(self):
+        self.total_score = None
+        self.top_nodes = []
+        self.records = []
+
+    def level(self, name):
+        """
+        返回指定层级的所有记录
+        """
+        return [record for record in self.records if record.level == name]
+
+    @property
+    def summary(self):
+        """
+        rec_paper下的整体评分记录
+        """
+        for record in self.records:
+            if record.level == "summary":
+                return record
+        return None
+
+    @property
+    def sentences(self):
+        return self.level("sentence")
+
+    @property
+    def words(self):
+        return self.level("word")
+
+    @property
+    def sylls(self):
+        return self.level("syll")
+
+    @property
+    def phones(self):
+        return self.level("phone")
+
+    def children(self, index):
+        """
+        返回指定记录的直接子记录
+        """
+        return [record for record in self.records if record.parent == index]
+
+    def to_array(self):
+        """
+        转换为NumPy结构化数组，缺失的分数为NaN，缺失的位置为-1
+        """
+        import numpy as np
+
+        dtype = [("level", "U8"), ("depth", "i1"), ("parent", "i4"), ("beg_pos", "i4"), ("end_pos", "i4")]
+        dtype += [(field, "f4") for field in SCORE_FIELDS]
+        rows = []
+        for record in self.records:
+            rows.append((
+                record.level, record.depth,
+                -1 if record.parent is None else record.parent,
+                -1 if record.beg_pos is None else record.beg_pos,
+                -1 if record.end_pos is None else record.end_pos,
+            ) + tuple(np.nan if getattr(record, field) is None else getattr(record, field)
+                      for field in SCORE_FIELDS))
+        return np.array(rows, dtype=dtype)
+
+def _open_source(source):
+    """
+    字符串和字节总是作为XML内容解析，文件路径通过parse_file传入
+    """
+    if hasattr(source, "read"):
+        return source
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    return io.BytesIO(source)
+
+def iter_records(source, result=None, max_depth=None):
+    """
+    流式解析评测结果XML，按文档顺序逐个产生记录
+
+    Args:
+        source: XML字符串、字节或文件对象
+        result (IseResult): 可选，用于收集根节点和顶层节点的原始属性
+        max_depth (int): 只解析到指定深度，None表示全部层级
+
+    Yields:
+        tuple: (记录序号, IseRecord)
+    """
+    stream = _open_source(source)
+    try:
+        # 栈中保存(父记录序号, 元素)
+        stack = []
+        count = 0
+        in_paper = False
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                depth = len(stack)
+                if depth == 0:
+                    if result is not None:
+                        result.total_score = elem.get("total_score")
+                    stack.append((None, elem))
+                    continue
+
+                tag = elem.tag
+                if depth == 1 and result is not None:
+                    result.top_nodes.append((tag, dict(elem.attrib)))
+                if tag == "rec_paper":
+                    in_paper = True
+                if tag in CATEGORY_TAGS:
+                    level = "summary" if in_paper else "category"
+                else:
+                    level = LEVELS.get(tag, tag)
+
+                parent = stack[-1][0]
+                if max_depth is not None and depth > max_depth:
+                    stack.append((parent, elem))
+                    continue
+                stack.append((count, elem))
+                yield count, IseRecord(tag, level, depth, parent, elem.attrib)
+                count += 1
+            else:
+                stack.pop()
+                if elem.tag == "rec_paper":
+                    in_paper = False
+                # 释放已处理的元素，前面的兄弟节点都已处理完，可以一并从父节点移除
+                elem.clear()
+                if stack:
+                    del stack[-1][1][:]
+    finally:
+        if stream is not source:
+            stream.close()
+
+def parse_result(source, max_depth=None):
+    """
+    解析评测结果XML
+
+    Args:
+        source: XML字符串、字节或文件对象
+        max_depth (int): 只解析到指定深度，None表示全部层级
+
+    Returns:
+        IseResult: 解析结果
+    """
+    result = IseResult()
+    for _, record in iter_records(source, result, max_depth):
+        result.records.append(record)
+    return result
+
+def parse_file(path, max_depth=None):
+    """
+    解析保存在文件中的评测结果XML
+
+    Args:
+        path (str): XML文件路径
+        max_depth (int): 只解析到指定深度，None表示全部层级
+
+    Returns:
+        IseResult: 解析结果
+    """
+    with open(path, "rb") as f:
+        return parse_result(f, max_depth)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量评测任务清单
+从CSV或JSONL清单逐行读取(音频, 文本, 类型, 朗读者)任务，每个音频可以有自己的评测文本和类型，
+一次运行处理整个语料；清单按行流式读取，不会一次性载入内存
+"""
+
+import csv
+import json
+import os
+import re
+
+# 各字段可接受的列名
+AUDIO_COLUMNS = ("audio", "audio_path", "path", "file")
+TEXT_COLUMNS = ("text", "prompt")
+TYPE_COLUMNS = ("type", "test_type")
+SPEAKER_COLUMNS = ("speaker", "speaker_id")
+
+# 清单任务附加到分析结果中的字段
+TAG_FIELDS = ("row", "speaker", "text", "test_type")
+
+class Job(object):
+    """
+    一个评测任务
+
+    Attributes:
+        index (int): 任务序号，决定结果的汇总顺序
+        audio (str): 音频文件路径
+        text (str): 评测文本
+        test_type (str): 测评类型
+        speaker (str): 朗读者，没有时为None
+        row (int): 清单中的行号(从1开始，不含表头)，目录任务为None
+    """
+
+    __slots__ = ("index", "audio", "text", "test_type", "speaker", "row")
+
+    def __init__(self, index, audio, text, test_type, speaker=None, row=None):
+        self.index = index
+        self.audio = audio
+        self.text = text
+        self.test_type = test_type
+        self.speaker = speaker
+        self.row = row
+
+    @property
+    def name(self):
+        """
+        结果名称，清单任务在文件名后加行号，同一音频对应多个文本时不会重名
+        """
+        file_name = os.path.basename(self.audio)
+        if self.row is None:
+            return file_name
+        stem, ext = os.path.splitext(file_name)
+        return f"{stem}_r{self.row}{ext}"
+
+    def tags(self):
+        """
+        附加到分析结果中的清单信息，便于按朗读者和文本分组
+        """
+        if self.row is None:
+            return {}
+        tags = {"row": self.row, "text": self.text, "test_type": self.test_type}
+        if self.speaker:
+            tags["speaker"] = self.speaker
+        return tags
+
+    def __repr__(self):
+        return f"Job({self.index}, {self.audio!r}, {self.test_type}, row={self.row})"
+
+def speaker_from_name(file_name):
+    """
+    从文件名推断朗读者，取第一个下划线或连字符之前的部分，
+    如 alice_take2.mp3 -> alice
+    """
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    return re.split(r"[_\-]", stem, maxsplit=1)[0] or stem
+
+def directory_jobs(audio_dir, test_type, text):
+    """
+    目录下所有音频文件使用相同的文本和类型
+
+    Returns:
+        list: Job列表
+    """
+    audio_files = []
+    for root, _, files in os.walk(audio_dir):
+        for file in files:
+            if file.endswith((".mp3", ".wav")):
+                audio_files.append(os.path.join(root, file))
+    return [Job(i, audio_file, text, test_type) for i, audio_file in enumerate(audio_files)]
+
+def _pick(record, columns):
+    for column in columns:
+        value = record.get(column)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+def _iter_records(path):
+    """
+    逐行读取清单，CSV按表头取列，JSONL每行一个对象
+
+    Yields:
+        tuple: (行号, 记录字典)
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+            row = 0
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"清单第 {row} 行不是有效的JSON，已跳过")
+                    continue
+                yield row, record if isinstance(record, dict) else {}
+        else:
+            for row, record in enumerate(csv.DictReader(f), 1):
+                yield row, {key.strip().lower(): value for key, value in record.items() if key}
+
+def iter_manifest(path, default_type=None, default_text=None, valid_types=None):
+    """
+    流式读取任务清单
+
+    Args:
+        path (str): CSV或JSONL清单路径，相对音频路径按清单所在目录解析
+        default_type (str): 行中没有类型时使用的测评类型
+        default_text (str): 行中没有文本时使用的评测文本
+        valid_types: 允许的测评类型，类型无效的行被跳过
+
+    Yields:
+        Job: 评测任务
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    index = 0
+    for row, record in _iter_records(path):
+        audio = _pick(record, AUDIO_COLUMNS)
+        if not audio:
+            print(f"清单第 {row} 行缺少音频路径，已跳过")
+            continue
+        if not os.path.isabs(audio):
+            audio = os.path.join(base_dir, audio)
+
+        test_type = _pick(record, TYPE_COLUMNS) or default_type
+        if valid_types is not None and test_type not in valid_types:
+            print(f"清单第 {row} 行的测评类型 {test_type} 无效，已跳过")
+            continue
+
+        text = _pick(record, TEXT_COLUMNS) or default_text
+        yield Job(index, audio, text, test_type, _pick(record, SPEAKER_COLUMNS), row)
+        index += 1
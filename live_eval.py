@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+边录边评测
+录音开始时就建立评测连接，回调模式的PyAudio流把PCM数据块放入队列，
+评测会话从队列中按帧读取并以raw(audio/L16)格式发送，停止录音后很快就能得到评分；
+没有麦克风时可以用FakeAudioSource按实时速度回放WAV或内存音频进行测试
+"""
+
+import argparse
+import queue
+import threading
+import time
+import wave
+
+import numpy as np
+
+from audio_pcm import TARGET_SAMPLE_RATE, pcm_bytes, read_wav_pcm
+
+# 每次回调的样本数，与collect_audio.record_audio一致
+DEFAULT_CHUNK = 1024
+
+_END = object()
+
+class LiveAudioSource(object):
+    """
+    队列缓冲的实时音频源
+    录音线程通过put()放入16kHz单声道int16 PCM数据块，评测线程通过read()读取，
+    read()阻塞到凑满请求的字节数或录音结束，可直接作为iter_frames的数据源
+
+    Args:
+        keep (bool): 是否保留录到的全部数据，用于结束后保存WAV
+        max_chunks (int): 队列最多缓存的数据块数，0表示不限制；
+            队列满时新数据块被丢弃并计入dropped_bytes，内存占用有上限
+    """
+
+    def __init__(self, keep=False, max_chunks=0):
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._buffer = bytearray()
+        self._ended = False
+        self.keep = keep
+        self.chunks = []
+        self.bytes_received = 0
+        self.dropped_bytes = 0
+        self.closed = False
+
+    def put(self, data, timeout=0):
+        """
+        放入一个PCM数据块，默认不阻塞，在录音回调中调用
+
+        Args:
+            data: PCM数据
+            timeout (float): 队列满时最多等待的秒数，为0时直接丢弃该数据块并计入dropped_bytes
+
+        Returns:
+            bool: 是否已放入队列
+        """
+        data = bytes(data)
+        try:
+            self._queue.put(data, timeout=timeout) if timeout else self._queue.put_nowait(data)
+        except queue.Full:
+            if not timeout:
+                self.dropped_bytes += len(data)
+            return False
+        self.bytes_received += len(data)
+        if self.keep:
+            self.chunks.append(data)
+        return True
+
+    def close(self):
+        """
+        标记录音结束，read()读完剩余数据后返回空字节
+        """
+        if not self.closed:
+            self.closed = True
+            try:
+                self._queue.put_nowait(_END)
+            except queue.Full:
+                # 队列已满时由read()在取空队列后发现录音结束
+                pass
+
+    def read(self, size):
+        """
+        读取size字节，录音结束时返回剩余的数据，全部读完后返回b""
+        """
+        while len(self._buffer) < size and not self._ended:
+            try:
+                chunk = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                self._ended = self.closed and self._queue.empty()
+                continue
+            if chunk is _END:
+                self._ended = True
+            else:
+                self._buffer += chunk
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    @property
+    def duration(self):
+        """
+        已录制的时长(秒)
+        """
+        return self.bytes_received / 2.0 / TARGET_SAMPLE_RATE
+
+    def start(self):
+        """
+        开始产生音频，基类的数据由外部通过put()放入，不需要做任何事；
+        自行采集音频的子类覆盖此方法启动录音
+        """
+
+    def stop(self):
+        """
+        停止产生音频
+        """
+        self.close()
+
+    def save_wav(self, path):
+        """
+        将保留的录音写入WAV文件
+        """
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(TARGET_SAMPLE_RATE)
+            wf.writeframes(b"".join(self.chunks))
+        print(f"录音已保存到: {path}")
+        return path
+
+class MicrophoneSource(LiveAudioSource):
+    """
+    回调模式的麦克风录音，以16kHz单声道16位采集，数据块不经转换直接放入队列
+
+    Args:
+        duration (float): 录音时长(秒)，None表示直到调用stop()
+        chunk (int): 每次回调的样本数
+        device (int): 输入设备序号，None使用默认设备
+        keep (bool): 是否保留录到的全部数据
+        max_chunks (int): 队列最多缓存的数据块数，0表示不限制
+    """
+
+    def __init__(self, duration=None, chunk=DEFAULT_CHUNK, device=None, keep=False, max_chunks=0):
+        super(MicrophoneSource, self).__init__(keep, max_chunks)
+        self.max_bytes = int(duration * TARGET_SAMPLE_RATE) * 2 if duration else None
+        self.chunk = chunk
+        self.device = device
+        self._pyaudio = None
+        self._stream = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if self.max_bytes is not None:
+            in_data = in_data[:max(0, self.max_bytes - self.bytes_received)]
+        if in_data:
+            self.put(in_data)
+        if self.max_bytes is not None and self.bytes_received >= self.max_bytes:
+            self.close()
+            return None, self._pa_complete
+        return None, self._pa_continue
+
+    def start(self):
+        import pyaudio
+
+        self._pa_continue, self._pa_complete = pyaudio.paContinue, pyaudio.paComplete
+        self._pyaudio = pyaudio.PyAudio()
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=TARGET_SAMPLE_RATE,
+            input=True,
+            input_device_index=self.device,
+            frames_per_buffer=self.chunk,
+            stream_callback=self._callback
+        )
+        self._stream.start_stream()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+            self._pyaudio = None
+        self.close()
+
+    def wait(self):
+        """
+        等待录音达到指定时长
+        """
+        while self._stream is not None and self._stream.is_active():
+            time.sleep(0.05)
+
+class FakeAudioSource(LiveAudioSource):
+    """
+    用后台线程按录音的节奏回放音频，代替麦克风进行测试
+
+    Args:
+        audio: WAV文件路径，或16kHz单声道int16数组/字节
+        chunk (int): 每个数据块的样本数
+        realtime (bool): 是否按实时速度放入数据，False时尽快放入(队列满时等待读取)
+        keep (bool): 是否保留放入的全部数据
+        max_chunks (int): 队列最多缓存的数据块数，0表示不限制
+    """
+
+    def __init__(self, audio, chunk=DEFAULT_CHUNK, realtime=True, keep=False, max_chunks=0):
+        super(FakeAudioSource, self).__init__(keep, max_chunks)
+        if isinstance(audio, str):
+            audio = read_wav_pcm(audio)
+        elif not isinstance(audio, np.ndarray):
+            audio = np.frombuffer(audio, dtype="<i2")
+        self.pcm = audio
+        self.chunk = chunk
+        self.realtime = realtime
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _produce(self):
+        data = pcm_bytes(self.pcm)
+        step = self.chunk * 2
+        start = time.perf_counter()
+        for offset in range(0, len(data), step):
+            if self._stop.is_set():
+                break
+            if self.realtime:
+                # 按累计样本数计算时间点，与声卡回调的节奏一致
+                delay = start + (offset + step) / 2.0 / TARGET_SAMPLE_RATE - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            chunk = data[offset:offset + step]
+            if self.realtime:
+                self.put(chunk)
+            else:
+                while not self._stop.is_set() and not self.put(chunk, timeout=0.1):
+                    pass
+        self.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.close()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+
+def live_evaluate(source, test_type="en_sentence", text=None, ise_kwargs=None):
+    """
+    开始录音并同时进行评测
+
+    Args:
+        source (LiveAudioSource): 实时音频源，尚未start()
+        test_type (str): 测评类型
+        text (str): 测评文本
+        ise_kwargs (dict): 传给IseTest的其他参数
+
+    Returns:
+        tuple: (XML格式的评测结果, IseTest)，未获取到结果时XML为None
+    """
+    from test_ise import IseTest
+
+    tester = IseTest(None, test_type, text, stream=source, **(ise_kwargs or {}))
+    source.start()
+    try:
+        result = tester.run()
+    finally:
+        source.stop()
+    # 末帧在录音结束时发出，scoring阶段即用户停止说话后等待评分的时间
+    waited = tester.metrics.phases().get("scoring")
+    if waited is not None:
+        print(f"录音 {source.duration:.2f} 秒，结束后 {waited:.3f} 秒得到评分")
+    return result, tester
+
+def main():
+    """
+    主函数
+    """
+    from test_ise import CATEGORY_TYPES, analyze_result, save_result
+
+    parser = argparse.ArgumentParser(description="边录边评测")
+    parser.add_argument("--type", type=str, default="en_sentence", choices=CATEGORY_TYPES.keys(), help="测评类型")
+    parser.add_argument("--text", type=str, default="nice to meet you.", help="测评文本")
+    parser.add_argument("--duration", type=float, default=5, help="录音时长(秒)")
+    parser.add_argument("--device", type=int, help="输入设备序号")
+    parser.add_argument("--fake-audio", type=str, help="用WAV文件按实时速度回放代替麦克风")
+    parser.add_argument("--save", type=str, help="同时把录音保存为WAV文件")
+    parser.add_argument("--output", type=str, help="评测结果输出文件路径")
+    parser.add_argument("--host-url", type=str, help="评测服务地址(可指向本地模拟服务)")
+
+    args = parser.parse_args()
+
+    keep = bool(args.save)
+    if args.fake_audio:
+        source = FakeAudioSource(args.fake_audio, keep=keep)
+    else:
+        source = MicrophoneSource(args.duration, device=args.device, keep=keep)
+        print(f"开始录音并评测，持续 {args.duration} 秒...")
+
+    result, _ = live_evaluate(source, args.type, args.text, {"host_url": args.host_url})
+    if args.save:
+        source.save_wav(args.save)
+    if not result:
+        print("未获取到评测结果")
+        return
+
+    analyzed = analyze_result(result)
+    print("\n=== 评测结果摘要 ===")
+    for key, value in analyzed.items():
+        if key != "原始数据":
+            print(f"{key}: {value}")
+    if args.output:
+        save_result(analyzed, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟讯飞语音评测WebSocket服务
+实现ssb参数帧、auw音频帧(aus 1/2/4)和最终status=2的base64 XML结果，
+用于在不消耗API配额的情况下测试客户端和压测吞吐量
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import socket
+import socketserver
+import struct
+import threading
+import time
+import uuid
+from xml.sax.saxutils import escape
+
+WS_MAGIC = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# auf未指定采样率时的默认值
+DEFAULT_SAMPLE_RATE = 16000
+
+# lame编码按40kbps估算，每10ms 50字节
+LAME_BYTES_PER_10MS = 50
+
+# 默认XML模板，结构与真实服务返回的结果一致
+DEFAULT_XML_TEMPLATE = (
+    '<?xml version="1.0" ?>\n'
+    '<xml_result>\n'
+    ' <{category} lan="{lan}" type="study" version="7,0,0,1024">\n'
+    '  <rec_paper>\n'
+    '   <{paper_tag} accuracy_score="{accuracy_score}" beg_pos="0" content="{content}" '
+    'end_pos="{end_pos}" except_info="0" fluency_score="{fluency_score}" '
+    'integrity_score="{integrity_score}" is_rejected="false" '
+    'standard_score="{standard_score}" total_score="{total_score}" word_count="{word_count}">\n'
+    '    <sentence beg_pos="0" content="{content}" end_pos="{end_pos}" index="0" '
+    'total_score="{total_score}" word_count="{word_count}"/>\n'
+    '   </{paper_tag}>\n'
+    '  </rec_paper>\n'
+    ' </{category}>\n'
+    '</xml_result>\n'
+)
+
+# 常见错误码说明
+ERROR_MESSAGES = {
+    10163: "param validate error",
+    10165: "invalid handle",
+    10313: "appid cannot be empty",
+    11200: "auth no license",
+    11201: "auth no enough license",
+    40006: "invalid parameter",
+    68675: "audio data error",
+}
+
+class MockConfig(object):
+    """
+    模拟服务配置
+
+    Args:
+        delay (float): 收到最后一帧后的评分处理时间(秒)
+        jitter (float): 处理时间的随机抖动上限(秒)
+        error_code (int): 返回的错误码，0表示正常
+        error_rate (float): 返回错误码的概率
+        xml_template (str): 结果XML模板，可使用{category}、{content}、{total_score}等占位符
+        seed (int): 随机数种子，保证计时和错误可复现
+    """
+
+    def __init__(self, delay=0.1, jitter=0.0, error_code=0, error_rate=1.0,
+                 xml_template=None, seed=None):
+        self.delay = delay
+        self.jitter = jitter
+        self.error_code = error_code
+        self.error_rate = error_rate
+        self.xml_template = xml_template or DEFAULT_XML_TEMPLATE
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def processing_delay(self):
+        with self.lock:
+            return self.delay + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def pick_error(self):
+        if not self.error_code:
+            return 0
+        with self.lock:
+            return self.error_code if self.random.random() < self.error_rate else 0
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("连接已断开")
+        buf.extend(chunk)
+    return bytes(buf)
+
+def _read_raw_frame(sock):
+    head = _recv_exact(sock, 2)
+    fin = bool(head[0] & 0x80)
+    opcode = head[0] & 0x0F
+    masked = head[1] & 0x80
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", _recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if masked else None
+    payload = _recv_exact(sock, length)
+    if mask and length:
+        # 整块异或去掩码，比逐字节处理快得多
+        key = (mask * (length // 4 + 1))[:length]
+        payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+    return fin, opcode, payload
+
+def read_frame(sock):
+    """
+    读取一个完整的WebSocket消息，自动拼接分片帧
+    
+    Returns:
+        tuple: (opcode, payload)
+    """
+    fin, opcode, payload = _read_raw_frame(sock)
+    while not fin:
+        fin, _, more = _read_raw_frame(sock)
+        payload += more
+    return opcode, payload
+
+def send_frame(sock, payload, opcode=0x1):
+    """
+    发送一个未掩码的WebSocket帧
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    head = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        head += bytes([length])
+    elif length < 65536:
+        head += bytes([126]) + struct.pack("!H", length)
+    else:
+        head += bytes([127]) + struct.pack("!Q", length)
+    sock.sendall(head + payload)
+
+class IseSession(object):
+    """
+    单个评测会话的协议状态
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.sid = "ise" + uuid.uuid4().hex[:16]
+        self.business = None
+        self.expected_aus = 1
+        self.audio = hashlib.sha256()
+        self.audio_bytes = 0
+        self.frames = 0
+
+    def error(self, code, message=None):
+        return {"code": code, "message": message or ERROR_MESSAGES.get(code, "error"), "sid": self.sid}
+
+    def handle(self, message):
+        """
+        处理一条客户端消息
+
+        Returns:
+            tuple: (回复消息或None, 是否结束会话)
+        """
+        try:
+            data = json.loads(message)
+            business = data.get("business", {})
+            cmd = business.get("cmd")
+        except (ValueError, AttributeError):
+            return self.error(10163, "invalid json"), True
+
+        if cmd == "ssb":
+            if self.business is not None:
+                return self.error(10163, "duplicate ssb"), True
+            if not data.get("common", {}).get("app_id"):
+                return self.error(10313), True
+            for key in ("category", "ent", "text"):
+                if not business.get(key):
+                    return self.error(10163, f"missing {key}"), True
+            code = self.config.pick_error()
+            if code:
+                return self.error(code), True
+            self.business = business
+            return None, False
+
+        if cmd != "auw":
+            return self.error(10163, f"unknown cmd {cmd}"), True
+        if self.business is None:
+            return self.error(10163, "auw before ssb"), True
+
+        aus = business.get("aus")
+        if aus not in (1, 2, 4) or (aus == 1) != (self.expected_aus == 1):
+            return self.error(10163, f"unexpected aus {aus}"), True
+        try:
+            chunk = base64.b64decode(data["data"]["data"])
+        except (KeyError, ValueError):
+            return self.error(68675), True
+        self.audio.update(chunk)
+        self.audio_bytes += len(chunk)
+        self.frames += 1
+        self.expected_aus = 2
+
+        if aus != 4 and data["data"].get("status") != 2:
+            return None, False
+
+        time.sleep(self.config.processing_delay())
+        xml = self.render_xml()
+        reply = {
+            "code": 0,
+            "message": "success",
+            "sid": self.sid,
+            "data": {"status": 2, "data": base64.b64encode(xml.encode("utf-8")).decode()},
+        }
+        return reply, True
+
+    def audio_units(self):
+        """
+        已收到音频的时长，单位为10ms，与结果中的end_pos一致
+        raw按ssb中auf的采样率、16位单声道计算，lame按40kbps估算
+        """
+        if self.business.get("aue", "raw") == "raw":
+            match = re.search(r"rate=(\d+)", self.business.get("auf", ""))
+            rate = int(match.group(1)) if match else DEFAULT_SAMPLE_RATE
+            return self.audio_bytes * 100 // (rate * 2)
+        return self.audio_bytes // LAME_BYTES_PER_10MS
+
+    def render_xml(self):
+        """
+        按模板生成结果XML，分数由音频内容决定，相同音频得到相同分数
+        """
+        digest = self.audio.digest()
+        scores = [60 + digest[i] * 40.0 / 255 for i in range(5)]
+        text = self.business.get("text", "").lstrip("\uFEFF").replace("[content]\n", "")
+        category = self.business.get("category", "read_sentence")
+        ent = self.business.get("ent", "en_vip")
+        lan = "cn" if ent.startswith("cn") else "en"
+        values = {
+            "category": category,
+            # 英文结果的内层节点为read_chapter，中文与外层类别一致
+            "paper_tag": "read_chapter" if lan == "en" else category,
+            "lan": lan,
+            "content": escape(text.strip(), {'"': "&quot;"}),
+            "total_score": "%.6f" % scores[0],
+            "accuracy_score": "%.6f" % scores[1],
+            "fluency_score": "%.6f" % scores[2],
+            "integrity_score": "%.6f" % scores[3],
+            "standard_score": "%.6f" % scores[4],
+            "word_count": len(text.split()),
+            "end_pos": max(1, self.audio_units()),
+        }
+        return self.config.xml_template.format(**values)
+
+class MockIseHandler(socketserver.BaseRequestHandler):
+    """
+    处理WebSocket握手和评测会话
+    """
+
+    def handle(self):
+        sock = self.request
+        server = self.server
+        start = time.monotonic()
+        if not self.handshake(sock):
+            return
+        session = IseSession(server.config)
+        try:
+            while True:
+                opcode, payload = read_frame(sock)
+                if opcode == 0x8:
+                    send_frame(sock, payload[:2], 0x8)
+                    break
+                if opcode == 0x9:
+                    send_frame(sock, payload, 0xA)
+                    continue
+                if opcode != 0x1:
+                    continue
+                reply, done = session.handle(payload.decode("utf-8"))
+                if reply is not None:
+                    send_frame(sock, json.dumps(reply))
+                if done:
+                    server.record(session, reply, time.monotonic() - start)
+                    # 等待客户端关闭连接
+                    sock.settimeout(5)
+                    opcode, payload = read_frame(sock)
+                    if opcode == 0x8:
+                        send_frame(sock, payload[:2], 0x8)
+                    break
+        except (ConnectionError, socket.timeout, OSError):
+            pass
+
+    def handshake(self, sock):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        headers = {}
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key:
+            sock.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WS_MAGIC).encode()).digest()).decode()
+        sock.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return True
+
+class MockIseServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    模拟评测服务，可在后台线程中运行
+
+    Args:
+        host (str): 监听地址
+        port (int): 监听端口，0表示随机端口
+        config (MockConfig): 服务配置
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        super().__init__((host, port), MockIseHandler)
+        self.config = config or MockConfig()
+        self.stats_lock = threading.Lock()
+        self.sessions = 0
+        self.errors = 0
+        self.frames = 0
+        self.audio_bytes = 0
+        self.durations = []
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}/v2/open-ise"
+
+    def record(self, session, reply, duration):
+        with self.stats_lock:
+            self.sessions += 1
+            self.frames += session.frames
+            self.audio_bytes += session.audio_bytes
+            self.durations.append(duration)
+            if reply and reply.get("code"):
+                self.errors += 1
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.sessions = 0
+            self.errors = 0
+            self.frames = 0
+            self.audio_bytes = 0
+            self.durations = []
+
+    def start(self):
+        """
+        在后台线程中启动服务
+
+        Returns:
+            str: 服务地址
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="本地模拟讯飞语音评测服务")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--delay", type=float, default=0.1, help="评分处理时间(秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="处理时间随机抖动(秒)")
+    parser.add_argument("--error-code", type=int, default=0, help="返回的错误码")
+    parser.add_argument("--error-rate", type=float, default=1.0, help="返回错误码的概率")
+    parser.add_argument("--xml-template", type=str, help="结果XML模板文件")
+    parser.add_argument("--seed", type=int, help="随机数种子")
+
+    args = parser.parse_args()
+
+    template = None
+    if args.xml_template:
+        with open(args.xml_template, "r", encoding="utf-8") as f:
+            template = f.read()
+
+    config = MockConfig(args.delay, args.jitter, args.error_code, args.error_rate, template, args.seed)
+    server = MockIseServer(args.host, args.port, config)
+    print(f"模拟评测服务已启动: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
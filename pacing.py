@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频帧发送节奏控制
+支持固定间隔、按音频码率实时发送和不等待(依赖连接背压)三种模式
+"""
+
+import os
+import struct
+import time
+import wave
+
+# 节奏模式
+PACING_MODES = ("fixed", "realtime", "fast")
+
+# 默认帧大小和发送间隔，与讯飞demo一致
+DEFAULT_FRAME_SIZE = 1280
+DEFAULT_FRAME_INTERVAL = 0.04
+
+# MP3 Layer III 码率表(kbps)，按MPEG版本区分
+_MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+
+def _skip_id3(data):
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size
+    return 0
+
+def _mp3_header(data, pos):
+    """
+    解析pos处的MP3 Layer III帧头
+
+    Returns:
+        tuple: (MPEG版本, 码率bit/s, 采样率, 每帧样本数, 帧长字节数, side info长度)，不是有效帧头时返回None
+    """
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    header = struct.unpack(">I", data[pos:pos + 4])[0]
+    version_bits = (header >> 19) & 0x3
+    layer_bits = (header >> 17) & 0x3
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 0x3
+    padding = (header >> 9) & 0x1
+    mono = ((header >> 6) & 0x3) == 3
+    if version_bits == 1 or layer_bits != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    version = {3: 1, 2: 2, 0: 2.5}[version_bits]
+    bitrate = _MP3_BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    samples_per_frame = 1152 if version == 1 else 576
+    frame_length = samples_per_frame // 8 * bitrate // sample_rate + padding
+    side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    return version, bitrate, sample_rate, samples_per_frame, frame_length, side_info
+
+def mp3_frames(data):
+    """
+    逐帧扫描内存中的MP3数据
+
+    Yields:
+        tuple: (偏移, 帧长, 每帧样本数, 采样率, 是否为Xing/Info信息帧)
+    """
+    pos = _skip_id3(data)
+    while pos + 4 <= len(data):
+        parsed = _mp3_header(data, pos)
+        if parsed is None:
+            pos += 1
+            continue
+        _, _, sample_rate, samples_per_frame, frame_length, side_info = parsed
+        tag_pos = pos + 4 + side_info
+        is_info = bytes(data[tag_pos:tag_pos + 4]) in (b"Xing", b"Info")
+        yield pos, frame_length, samples_per_frame, sample_rate, is_info
+        pos += max(frame_length, 1)
+
+def _mp3_bitrate(path):
+    """
+    解析MP3首帧头部估算码率，存在Xing/Info头时按总帧数计算平均码率
+    """
+    with open(path, "rb") as f:
+        data = f.read(64 * 1024)
+    file_size = os.path.getsize(path)
+
+    pos = _skip_id3(data)
+    while pos + 4 <= len(data):
+        if data[pos] == 0xFF and (data[pos + 1] & 0xE0) == 0xE0:
+            break
+        pos += 1
+    else:
+        return None
+
+    parsed = _mp3_header(data, pos)
+    if parsed is None:
+        return None
+    version, bitrate, sample_rate, samples_per_frame, _, side_info = parsed
+
+    # Xing/Info头位于side info之后，记录了总帧数和字节数
+    tag_pos = pos + 4 + side_info
+    tag = data[tag_pos:tag_pos + 4]
+    if tag in (b"Xing", b"Info") and tag_pos + 16 <= len(data):
+        flags = struct.unpack(">I", data[tag_pos + 4:tag_pos + 8])[0]
+        offset = tag_pos + 8
+        frames = None
+        total_bytes = file_size - pos
+        if flags & 0x1:
+            frames = struct.unpack(">I", data[offset:offset + 4])[0]
+            offset += 4
+        if flags & 0x2:
+            total_bytes = struct.unpack(">I", data[offset:offset + 4])[0]
+        if frames:
+            duration = frames * samples_per_frame / float(sample_rate)
+            return total_bytes * 8 / duration
+    return float(bitrate)
+
+def estimate_bitrate(audio_file):
+    """
+    估算音频文件的码率
+
+    Args:
+        audio_file (str): 音频文件路径
+
+    Returns:
+        float: 码率(bit/s)，无法识别时返回None
+    """
+    try:
+        if audio_file.lower().endswith(".wav"):
+            with wave.open(audio_file, "rb") as wf:
+                return float(wf.getframerate() * wf.getsampwidth() * wf.getnchannels() * 8)
+        return _mp3_bitrate(audio_file)
+    except (OSError, EOFError, wave.Error, struct.error):
+        return None
+
+class FramePacer(object):
+    """
+    控制音频帧的发送节奏
+
+    Args:
+        mode (str): fixed为每帧后固定等待，realtime按音频码率以实时速度发送，
+            fast不主动等待，由WebSocket发送缓冲区提供背压
+        interval (float): fixed模式下每帧之后的等待时间(秒)
+        bitrate (float): realtime模式使用的音频码率(bit/s)，未知时退化为fixed模式
+    """
+
+    def __init__(self, mode="fixed", interval=DEFAULT_FRAME_INTERVAL, bitrate=None):
+        if mode not in PACING_MODES:
+            raise ValueError(f"未知的节奏模式: {mode}")
+        if mode == "realtime" and not bitrate:
+            mode = "fixed"
+        self.mode = mode
+        self.interval = interval
+        self.bitrate = bitrate
+        self.start_time = None
+        self.end_time = None
+        self.sent_bytes = 0
+        self.sent_frames = 0
+
+    def start(self):
+        self.start_time = time.perf_counter()
+
+    def sent(self, nbytes):
+        """
+        记录一帧已发送，并按当前模式等待
+        """
+        if self.start_time is None:
+            self.start()
+        self.sent_bytes += nbytes
+        self.sent_frames += 1
+
+        if self.mode == "fixed":
+            time.sleep(self.interval)
+        elif self.mode == "realtime":
+            # 按累计字节数计算目标时间点，避免逐帧累积误差
+            target = self.start_time + self.sent_bytes * 8.0 / self.bitrate
+            delay = target - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.end_time = time.perf_counter()
+
+    @property
+    def upload_time(self):
+        """
+        从开始发送到最后一帧发送完成的耗时(秒)
+        """
+        if self.start_time is None or self.end_time is None:
+            return 0.0
+        return self.end_time - self.start_time
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解码PCM缓存
+把音频解码并统一为16kHz单声道int16后保存为.npy文件，以源文件内容哈希和解码参数为键，
+之后以内存映射方式读取，预检、静音裁剪、篇章分段和上传共用同一份数据，不再逐阶段、逐次运行重复解码；
+按总大小做LRU淘汰
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_pcm import TARGET_SAMPLE_RATE, TARGET_CHANNELS, to_pcm16_mono
+
+# 解码方式变化(如重采样算法)时递增，旧的缓存条目不再命中
+DECODE_VERSION = 1
+
+# 默认缓存容量，16kHz单声道PCM每分钟约1.9MB
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+def _thresholds_key(thresholds):
+    return json.dumps(thresholds or {}, sort_keys=True)
+
+class PcmCache(object):
+    """
+    基于内存映射文件的解码PCM缓存，可在多个线程和进程间共享
+
+    缓存目录下的index.db记录条目大小和访问时间，以及源文件路径、大小、修改时间到内容哈希的映射，
+    源文件未变化时不需要重新计算哈希
+
+    Args:
+        directory (str): 缓存目录
+        max_bytes (int): 缓存PCM总大小上限，None表示不限
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.decode_seconds = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, size INTEGER NOT NULL, source_rate INTEGER NOT NULL, "
+            "source_channels INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, key TEXT NOT NULL)"
+        )
+        # 预检结果按源文件的原始声道和采样率计算，与不使用缓存时一致
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            "key TEXT NOT NULL, thresholds TEXT NOT NULL, report TEXT NOT NULL, PRIMARY KEY (key, thresholds))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+        self._conn.commit()
+
+    def source_key(self, path):
+        """
+        计算源文件的缓存键，文件大小和修改时间未变时直接使用记录的哈希
+
+        Returns:
+            str: 十六进制哈希值
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, key FROM sources WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        digest.update(f"v{DECODE_VERSION}\n{TARGET_SAMPLE_RATE}\n{TARGET_CHANNELS}\n".encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        key = digest.hexdigest()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO sources (path, size, mtime_ns, key) VALUES (?, ?, ?, ?)",
+                               (path, stat.st_size, stat.st_mtime_ns, key))
+            self._conn.commit()
+        return key
+
+    def _file(self, key):
+        return os.path.join(self.directory, key[:2], key + ".npy")
+
+    def _open(self, key):
+        path = self._file(key)
+        if os.path.getsize(path) <= 128:
+            # 空数组无法内存映射
+            return np.load(path)
+        return np.load(path, mmap_mode="r")
+
+    def get(self, path):
+        """
+        读取缓存的PCM
+
+        Returns:
+            np.ndarray: 只读的内存映射int16数组，未命中时返回None
+        """
+        key = self.source_key(path)
+        with self._lock:
+            row = self._conn.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        if row is None:
+            return None
+        try:
+            pcm = self._open(key)
+        except (OSError, ValueError):
+            # 文件被其他进程淘汰或写入不完整
+            return None
+        with self._lock:
+            self.hits += 1
+        return pcm
+
+    def load(self, path):
+        """
+        读取缓存的PCM，未命中时解码并写入缓存
+
+        Args:
+            path (str): 音频文件路径
+
+        Returns:
+            np.ndarray: 16kHz单声道int16数组(只读内存映射)
+        """
+        from preflight import decode_audio
+
+        pcm = self.get(path)
+        if pcm is not None:
+            return pcm
+        start = time.perf_counter()
+        samples, rate, _ = decode_audio(path)
+        return self.store(path, samples, rate, time.perf_counter() - start)
+
+    def store(self, path, samples, sample_rate, decode_seconds=0.0):
+        """
+        把已解码的源文件样本统一格式后写入缓存，供已经解码过源文件的调用方(如预检)复用
+
+        Args:
+            path (str): 音频文件路径
+            samples (np.ndarray): 解码后的样本，形状为(n,)或(n, channels)
+            sample_rate (int): 采样率
+            decode_seconds (float): 解码耗时，与统一格式的耗时一起计入统计
+
+        Returns:
+            np.ndarray: 16kHz单声道int16数组(只读内存映射)
+        """
+        channels = 1 if samples.ndim == 1 else samples.shape[1]
+        start = time.perf_counter()
+        pcm = to_pcm16_mono(samples, sample_rate)
+        decode_seconds += time.perf_counter() - start
+        key = self.source_key(path)
+        file_path = self._file(key)
+        directory = os.path.dirname(file_path)
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再改名，其他进程不会读到写了一半的文件
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(pcm, dtype="<i2"))
+        os.replace(temp_path, file_path)
+
+        now = time.time()
+        with self._lock:
+            self.misses += 1
+            self.decode_seconds += decode_seconds
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, size, source_rate, source_channels, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (key, os.path.getsize(file_path), sample_rate, channels, now, now)
+            )
+            self._conn.commit()
+        if self.max_bytes is not None:
+            self.evict(keep=key)
+        return self._open(key)
+
+    def get_report(self, path, thresholds=None):
+        """
+        读取按源文件样本计算的预检结果
+
+        Args:
+            path (str): 音频文件路径
+            thresholds (dict): 预检阈值，不同阈值的结果分开保存
+
+        Returns:
+            dict: PreflightReport.to_dict()的结果，未缓存时返回None
+        """
+        key = self.source_key(path)
+        with self._lock:
+            row = self._conn.execute("SELECT report FROM reports WHERE key = ? AND thresholds = ?",
+                                     (key, _thresholds_key(thresholds))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_report(self, path, report, thresholds=None):
+        """
+        保存预检结果，随PCM条目一起淘汰
+        """
+        key = self.source_key(path)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO reports (key, thresholds, report) VALUES (?, ?, ?)",
+                               (key, _thresholds_key(thresholds), json.dumps(report, ensure_ascii=False)))
+            self._conn.commit()
+
+    def evict(self, keep=None):
+        """
+        按最近访问时间淘汰超出容量的条目，已映射到内存的文件删除后仍可继续读取
+
+        Args:
+            keep (str): 不淘汰的缓存键，如刚写入的条目
+
+        Returns:
+            int: 删除的条目数
+        """
+        if self.max_bytes is None:
+            return 0
+        doomed = []
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                    if total <= self.max_bytes:
+                        break
+                    if key == keep:
+                        continue
+                    doomed.append(key)
+                    total -= size
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in doomed])
+                self._conn.executemany("DELETE FROM reports WHERE key = ?", [(key,) for key in doomed])
+                self._conn.commit()
+            self.evictions += len(doomed)
+        for key in doomed:
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+        return len(doomed)
+
+    def clear(self):
+        """
+        删除所有缓存条目
+
+        Returns:
+            int: 删除的条目数
+        """
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM entries")]
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM sources")
+            self._conn.execute("DELETE FROM reports")
+            self._conn.commit()
+        for key in keys:
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+        return len(keys)
+
+    def stats(self):
+        """
+        缓存统计信息
+        """
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "decode_seconds": self.decode_seconds,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def print_stats(self):
+        """
+        打印缓存命中统计
+        """
+        stats = self.stats()
+        print(f"\n=== PCM缓存 ===")
+        print(f"命中: {stats['hits']}, 解码: {stats['misses']} (耗时 {stats['decode_seconds']:.2f}s), "
+              f"命中率: {stats['hit_rate']:.1%}")
+        print(f"条目: {stats['entries']}, 大小: {stats['bytes'] / 1024 / 1024:.1f} MB, 淘汰: {stats['evictions']}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="解码PCM缓存")
+    parser.add_argument("--dir", type=str, required=True, help="缓存目录")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024, help="缓存容量上限(MB)")
+    subparsers = parser.add_subparsers(dest="command", help="命令")
+
+    warm_parser = subparsers.add_parser("warm", help="预先解码音频文件或目录")
+    warm_parser.add_argument("paths", nargs="+", help="音频文件或目录")
+    warm_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="并行解码的线程数")
+    subparsers.add_parser("stats", help="查看缓存大小")
+    subparsers.add_parser("clear", help="清空缓存")
+
+    args = parser.parse_args()
+
+    cache = PcmCache(args.dir, int(args.max_mb * 1024 * 1024))
+    try:
+        if args.command == "warm":
+            files = []
+            for path in args.paths:
+                if os.path.isdir(path):
+                    for root, _, names in os.walk(path):
+                        files.extend(os.path.join(root, name) for name in sorted(names)
+                                     if name.endswith((".mp3", ".wav")))
+                else:
+                    files.append(path)
+
+            def warm(path):
+                try:
+                    cache.load(path)
+                except Exception as e:
+                    print(f"{path}: 解码失败: {e}")
+
+            with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+                list(executor.map(warm, files))
+            print(f"共 {len(files)} 个文件")
+            cache.print_stats()
+        elif args.command == "stats":
+            cache.print_stats()
+        elif args.command == "clear":
+            print(f"删除 {cache.clear()} 个缓存条目")
+        else:
+            parser.print_help()
+    finally:
+        cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测前的本地音频质量预检
+解码一次音频，基于NumPy按帧计算RMS电平、信噪比、截幅比例、有效语音占比，
+并检查采样率/声道是否符合要求，预测评测服务会返回的异常码，
+在花费网络时间和调用配额之前跳过或标记预计失败的文件
+"""
+
+import argparse
+import os
+import time
+
+from audio_pcm import TARGET_SAMPLE_RATE, TARGET_CHANNELS, read_wav
+from vad import FLOOR_DB, FRAME_SECONDS, SPEECH_MARGIN_DB, frame_db, to_db
+
+# 预检模式: off不预检, flag预检并在结果中标记, skip跳过预计失败的文件
+PREFLIGHT_MODES = ("off", "flag", "skip")
+
+# 与analyze_result一致的异常码说明
+EXCEPT_MESSAGES = {
+    28673: "无语音或音量过小",
+    28680: "信噪比低",
+    28690: "截幅",
+    28689: "无有效音频",
+}
+
+# 预检跳过的文件在结果中记录的错误
+SKIPPED_ERROR = "预检未通过，未调用评测"
+
+# skip模式只跳过高置信度的预测，信噪比低、截幅只在结果中标记
+SKIP_CODES = (28689, 28673)
+
+# 默认判定阈值
+DEFAULT_THRESHOLDS = {
+    "min_duration": 0.3,        # 秒，短于此视为无有效音频
+    "min_rms_db": -45.0,        # 整体RMS电平(dBFS)
+    "min_speech_fraction": 0.05,  # 有效语音帧占比
+    "min_speech_db": -40.0,     # 语音段电平(dBFS)
+    "min_snr_db": 10.0,         # 语音段与底噪的电平差
+    "min_pause": 0.2,           # 秒，连续低电平帧不短于此才视为停顿，底噪只由停顿估计
+    "noise_floor_db": -50.0,    # 底噪高于此电平时才按信噪比判定，安静录音的停顿较少时不误判
+    "max_clip_ratio": 0.01,     # 截幅样本比例
+}
+
+# 截幅判定: 样本绝对值达到满量程的该比例
+CLIP_LEVEL = 0.999
+
+# 停顿帧判定: 低于语音段电平的dB数
+PAUSE_MARGIN_DB = 3.0
+
+def decode_audio(path):
+    """
+    解码音频文件，保留原始采样率和声道
+
+    Args:
+        path (str): 音频文件路径，WAV直接读取，其他格式通过pydub(ffmpeg)解码
+
+    Returns:
+        tuple: (整数样本数组，形状为(n,)或(n, channels), 采样率, 声道数)
+    """
+    import numpy as np
+
+    if path.lower().endswith(".wav"):
+        samples, rate = read_wav(path)
+    else:
+        from pydub import AudioSegment
+
+        segment = AudioSegment.from_file(path)
+        rate = segment.frame_rate
+        samples = np.array(segment.get_array_of_samples())
+        if segment.channels > 1:
+            samples = samples[:len(samples) - len(samples) % segment.channels].reshape(-1, segment.channels)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    return samples, rate, channels
+
+class PreflightReport(object):
+    """
+    单个音频的预检结果
+
+    Attributes:
+        audio (str): 音频文件
+        duration (float): 时长(秒)
+        sample_rate (int): 采样率
+        channels (int): 声道数
+        rms_db (float): 整体RMS电平(dBFS)
+        speech_db (float): 语音段电平(dBFS)
+        noise_db (float): 底噪电平(dBFS)
+        snr_db (float): 估计信噪比(dB)
+        clip_ratio (float): 截幅样本比例
+        speech_fraction (float): 有效语音帧占比
+        pause_seconds (float): 用于估计底噪的停顿总时长(秒)
+        conformant (bool): 采样率和声道是否为16kHz单声道
+        predicted (list): 预测的异常码
+        error (str): 无法解码时的错误信息
+    """
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.duration = 0.0
+        self.sample_rate = None
+        self.channels = None
+        self.rms_db = FLOOR_DB
+        self.speech_db = FLOOR_DB
+        self.noise_db = FLOOR_DB
+        self.snr_db = 0.0
+        self.clip_ratio = 0.0
+        self.speech_fraction = 0.0
+        self.pause_seconds = 0.0
+        self.conformant = None
+        self.predicted = []
+        self.error = None
+
+    @property
+    def ok(self):
+        """
+        是否预计能正常评测，无法解码时不做判断
+        """
+        return not self.predicted
+
+    @property
+    def skippable(self):
+        """
+        是否有高置信度的预测，skip模式只跳过这类文件
+        """
+        return any(code in SKIP_CODES for code in self.predicted)
+
+    def describe(self):
+        """
+        预检结论的简短描述
+        """
+        if self.error:
+            return f"无法预检({self.error})"
+        if self.ok:
+            return "通过"
+        return "; ".join(f"{code} {EXCEPT_MESSAGES[code]}" for code in self.predicted)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        由to_dict()的结果还原
+        """
+        report = cls(data.get("audio"))
+        for key, value in data.items():
+            setattr(report, key, value)
+        report.predicted = list(report.predicted or [])
+        return report
+
+    def to_dict(self):
+        return {
+            "audio": self.audio,
+            "duration": self.duration,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "rms_db": self.rms_db,
+            "speech_db": self.speech_db,
+            "noise_db": self.noise_db,
+            "snr_db": self.snr_db,
+            "clip_ratio": self.clip_ratio,
+            "speech_fraction": self.speech_fraction,
+            "pause_seconds": self.pause_seconds,
+            "conformant": self.conformant,
+            "predicted": self.predicted,
+            "error": self.error,
+        }
+
+def _pause_frames(quiet, min_frames):
+    """
+    只保留连续不短于min_frames帧的低电平帧
+    """
+    import numpy as np
+
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    pauses = np.zeros(len(quiet), dtype=bool)
+    for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+        if end - start >= min_frames:
+            pauses[start:end] = True
+    return pauses
+
+def analyze_samples(samples, sample_rate, audio=None, thresholds=None):
+    """
+    分析已解码的音频
+
+    Args:
+        samples (np.ndarray): 整数或[-1, 1]浮点样本，形状为(n,)或(n, channels)
+        sample_rate (int): 采样率
+        audio (str): 音频名称，仅用于报告
+        thresholds (dict): 覆盖DEFAULT_THRESHOLDS中的阈值
+
+    Returns:
+        PreflightReport: 预检结果
+    """
+    import numpy as np
+
+    limits = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    report = PreflightReport(audio)
+    samples = np.asarray(samples)
+    report.sample_rate = sample_rate
+    report.channels = 1 if samples.ndim == 1 else samples.shape[1]
+    report.conformant = sample_rate == TARGET_SAMPLE_RATE and report.channels == TARGET_CHANNELS
+    report.duration = len(samples) / float(sample_rate) if sample_rate else 0.0
+
+    if np.issubdtype(samples.dtype, np.integer):
+        full_scale = float(np.iinfo(samples.dtype).max) + 1
+        data = samples.astype(np.float32) / full_scale
+    else:
+        data = samples.astype(np.float32)
+
+    if len(data):
+        # 截幅按所有声道的样本统计，电平按混合后的单声道统计
+        report.clip_ratio = float(np.count_nonzero(np.abs(data) >= CLIP_LEVEL)) / data.size
+        mono = data.mean(axis=1) if data.ndim > 1 else data
+        report.rms_db = float(to_db(np.sqrt(np.mean(mono.astype(np.float64) ** 2))))
+
+        levels, _ = frame_db(mono, sample_rate)
+        if len(levels):
+            report.speech_db = float(np.percentile(levels, 90))
+            # 底噪由明显低于语音段的连续停顿估计。裁剪得很紧或持续发声的录音没有停顿，
+            # 最低的帧仍在语音中，此时底噪只是上限，不据此预测信噪比低
+            quiet = levels < report.speech_db - PAUSE_MARGIN_DB
+            pauses = _pause_frames(quiet, max(1, int(round(limits["min_pause"] / FRAME_SECONDS))))
+            report.pause_seconds = np.count_nonzero(pauses) * FRAME_SECONDS
+            report.noise_db = float(np.percentile(levels[pauses] if pauses.any() else levels, 10))
+            report.snr_db = report.speech_db - report.noise_db
+            speech = levels > limits["min_speech_db"]
+            if pauses.any():
+                speech &= levels > report.noise_db + SPEECH_MARGIN_DB
+            report.speech_fraction = float(np.count_nonzero(speech)) / len(levels)
+
+    predicted = []
+    if report.duration < limits["min_duration"] or report.rms_db <= FLOOR_DB:
+        predicted.append(28689)
+    else:
+        if report.rms_db < limits["min_rms_db"] or report.speech_db < limits["min_speech_db"]:
+            predicted.append(28673)
+        elif (report.pause_seconds and report.snr_db < limits["min_snr_db"]
+              and report.noise_db > limits["noise_floor_db"]):
+            predicted.append(28680)
+        elif report.speech_fraction < limits["min_speech_fraction"]:
+            predicted.append(28673)
+        if report.clip_ratio > limits["max_clip_ratio"]:
+            predicted.append(28690)
+    report.predicted = predicted
+    return report
+
+def check_file(path, thresholds=None, pcm_cache=None):
+    """
+    预检音频文件
+
+    Args:
+        path (str): 音频文件路径
+        thresholds (dict): 覆盖DEFAULT_THRESHOLDS中的阈值
+        pcm_cache (PcmCache): 解码PCM缓存。预检始终按源文件的原始声道和采样率计算，结果与PCM一起缓存，
+            命中时不再解码；未命中时解码一次，统一格式后的PCM同时写入缓存
+
+    Returns:
+        tuple: (PreflightReport, 解码后的样本, 采样率)，无法解码时样本为None；
+            使用缓存时样本为缓存中16kHz单声道PCM的内存映射
+    """
+    if pcm_cache is not None:
+        # 按完整的阈值保存结果，默认阈值变化后不会命中旧结果
+        thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        cached = pcm_cache.get_report(path, thresholds)
+        pcm = pcm_cache.get(path) if cached is not None else None
+        if pcm is not None:
+            report = PreflightReport.from_dict(cached)
+            report.audio = path
+            return report, pcm, TARGET_SAMPLE_RATE
+    try:
+        start = time.perf_counter()
+        samples, rate, _ = decode_audio(path)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        report = PreflightReport(path)
+        report.error = str(e) or type(e).__name__
+        return report, None, None
+    report = analyze_samples(samples, rate, path, thresholds)
+    if pcm_cache is None:
+        return report, samples, rate
+    pcm = pcm_cache.store(path, samples, rate, elapsed)
+    pcm_cache.put_report(path, report.to_dict(), thresholds)
+    return report, pcm, TARGET_SAMPLE_RATE
+
+def preflight_result(report):
+    """
+    预检未通过时代替评测结果的记录，与analyze_result的错误输出格式一致
+    """
+    return {
+        "error": SKIPPED_ERROR,
+        "异常情况": "、".join(EXCEPT_MESSAGES[code] for code in report.predicted),
+        "预检": report.describe(),
+    }
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="评测前的本地音频质量预检")
+    parser.add_argument("paths", nargs="+", help="音频文件或目录")
+    parser.add_argument("--pcm-cache", type=str, help="解码PCM缓存目录")
+
+    args = parser.parse_args()
+
+    pcm_cache = None
+    if args.pcm_cache:
+        from pcm_cache import PcmCache
+
+        pcm_cache = PcmCache(args.pcm_cache)
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.endswith((".mp3", ".wav")))
+        else:
+            files.append(path)
+
+    failed = 0
+    for path in files:
+        report, _, _ = check_file(path, pcm_cache=pcm_cache)
+        if not report.ok:
+            failed += 1
+        if report.error:
+            print(f"{path}: {report.describe()}")
+            continue
+        print(f"{path}: {report.describe()} (时长 {report.duration:.2f}s, {report.sample_rate}Hz/{report.channels}声道, "
+              f"RMS {report.rms_db:.1f}dBFS, 信噪比 {report.snr_db:.1f}dB, 截幅 {report.clip_ratio:.2%}, "
+              f"语音占比 {report.speech_fraction:.0%})")
+    print(f"\n共 {len(files)} 个文件，{failed} 个预计评测失败")
+    if pcm_cache is not None:
+        pcm_cache.print_stats()
+        pcm_cache.close()
+
+if __name__ == "__main__":
+    main()
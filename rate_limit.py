@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求速率限制
+基于令牌桶控制每秒发起的评测会话数，可在多个线程间共享
+"""
+
+import threading
+import time
+
+class RateLimiter(object):
+    """
+    线程安全的令牌桶限速器
+
+    Args:
+        rate (float): 每秒允许的请求数，<= 0 表示不限速
+        burst (int): 令牌桶容量，即允许的突发请求数
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate) if rate else 0.0
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        self._last = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    def try_acquire(self):
+        """
+        尝试立即获取一个令牌
+
+        Returns:
+            bool: 是否获取成功
+        """
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def wait_time(self):
+        """
+        距离下一个令牌可用还需等待的秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        阻塞直到获取一个令牌
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长时间录音
+录音回调把数据块放入有上限的缓冲队列，写入线程逐块追加到WAV文件并定期回写文件头，
+内存占用与录音时长无关，进程意外退出时已写入的录音仍可读取；
+支持按回车或静音超时结束的不定长录音，并可在停顿处自动切分为每句一个文件
+"""
+
+import collections
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from audio_pcm import TARGET_SAMPLE_RATE
+from vad import FRAME_SECONDS, MIN_SPEECH_DB, SPEECH_MARGIN_DB, DEFAULT_PADDING, frame_db, to_float_mono
+
+# 缓冲队列的容量(秒)，写入跟不上时最多缓存这么长的录音
+DEFAULT_BUFFER_SECONDS = 10.0
+
+# 每隔多少秒回写一次WAV文件头
+DEFAULT_FLUSH_SECONDS = 1.0
+
+# 切分的最短停顿(秒)
+DEFAULT_MIN_PAUSE = 0.8
+
+# 底噪跟踪: 初始假设为安静环境，电平更低时立即下调，否则按固定速度缓慢上调
+INITIAL_NOISE_DB = MIN_SPEECH_DB - SPEECH_MARGIN_DB
+NOISE_RISE_DB_PER_SECOND = 1.0
+
+_FRAME_BYTES = int(TARGET_SAMPLE_RATE * FRAME_SECONDS) * 2
+
+class WavWriter(object):
+    """
+    增量写入16位PCM WAV文件，每隔flush_seconds回写RIFF和data块长度并刷新到磁盘
+
+    Args:
+        path (str): 输出路径
+        sample_rate (int): 采样率
+        channels (int): 声道数
+        flush_seconds (float): 文件头回写间隔(秒)
+    """
+
+    def __init__(self, path, sample_rate=TARGET_SAMPLE_RATE, channels=1, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.flush_seconds = flush_seconds
+        self.data_bytes = 0
+        self._file = open(path, "wb")
+        self._last_flush = time.perf_counter()
+        self._write_header()
+
+    def _write_header(self):
+        block_align = self.channels * 2
+        self._file.write(b"RIFF" + struct.pack("<I", 36 + self.data_bytes) + b"WAVE")
+        self._file.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, self.channels, self.sample_rate,
+                                               self.sample_rate * block_align, block_align, 16))
+        self._file.write(b"data" + struct.pack("<I", self.data_bytes))
+
+    def write(self, data):
+        """
+        追加PCM数据
+        """
+        self._file.write(data)
+        self.data_bytes += len(data)
+        if time.perf_counter() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """
+        回写文件头中的长度并刷新到磁盘
+        """
+        position = self._file.tell()
+        self._file.seek(4)
+        self._file.write(struct.pack("<I", 36 + self.data_bytes))
+        self._file.seek(40)
+        self._file.write(struct.pack("<I", self.data_bytes))
+        self._file.seek(position)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.perf_counter()
+
+    @property
+    def duration(self):
+        return self.data_bytes / 2.0 / self.channels / self.sample_rate
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+class PauseDetector(object):
+    """
+    逐帧(20ms)判断语音/静音，底噪按最小值跟踪估计，只需常数内存；
+    语音判定与vad.speech_bounds一致: 高于底噪SPEECH_MARGIN_DB且不低于MIN_SPEECH_DB
+
+    Args:
+        threshold_db (float): 固定的语音电平阈值(dBFS)，None时自适应
+    """
+
+    def __init__(self, threshold_db=None):
+        self.threshold_db = threshold_db
+        self.noise_db = INITIAL_NOISE_DB
+
+    def is_speech(self, frame):
+        """
+        判断一帧(16kHz单声道int16字节)是否为语音
+        """
+        levels, _ = frame_db(to_float_mono(np.frombuffer(frame, dtype="<i2")), TARGET_SAMPLE_RATE)
+        if not len(levels):
+            return False
+        level = float(levels[0])
+        # 语音段通常不超过几秒，缓慢上调不会把语音误当成底噪，嘈杂环境下几十秒内收敛
+        self.noise_db = min(level, self.noise_db + NOISE_RISE_DB_PER_SECOND * FRAME_SECONDS)
+        threshold = self.threshold_db
+        if threshold is None:
+            threshold = max(self.noise_db + SPEECH_MARGIN_DB, MIN_SPEECH_DB)
+        return level > threshold
+
+class RecordingSession(object):
+    """
+    把实时音频源的数据逐帧写入磁盘
+
+    不切分时所有录音写入output；切分时output为文件名前缀，每句写入
+    "前缀_001.wav"等文件，句子之间超过min_pause的静音被去掉，句首句尾各保留padding秒
+
+    Args:
+        output (str): 输出WAV路径
+        split (bool): 是否在停顿处切分
+        min_pause (float): 切分的最短停顿(秒)
+        padding (float): 切分时在每句前后保留的静音(秒)
+        silence_timeout (float): 持续这么久没有语音时结束录音，None表示不检测
+        threshold_db (float): 固定的语音电平阈值(dBFS)，None时自适应
+        flush_seconds (float): WAV文件头回写间隔(秒)
+    """
+
+    def __init__(self, output, split=False, min_pause=DEFAULT_MIN_PAUSE, padding=DEFAULT_PADDING,
+                 silence_timeout=None, threshold_db=None, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.output = output
+        self.split = split
+        self.min_pause_frames = max(1, int(round(min_pause / FRAME_SECONDS)))
+        self.padding_frames = int(round(padding / FRAME_SECONDS))
+        self.silence_timeout_frames = int(round(silence_timeout / FRAME_SECONDS)) if silence_timeout else None
+        self.flush_seconds = flush_seconds
+        self.detector = PauseDetector(threshold_db)
+        self.files = []
+        self.frames = 0
+        self.timed_out = False
+        self._writer = None
+        self._silent_frames = 0
+        # 切分模式下句首之前的静音，最多保留padding帧
+        self._preroll = collections.deque(maxlen=max(1, self.padding_frames))
+        # 切分模式下句中超过padding的静音，停顿不足min_pause即恢复语音时补写，句子结束时丢弃
+        self._pause = collections.deque(maxlen=self.min_pause_frames)
+
+    def _open(self):
+        if self.split:
+            stem, ext = os.path.splitext(self.output)
+            path = f"{stem}_{len(self.files) + 1:03d}{ext or '.wav'}"
+        else:
+            path = self.output
+        self._writer = WavWriter(path, flush_seconds=self.flush_seconds)
+        self.files.append(path)
+        print(f"\n写入: {path}")
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            print(f"\n已保存: {self._writer.path} ({self._writer.duration:.2f}秒)")
+            self._writer = None
+        self._pause.clear()
+
+    def feed(self, frame):
+        """
+        处理一帧录音
+
+        Returns:
+            bool: 是否因静音超时需要结束录音
+        """
+        self.frames += 1
+        speech = self.detector.is_speech(frame) if len(frame) == _FRAME_BYTES else False
+        self._silent_frames = 0 if speech else self._silent_frames + 1
+
+        if not self.split:
+            if self._writer is None:
+                self._open()
+            self._writer.write(frame)
+        elif self._writer is None:
+            if speech:
+                self._open()
+                for previous in self._preroll:
+                    self._writer.write(previous)
+                self._preroll.clear()
+                self._writer.write(frame)
+            elif self.padding_frames:
+                self._preroll.append(frame)
+        else:
+            if speech:
+                for paused in self._pause:
+                    self._writer.write(paused)
+                self._pause.clear()
+                self._writer.write(frame)
+            elif self._silent_frames <= self.padding_frames:
+                self._writer.write(frame)
+            else:
+                self._pause.append(frame)
+            if self._silent_frames >= self.min_pause_frames:
+                self._close()
+
+        if self.silence_timeout_frames and self._silent_frames >= self.silence_timeout_frames:
+            self.timed_out = True
+        return self.timed_out
+
+    def run(self, source):
+        """
+        从音频源读取直到录音结束或静音超时
+
+        Args:
+            source (LiveAudioSource): 已start()的实时音频源
+
+        Returns:
+            list: 写入的文件路径
+        """
+        try:
+            while True:
+                frame = source.read(_FRAME_BYTES)
+                if not frame:
+                    break
+                if self.feed(frame):
+                    print(f"\n超过 {self.silence_timeout_frames * FRAME_SECONDS:.1f} 秒没有检测到语音，停止录音")
+                    source.stop()
+                    break
+                if self.frames % 50 == 0:
+                    print(f"\r已录制 {self.frames * FRAME_SECONDS:.0f} 秒", end="")
+        finally:
+            self._close()
+        if source.dropped_bytes:
+            print(f"警告: 写入跟不上录音，丢弃了 {source.dropped_bytes / 2.0 / TARGET_SAMPLE_RATE:.2f} 秒的数据")
+        return self.files
+
+def wait_for_enter(source):
+    """
+    在后台线程中等待回车，按下后停止录音
+    """
+    def wait():
+        try:
+            input()
+        except EOFError:
+            return
+        source.stop()
+
+    thread = threading.Thread(target=wait, daemon=True)
+    thread.start()
+    return thread
+
+def record_long(output, duration=None, split=False, min_pause=DEFAULT_MIN_PAUSE, padding=DEFAULT_PADDING,
+                silence_timeout=None, threshold_db=None, source=None, stop_on_enter=True,
+                buffer_seconds=DEFAULT_BUFFER_SECONDS):
+    """
+    长时间录音，逐块写入磁盘
+
+    Args:
+        output (str): 输出WAV路径，切分时作为文件名前缀
+        duration (float): 最长录音时长(秒)，None表示不限
+        split (bool): 是否在停顿处切分为每句一个文件
+        min_pause (float): 切分的最短停顿(秒)
+        padding (float): 切分时在每句前后保留的静音(秒)
+        silence_timeout (float): 持续这么久没有语音时结束录音，None表示不检测
+        threshold_db (float): 固定的语音电平阈值(dBFS)，None时自适应
+        source (LiveAudioSource): 音频源，None时使用麦克风
+        stop_on_enter (bool): 是否按回车结束录音
+        buffer_seconds (float): 缓冲队列的容量(秒)
+
+    Returns:
+        list: 写入的文件路径
+    """
+    from live_eval import DEFAULT_CHUNK, MicrophoneSource
+
+    if source is None:
+        max_chunks = max(1, int(buffer_seconds * TARGET_SAMPLE_RATE / DEFAULT_CHUNK))
+        source = MicrophoneSource(duration, max_chunks=max_chunks)
+
+    session = RecordingSession(output, split, min_pause, padding, silence_timeout, threshold_db)
+    hints = []
+    if duration:
+        hints.append(f"最长 {duration} 秒")
+    if stop_on_enter:
+        hints.append("按回车结束")
+    if silence_timeout:
+        hints.append(f"{silence_timeout} 秒无语音自动结束")
+    print("开始录音" + (f"({', '.join(hints)})" if hints else "") + "...")
+
+    source.start()
+    if stop_on_enter:
+        wait_for_enter(source)
+    try:
+        files = session.run(source)
+    except KeyboardInterrupt:
+        files = session.files
+    finally:
+        source.stop()
+    print(f"\n录音完成，共 {session.frames * FRAME_SECONDS:.2f} 秒，写入 {len(files)} 个文件")
+    return files
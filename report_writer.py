@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式对比报告
+评测结果到达时逐行追加到输出目录下的comparison.partial.jsonl，运行中即可查看；维度列、
+数值类型和按朗读者的汇总量随行累计。结束时对磁盘上的数据做外部排序(分块排序后归并)，
+逐块写出comparison.csv，comparison.xlsx通过openpyxl的只写模式逐行写出，峰值内存与结果行数无关
+"""
+
+import csv
+import heapq
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+
+from job_manifest import TAG_FIELDS, speaker_from_name
+
+# 外部排序每块的行数，也是写CSV时每次写出的行数
+DEFAULT_CHUNK_ROWS = 5000
+
+# 一次归并同时打开的有序文件数上限，超过时先分多轮归并为较少的文件
+MAX_MERGE_FANIN = 64
+
+# 终端摘要最多显示的行数
+MAX_PRINT_ROWS = 50
+
+# 不属于分数维度的字段
+EXCLUDED_FIELDS = frozenset(("error", "原始数据", "评测状态", "异常情况", "time_len", "content", "beg_pos",
+                             "end_pos", "word_count"))
+
+NAN = float("nan")
+
+def to_number(value):
+    """
+    转换为浮点数，规则与pandas.to_numeric一致
+
+    Returns:
+        float: 转换结果，空值为NaN，无法转换时返回None
+    """
+    if value is None:
+        return NAN
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+def _sort_key(seq, fields):
+    """
+    按总分从高到低排序，没有总分的行排在最后，分数相同时保持任务顺序
+    """
+    score = to_number(fields.get("总分"))
+    if score is None or math.isnan(score):
+        return [1, 0.0, seq]
+    return [0, -score, seq]
+
+def _read_run(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+class ReportWriter(object):
+    """
+    逐行追加评测结果，结束时生成comparison.csv/xlsx和朗读者区分度分析，可在多个线程间共享
+
+    Args:
+        output_dir (str): 输出目录
+        chunk_rows (int): 外部排序每块的行数
+    """
+
+    def __init__(self, output_dir, chunk_rows=DEFAULT_CHUNK_ROWS):
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        self.output_dir = output_dir
+        self.chunk_rows = max(1, chunk_rows)
+        self.rows = 0
+        self.spool_path = os.path.join(output_dir, "comparison.partial.jsonl")
+        self._spool = open(self.spool_path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._seq = 0
+        # 维度按首次出现的顺序排列
+        self._tags = set()
+        self._dimensions = []
+        self._known = set()
+        # 含无法转换为数值的值的维度，以及有数值的维度
+        self._mixed = set()
+        self._valued = set()
+        # {朗读者: {维度: [个数, 和, 平方和]}}
+        self._speaker_sums = {}
+        self._score_min = None
+        self._score_max = None
+
+    def add(self, name, analyzed, seq=None):
+        """
+        追加一个评测结果
+
+        Args:
+            name (str): 结果名称
+            analyzed (dict): analyze_result的分析结果
+            seq (int): 任务序号，分数相同时按序号排序，默认为追加顺序
+        """
+        fields = {}
+        speaker = str(analyzed.get("speaker") or speaker_from_name(name))
+        with self._lock:
+            if seq is None:
+                seq = self._seq
+            self._seq += 1
+            sums = self._speaker_sums.setdefault(speaker, {})
+            for key, value in analyzed.items():
+                if key in TAG_FIELDS:
+                    self._tags.add(key)
+                    fields[key] = value
+                    continue
+                if key in EXCLUDED_FIELDS:
+                    continue
+                fields[key] = value
+                if key not in self._known:
+                    self._known.add(key)
+                    self._dimensions.append(key)
+                number = to_number(value)
+                if number is None:
+                    self._mixed.add(key)
+                elif not math.isnan(number):
+                    self._valued.add(key)
+                    entry = sums.setdefault(key, [0, 0.0, 0.0])
+                    entry[0] += 1
+                    entry[1] += number
+                    entry[2] += number * number
+                    if key == "总分":
+                        self._score_min = number if self._score_min is None else min(self._score_min, number)
+                        self._score_max = number if self._score_max is None else max(self._score_max, number)
+            self._spool.write(json.dumps([seq, name, fields], ensure_ascii=False) + "\n")
+            self._spool.flush()
+            self.rows += 1
+
+    def header(self):
+        """
+        报告的列: 音频文件、清单标识列、各维度，没有总分时补一列空的总分
+        """
+        columns = ["音频文件"] + [t for t in TAG_FIELDS if t in self._tags] + self._dimensions
+        if "总分" not in self._known:
+            columns.append("总分")
+        return columns
+
+    def _sorted_runs(self, temp_dir):
+        """
+        分块读取暂存文件，每块排序后写为一个有序文件
+
+        Returns:
+            list: 有序文件路径
+        """
+        runs = []
+
+        def flush(chunk):
+            chunk.sort(key=lambda row: row[0])
+            path = os.path.join(temp_dir, f"run_{len(runs):05d}.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                for row in chunk:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            runs.append(path)
+
+        chunk = []
+        with open(self.spool_path, "r", encoding="utf-8") as f:
+            for line in f:
+                seq, name, fields = json.loads(line)
+                chunk.append([_sort_key(seq, fields), name, fields])
+                if len(chunk) >= self.chunk_rows:
+                    flush(chunk)
+                    chunk = []
+        if chunk:
+            flush(chunk)
+        return runs
+
+    def _merge_runs(self, runs, temp_dir):
+        """
+        有序文件多于MAX_MERGE_FANIN个时，每次归并MAX_MERGE_FANIN个为一个新文件，
+        直到剩余文件数不超过上限，保证同时打开的文件数有界
+
+        Returns:
+            iterator: 按排序键有序的行
+        """
+        level = 0
+        while len(runs) > MAX_MERGE_FANIN:
+            merged = []
+            for start in range(0, len(runs), MAX_MERGE_FANIN):
+                group = runs[start:start + MAX_MERGE_FANIN]
+                path = os.path.join(temp_dir, f"merge_{level:02d}_{len(merged):05d}.jsonl")
+                with open(path, "w", encoding="utf-8") as f:
+                    for row in heapq.merge(*[_read_run(p) for p in group], key=lambda row: row[0]):
+                        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                for p in group:
+                    os.remove(p)
+                merged.append(path)
+            runs = merged
+            level += 1
+        return heapq.merge(*[_read_run(path) for path in runs], key=lambda row: row[0])
+
+    def _cells(self, name, fields, columns):
+        cells = [name]
+        for column in columns[1:]:
+            value = fields.get(column)
+            if column not in self._tags:
+                # 维度列按列转换为数值，无法转换的值保留原样
+                number = to_number(value)
+                if number is not None:
+                    value = None if math.isnan(number) else number
+            cells.append(value)
+        return cells
+
+    def finish(self):
+        """
+        外部排序后写出comparison.csv和comparison.xlsx，打印摘要并分析朗读者区分度
+
+        Returns:
+            int: 报告行数
+        """
+        with self._lock:
+            self._spool.close()
+        if not self.rows:
+            os.remove(self.spool_path)
+            print("无结果可对比")
+            return 0
+
+        from openpyxl import Workbook
+
+        columns = self.header()
+        csv_path = os.path.join(self.output_dir, "comparison.csv")
+        excel_path = os.path.join(self.output_dir, "comparison.xlsx")
+        shown = ["音频文件"] + (["speaker"] if "speaker" in self._tags else []) + ["总分"]
+        shown_index = [columns.index(c) for c in shown]
+        preview = []
+
+        temp_dir = tempfile.mkdtemp(prefix=".comparison_", dir=self.output_dir)
+        try:
+            runs = self._sorted_runs(temp_dir)
+            merged = self._merge_runs(runs, temp_dir)
+
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet("Sheet1")
+            sheet.append(columns)
+            with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                chunk = []
+                for _, name, fields in merged:
+                    cells = self._cells(name, fields, columns)
+                    sheet.append(cells)
+                    chunk.append(["" if cell is None else cell for cell in cells])
+                    if len(chunk) >= self.chunk_rows:
+                        writer.writerows(chunk)
+                        chunk = []
+                    if len(preview) < MAX_PRINT_ROWS:
+                        preview.append([cells[i] for i in shown_index])
+                writer.writerows(chunk)
+            workbook.save(excel_path)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        os.remove(self.spool_path)
+
+        print(f"对比报告已保存到: {csv_path} 和 {excel_path}")
+
+        # 打印简单摘要，结果较多时只显示前几行
+        print("\n=== 评测结果对比 ===")
+        print("  ".join(shown))
+        for row in preview:
+            print("  ".join("NaN" if cell is None else str(cell) for cell in row))
+        if self.rows > MAX_PRINT_ROWS:
+            print(f"... 共 {self.rows} 条，完整结果见 {csv_path}")
+
+        self._analyze_speakers()
+
+        # 分析是否能区分不同speaker
+        if self.rows > 1:
+            score_range = (self._score_max - self._score_min) if self._score_min is not None else NAN
+            if score_range > 10:
+                print("\n系统能够明显区分不同的朗读者，分数差异较大")
+            elif 5 < score_range <= 10:
+                print("\n系统可以区分不同的朗读者，但分数差异不大")
+            else:
+                print("\n系统对不同朗读者的区分度较低")
+        return self.rows
+
+    def _analyze_speakers(self):
+        """
+        由逐行累计的汇总量按朗读者分析各维度的区分度
+        """
+        import numpy as np
+        from speaker_analysis import analyze_group_stats
+
+        dimensions = [d for d in self._dimensions if d in self._valued and d not in self._mixed]
+        labels = np.array(sorted(self._speaker_sums), dtype=str)
+        if not dimensions or len(labels) < 2:
+            return None
+        counts = np.zeros((len(labels), len(dimensions)))
+        sums = np.zeros_like(counts)
+        sumsq = np.zeros_like(counts)
+        for i, speaker in enumerate(labels):
+            entries = self._speaker_sums[speaker]
+            for j, dimension in enumerate(dimensions):
+                if dimension in entries:
+                    counts[i, j], sums[i, j], sumsq[i, j] = entries[dimension]
+        return analyze_group_stats(dimensions, labels, counts, sums, sumsq, self.output_dir)
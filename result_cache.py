@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测结果缓存
+以音频内容、评测文本和评测参数的哈希为键，将原始XML结果保存在SQLite中，
+重复评测相同的音频时直接返回缓存结果，不再消耗API配额
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 缓存格式版本，键的计算方式变化时递增
+CACHE_VERSION = 1
+
+def make_cache_key(audio, text, category_config, business):
+    """
+    计算缓存键
+
+    Args:
+        audio: 音频文件路径或音频字节
+        text (str): 评测文本
+        category_config (dict): CATEGORY_TYPES中的评测类型配置
+        business (dict): ssb参数帧中的业务参数
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_VERSION}\n".encode())
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        digest.update(audio)
+    else:
+        with open(audio, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    digest.update(b"\0" + text.encode("utf-8"))
+    digest.update(b"\0" + json.dumps(category_config, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    digest.update(b"\0" + json.dumps(business, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+class ResultCache(object):
+    """
+    基于SQLite的评测结果缓存，按容量和存活时间做LRU淘汰，可在多个线程间共享
+
+    Args:
+        path (str): 缓存数据库路径
+        max_bytes (int): 缓存XML总大小上限，None表示不限
+        max_age (float): 缓存条目最长存活时间(秒)，None表示不过期
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, max_age=None):
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, xml TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at)")
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        """
+        读取缓存的XML结果
+
+        Returns:
+            str: XML结果，未命中或已过期时返回None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT xml, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row and self.max_age is not None and now - row[1] > self.max_age:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, xml):
+        """
+        写入XML结果，超出容量时淘汰最久未使用的条目
+        """
+        now = time.time()
+        size = len(xml.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, xml, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, xml, size, now, now)
+            )
+            self._conn.commit()
+        if self.max_bytes is not None:
+            self.evict()
+
+    def evict(self):
+        """
+        删除过期条目，并按最近访问时间淘汰超出容量的条目
+
+        Returns:
+            int: 删除的条目数
+        """
+        removed = 0
+        with self._lock:
+            if self.max_age is not None:
+                cursor = self._conn.execute("DELETE FROM results WHERE created_at < ?",
+                                            (time.time() - self.max_age,))
+                removed += cursor.rowcount
+            if self.max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                if total > self.max_bytes:
+                    doomed = []
+                    for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY accessed_at"):
+                        if total <= self.max_bytes:
+                            break
+                        doomed.append((key,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+                    removed += len(doomed)
+            self._conn.commit()
+            self.evictions += removed
+        return removed
+
+    def stats(self):
+        """
+        缓存统计信息
+        """
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def print_stats(self):
+        """
+        打印缓存命中统计
+        """
+        stats = self.stats()
+        print(f"\n=== 结果缓存 ===")
+        print(f"命中: {stats['hits']}, 未命中: {stats['misses']}, 命中率: {stats['hit_rate']:.1%}")
+        print(f"条目: {stats['entries']}, 大小: {stats['bytes'] / 1024:.1f} KB, 淘汰: {stats['evictions']}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测结果存储
+评测会话完成后逐行追加到SQLite：分数按维度存为长表便于跨批次查询，
+原始XML压缩后存入单独的表，替代每个音频一个摘要文件和一个XML文件的输出方式
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    audio_dir TEXT,
+    test_type TEXT,
+    text TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    file_name TEXT NOT NULL,
+    audio_path TEXT,
+    test_type TEXT,
+    text TEXT,
+    finished_at REAL NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (run_id, seq)
+);
+CREATE TABLE IF NOT EXISTS scores (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    dimension TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, seq, dimension)
+);
+CREATE INDEX IF NOT EXISTS idx_scores_dimension ON scores(dimension, value);
+CREATE TABLE IF NOT EXISTS xml_blobs (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    xml BLOB NOT NULL,
+    PRIMARY KEY (run_id, seq)
+);
+"""
+
+def numeric_scores(analyzed):
+    """
+    提取分析结果中可转换为数值的字段
+    """
+    scores = {}
+    for key, value in analyzed.items():
+        if isinstance(value, bool):
+            continue
+        try:
+            scores[key] = float(value)
+        except (TypeError, ValueError):
+            continue
+    return scores
+
+class ResultsStore(object):
+    """
+    追加写入的评测结果库，可在多个线程间共享
+
+    Args:
+        path (str): 数据库路径
+        commit_every (int): 每追加多少行提交一次
+    """
+
+    def __init__(self, path, commit_every=20):
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.commit_every = max(1, commit_every)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def start_run(self, audio_dir=None, test_type=None, text=None, run_id=None):
+        """
+        登记一次批量评测
+
+        Returns:
+            str: 批次ID
+        """
+        run_id = run_id or time.strftime("%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:6]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, started_at, audio_dir, test_type, text) VALUES (?, ?, ?, ?, ?)",
+                (run_id, time.time(), audio_dir, test_type, text)
+            )
+            self._conn.commit()
+        return run_id
+
+    def append(self, run_id, seq, file_name, analyzed, xml=None, audio_path=None, test_type=None, text=None):
+        """
+        追加一条评测结果
+
+        Args:
+            run_id (str): 批次ID
+            seq (int): 文件在批次中的序号，用于还原顺序
+            file_name (str): 音频文件名
+            analyzed (dict): analyze_result的输出
+            xml (str): 原始XML，压缩后保存
+            audio_path (str): 音频路径
+            test_type (str): 测评类型
+            text (str): 测评文本
+        """
+        summary = {k: v for k, v in analyzed.items() if k != "原始数据"}
+        rows = [(run_id, seq, dim, value) for dim, value in numeric_scores(summary).items()]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (run_id, seq, file_name, audio_path, test_type, text, "
+                "finished_at, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, seq, file_name, audio_path, test_type, text, time.time(),
+                 json.dumps(summary, ensure_ascii=False))
+            )
+            self._conn.execute("DELETE FROM scores WHERE run_id = ? AND seq = ?", (run_id, seq))
+            self._conn.executemany("INSERT INTO scores (run_id, seq, dimension, value) VALUES (?, ?, ?, ?)", rows)
+            if xml:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO xml_blobs (run_id, seq, xml) VALUES (?, ?, ?)",
+                    (run_id, seq, zlib.compress(xml.encode("utf-8"), 6))
+                )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+
+    def flush(self):
+        """
+        提交尚未写入的行
+        """
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def runs(self):
+        """
+        列出所有批次及其结果数
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT r.run_id, r.started_at, r.audio_dir, r.test_type, r.text, COUNT(s.seq) "
+                "FROM runs r LEFT JOIN results s ON r.run_id = s.run_id "
+                "GROUP BY r.run_id ORDER BY r.started_at"
+            ).fetchall()
+
+    def latest_run(self):
+        with self._lock:
+            row = self._conn.execute("SELECT run_id FROM runs ORDER BY started_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def load_results(self, run_id):
+        """
+        按原始顺序读取一个批次的分析结果
+
+        Returns:
+            dict: {文件名: 分析结果}，与batch_test的返回值格式一致
+        """
+        return dict(self.iter_results(run_id))
+
+    def iter_results(self, run_id, page_size=1000):
+        """
+        按原始顺序分页读取一个批次的分析结果，内存占用与批次大小无关
+
+        Yields:
+            tuple: (文件名, 分析结果)
+        """
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT seq, file_name, summary FROM results WHERE run_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                    (run_id, last, page_size)
+                ).fetchall()
+            for seq, file_name, summary in rows:
+                yield file_name, json.loads(summary)
+            if len(rows) < page_size:
+                return
+            last = rows[-1][0]
+
+    def query_scores(self, dimension, run_ids=None):
+        """
+        跨批次查询某一维度的分数
+
+        Args:
+            dimension (str): 维度名，如"总分"
+            run_ids (list): 限定的批次ID，None表示所有批次
+
+        Returns:
+            list: [(批次ID, 文件名, 分数)]
+        """
+        sql = ("SELECT s.run_id, r.file_name, s.value FROM scores s "
+               "JOIN results r ON r.run_id = s.run_id AND r.seq = s.seq WHERE s.dimension = ?")
+        params = [dimension]
+        if run_ids:
+            sql += " AND s.run_id IN (%s)" % ",".join("?" * len(run_ids))
+            params.extend(run_ids)
+        sql += " ORDER BY s.run_id, s.seq"
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get_xml(self, run_id, file_name):
+        """
+        读取原始XML
+
+        Returns:
+            str: XML，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT x.xml FROM xml_blobs x JOIN results r ON r.run_id = x.run_id AND r.seq = x.seq "
+                "WHERE x.run_id = ? AND r.file_name = ? ORDER BY x.seq LIMIT 1", (run_id, file_name)
+            ).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+def export_run(store, run_id, output_dir):
+    """
+    将一个批次导出为comparison.csv/xlsx对比报告，结果逐页读取并写入报告
+
+    Returns:
+        int: 报告行数
+    """
+    from report_writer import ReportWriter
+
+    writer = ReportWriter(output_dir)
+    for file_name, analyzed in store.iter_results(run_id):
+        writer.add(file_name, analyzed)
+    return writer.finish()
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="评测结果库查询工具")
+    parser.add_argument("--db", type=str, required=True, help="结果库路径")
+    subparsers = parser.add_subparsers(dest="command", help="命令")
+
+    subparsers.add_parser("runs", help="列出所有批次")
+
+    export_parser = subparsers.add_parser("export", help="导出对比报告")
+    export_parser.add_argument("--run", type=str, help="批次ID，默认最近一次")
+    export_parser.add_argument("--output", type=str, required=True, help="输出目录")
+
+    query_parser = subparsers.add_parser("query", help="跨批次查询某一维度的分数")
+    query_parser.add_argument("--dimension", type=str, default="总分", help="维度名")
+    query_parser.add_argument("--run", type=str, action="append", help="批次ID，可重复指定")
+
+    xml_parser = subparsers.add_parser("xml", help="读取原始XML")
+    xml_parser.add_argument("--run", type=str, required=True, help="批次ID")
+    xml_parser.add_argument("--file", type=str, required=True, help="音频文件名")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"错误: 结果库 {args.db} 不存在")
+        return
+
+    store = ResultsStore(args.db)
+    try:
+        if args.command == "runs":
+            for run_id, started_at, audio_dir, test_type, text, count in store.runs():
+                started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started_at))
+                print(f"{run_id}  {started}  {count}条  {test_type}  {audio_dir}  {text}")
+        elif args.command == "export":
+            run_id = args.run or store.latest_run()
+            if not run_id:
+                print("结果库中没有批次")
+                return
+            export_run(store, run_id, args.output)
+        elif args.command == "query":
+            for run_id, file_name, value in store.query_scores(args.dimension, args.run):
+                print(f"{run_id}\t{file_name}\t{value}")
+        elif args.command == "xml":
+            xml = store.get_xml(args.run, args.file)
+            print(xml if xml else f"未找到 {args.file} 的XML结果")
+        else:
+            parser.print_help()
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
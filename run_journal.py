@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量评测检查点日志
+每完成一个评测会话就向JSONL日志追加一行，并按批次fsync落盘；
+中断后可据此跳过已完成的(音频, 文本, 类型)组合并重建对比报告
+"""
+
+import json
+import os
+import threading
+import time
+
+def job_key(audio_path, text, test_type):
+    """
+    评测任务的唯一标识
+    """
+    return (os.path.abspath(audio_path), text, test_type)
+
+def load_journal(path):
+    """
+    读取检查点日志，跳过因崩溃而写了一半的行
+
+    Returns:
+        dict: {任务标识: 日志条目}，同一任务以最后一条为准
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                key = job_key(entry["audio"], entry["text"], entry["type"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            entries[key] = entry
+    return entries
+
+class RunJournal(object):
+    """
+    追加写入的检查点日志，可在多个线程间共享
+
+    Args:
+        path (str): 日志路径
+        append (bool): 追加到已有日志(续跑)还是重新开始
+        fsync_every (int): 每写入多少条fsync一次
+        fsync_interval (float): 距上次fsync超过多少秒时立即fsync
+    """
+
+    def __init__(self, path, append=False, fsync_every=20, fsync_interval=2.0):
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+        if append:
+            self._repair_tail()
+
+    def _repair_tail(self):
+        # 上次崩溃可能留下没有换行的半行，补一个换行避免与新记录粘连
+        if self._file.tell() > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+                    self._file.flush()
+
+    def record(self, audio_path, text, test_type, file_name, analyzed):
+        """
+        记录一个已完成的评测会话
+        """
+        entry = {
+            "audio": os.path.abspath(audio_path),
+            "text": text,
+            "type": test_type,
+            "file_name": file_name,
+            "finished_at": time.time(),
+            "result": analyzed,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._pending += 1
+            if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._sync()
+                self._file.close()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+朗读者区分度分析
+对每个分数维度计算朗读者间/朗读者内方差、单因素方差分析F值、ICC(1)，
+朗读者平均分之间的距离矩阵，以及按朗读者重抽样的bootstrap置信区间。
+所有统计量基于NumPy按维度整体向量化计算
+"""
+
+import os
+import warnings
+
+import numpy as np
+
+# 计算距离矩阵的朗读者数上限，矩阵大小随朗读者数平方增长
+MAX_DISTANCE_SPEAKERS = 5000
+
+# 距离矩阵写为CSV的朗读者数上限，超过时只保存.npy
+MAX_DISTANCE_CSV = 1000
+
+def variance_components(counts, sums, sumsq):
+    """
+    由组汇总量计算方差分析各项，支持在第一维上批量计算(用于bootstrap)
+
+    Args:
+        counts, sums, sumsq (np.ndarray): (..., 组数, 维度数)
+
+    Returns:
+        dict: 各统计量，形状为(..., 维度数)
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = counts.sum(axis=-2)
+        k = (counts > 0).sum(axis=-2)
+        grand = sums.sum(axis=-2) / n
+        means = np.where(counts > 0, sums / counts, 0.0)
+        ss_between = (counts * means * means).sum(axis=-2) - n * grand * grand
+        ss_within = (sumsq - counts * means * means).sum(axis=-2)
+        ss_between = np.maximum(ss_between, 0.0)
+        ss_within = np.maximum(ss_within, 0.0)
+        df_between = k - 1
+        df_within = n - k
+        ms_between = ss_between / df_between
+        ms_within = np.where(df_within > 0, ss_within / df_within, np.nan)
+        # 非均衡设计下的平均组样本量
+        n0 = (n - (counts * counts).sum(axis=-2) / n) / df_between
+        icc = (ms_between - ms_within) / (ms_between + (n0 - 1) * ms_within)
+        return {
+            "n": n,
+            "speakers": k,
+            "mean": grand,
+            "between_var": ms_between,
+            "within_var": ms_within,
+            "f_value": ms_between / ms_within,
+            "eta_squared": ss_between / (ss_between + ss_within),
+            "icc": icc,
+            "between_sd": np.sqrt(ss_between / np.maximum(n, 1)),
+        }
+
+def _nan_percentile(values, q):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanpercentile(np.where(np.isfinite(values), values, np.nan), q, axis=0)
+
+def bootstrap_ci(counts, sums, sumsq, n_boot=1000, alpha=0.05, seed=0, chunk=None):
+    """
+    按朗读者整体有放回重抽样(每次抽中都作为独立的组)，计算ICC和朗读者间标准差的置信区间
+
+    Args:
+        counts, sums, sumsq (np.ndarray): 按朗读者汇总的计数、和、平方和
+        n_boot (int): 重抽样次数
+        alpha (float): 显著性水平
+        seed (int): 随机数种子
+        chunk (int): 每批计算的重抽样次数，控制内存占用
+
+    Returns:
+        dict: {统计量名: (下限, 上限)}，每项形状为(维度数,)
+    """
+    k, d = counts.shape
+    rng = np.random.default_rng(seed)
+    if chunk is None:
+        chunk = max(1, min(n_boot, 4000000 // max(1, k * d)))
+
+    samples = {"icc": [], "between_sd": []}
+    for start in range(0, n_boot, chunk):
+        draws = rng.integers(0, k, size=(min(chunk, n_boot - start), k))
+        boot = variance_components(counts[draws], sums[draws], sumsq[draws])
+        for name in samples:
+            samples[name].append(boot[name])
+
+    lower, upper = 100 * alpha / 2, 100 * (1 - alpha / 2)
+    intervals = {}
+    for name, parts in samples.items():
+        values = np.concatenate(parts, axis=0)
+        intervals[name] = (_nan_percentile(values, lower), _nan_percentile(values, upper))
+    return intervals
+
+def speaker_distances(means, present):
+    """
+    朗读者平均分向量之间的欧氏距离，各维度先标准化，缺失维度按均值处理
+
+    Args:
+        means (np.ndarray): 朗读者×维度的平均分
+        present (np.ndarray): 对应位置是否有数据
+
+    Returns:
+        np.ndarray: 朗读者×朗读者距离矩阵
+    """
+    values = np.where(present, means, np.nan)
+    with np.errstate(invalid="ignore"):
+        center = np.nanmean(values, axis=0)
+        scale = np.nanstd(values, axis=0)
+    scale = np.where(scale > 0, scale, 1.0)
+    z = np.nan_to_num((values - center) / scale)
+    sq = (z * z).sum(axis=1)
+    dist2 = sq[:, None] + sq[None, :] - 2.0 * z @ z.T
+    return np.sqrt(np.maximum(dist2, 0.0))
+
+def analyze_group_stats(dimensions, labels, counts, sums, sumsq, output_dir=None, n_boot=1000, seed=0):
+    """
+    分析各维度对朗读者的区分度，输入为按朗读者汇总的计数、和、平方和(NaN不计入)，
+    汇总量可以逐行累加得到，不需要保留所有分数
+
+    Args:
+        dimensions (list): 参与分析的数值维度
+        labels (np.ndarray): 朗读者，与汇总量的行对应
+        counts (np.ndarray): 朗读者数×维度数的有效分数个数
+        sums (np.ndarray): 分数和
+        sumsq (np.ndarray): 分数平方和
+        output_dir (str): 输出目录，指定时写入speaker_analysis.csv和距离矩阵
+        n_boot (int): bootstrap次数
+        seed (int): 随机数种子
+
+    Returns:
+        pd.DataFrame: 每个维度一行的统计结果，朗读者不足两人时返回None
+    """
+    import pandas as pd
+
+    if not dimensions or len(labels) < 2:
+        return None
+    stats = variance_components(counts, sums, sumsq)
+    repeated = (counts > 1).any(axis=0)
+    intervals = bootstrap_ci(counts, sums, sumsq, n_boot, seed=seed)
+
+    table = pd.DataFrame({
+        "维度": dimensions,
+        "样本数": stats["n"].astype(int),
+        "朗读者数": stats["speakers"].astype(int),
+        "均值": stats["mean"],
+        "朗读者间方差": stats["between_var"],
+        "朗读者内方差": np.where(repeated, stats["within_var"], np.nan),
+        "F值": np.where(repeated, stats["f_value"], np.nan),
+        "eta平方": np.where(repeated, stats["eta_squared"], np.nan),
+        "ICC": np.where(repeated, stats["icc"], np.nan),
+        "ICC_CI下限": np.where(repeated, intervals["icc"][0], np.nan),
+        "ICC_CI上限": np.where(repeated, intervals["icc"][1], np.nan),
+        "朗读者间标准差": stats["between_sd"],
+        "标准差_CI下限": intervals["between_sd"][0],
+        "标准差_CI上限": intervals["between_sd"][1],
+    })
+
+    if output_dir:
+        table.to_csv(os.path.join(output_dir, "speaker_analysis.csv"), index=False, encoding="utf-8-sig")
+
+        if len(labels) <= MAX_DISTANCE_SPEAKERS:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                means = sums / counts
+            distances = speaker_distances(means, counts > 0).astype(np.float32)
+            np.save(os.path.join(output_dir, "speaker_distances.npy"), distances)
+            if len(labels) <= MAX_DISTANCE_CSV:
+                pd.DataFrame(distances, index=labels, columns=labels).to_csv(
+                    os.path.join(output_dir, "speaker_distances.csv"), encoding="utf-8-sig")
+        else:
+            print(f"朗读者数 {len(labels)} 超过 {MAX_DISTANCE_SPEAKERS}，跳过距离矩阵")
+        print(f"朗读者区分度分析已保存到: {os.path.join(output_dir, 'speaker_analysis.csv')}")
+
+    return table
@@ -5,7 +5,6 @@
 用于测试语音评测功能并分析结果维度
 """
 
-import websocket
 import datetime
 import hashlib
 import base64
@@ -18,8 +17,16 @@ from wsgiref.handlers import format_date_time
 from datetime import datetime
 from time import mktime
 import os
-import xml.etree.ElementTree as ET
 import argparse
+from contextlib import contextmanager
+from result_cache import ResultCache, make_cache_key
+from audio_pcm import PCM_BITRATE, TARGET_SAMPLE_RATE, pcm_bytes
+from ise_xml import parse_result
+from ise_frames import iter_frames, prefetch, FrameEncoder, AUS_LAST
+from pacing import FramePacer, PACING_MODES, DEFAULT_FRAME_SIZE, DEFAULT_FRAME_INTERVAL, estimate_bitrate
+from ise_metrics import SessionMetrics
+from preflight import PREFLIGHT_MODES, SKIP_CODES
+from vad import DEFAULT_PADDING
 
 # 导入API配置
 try:
@@ -42,9 +49,14 @@ CATEGORY_TYPES = {
     "en_chapter": {"category": "read_chapter", "ent": "en_vip", "group": "pupil"},
 }
 
-def generate_url(api_secret, api_key):
+def generate_url(api_secret, api_key, url=None):
     """
     生成WebSocket连接URL
+    
+    Args:
+        api_secret (str): API Secret
+        api_key (str): API Key
+        url (str): 服务地址，默认使用配置中的host_url
     """
     now_time = datetime.now()
     now_date = format_date_time(mktime(now_time.timetuple()))
@@ -70,34 +82,252 @@ def generate_url(api_secret, api_key):
         "date": now_date,
         "host": "ise-api.xfyun.cn"
     }
-    ws_url = host_url + '?' + urlencode(dict_data)
+    ws_url = (url or host_url) + '?' + urlencode(dict_data)
     return ws_url
 
 class IseTest(object):
-    def __init__(self, audio_file, test_type="en_sentence", text=None):
-        self.audio_file = audio_file
+    def __init__(self, audio_file, test_type="en_sentence", text=None, host_url=None, cache=None,
+                 pacing="fixed", frame_size=DEFAULT_FRAME_SIZE, frame_interval=DEFAULT_FRAME_INTERVAL,
+                 prefetch_frames=0, pcm=None, preflight="off", trim_padding=None, stream=None, credential=None,
+                 pcm_cache=None):
+        self.audio_file = audio_file if audio_file else ("<实时录音>" if stream is not None else "<内存音频>")
         self.test_type = test_type
         self.text = text if text else "nice to meet you."
         self.result = None
-        self.ws_url = generate_url(api_secret, api_key)
+        self.error = None
+        
+        # 会话分阶段耗时
+        self.metrics = SessionMetrics(self.audio_file)
+        self.host_url = host_url
+        self.set_credential(credential)
+        self.cache = cache
+        self._cache_key = None
+        
+        # 内存PCM、实时录音和WAV文件以raw格式上传16kHz单声道PCM，其他文件按MP3(lame)上传
+        self.pcm = pcm
+        self.stream = stream
+        self._wav_pcm = None
+        # 解码PCM缓存，预检、静音裁剪和WAV上传共用以内存映射方式读取的同一份PCM
+        self.pcm_cache = pcm_cache
+        if stream is not None:
+            # 实时音频源按录音速度产生数据，读取时已经在等待，不再额外控制节奏
+            self.aue = "raw"
+            bitrate = PCM_BITRATE
+            pacing = "fast"
+        elif pcm is not None or self.audio_file.lower().endswith(".wav"):
+            self.aue = "raw"
+            bitrate = PCM_BITRATE
+        else:
+            self.aue = "lame"
+            bitrate = estimate_bitrate(self.audio_file) if pacing == "realtime" else None
+        
+        # 音频帧大小和发送节奏
+        self.frame_size = frame_size
+        self.prefetch_frames = prefetch_frames
+        self.pacer = FramePacer(pacing, frame_interval, bitrate)
+        
+        # 本地音频质量预检: off不预检, flag只标记, skip跳过预计失败的文件
+        self.preflight = preflight
+        self.preflight_report = None
+        
+        # 上传前裁剪首尾静音，trim_padding为语音前后保留的秒数，None表示不裁剪
+        self.trim_padding = trim_padding
+        self.trimmed_bytes = 0
+        self.trimmed_seconds = 0.0
         
         # 获取评测配置
         self.category = CATEGORY_TYPES[test_type]["category"]
         self.ent = CATEGORY_TYPES[test_type]["ent"]
         self.group = CATEGORY_TYPES[test_type]["group"]
     
+    def set_credential(self, credential=None):
+        """
+        设置会话使用的应用凭证并重新生成连接URL
+        
+        Args:
+            credential (Credential): 凭证池中的凭证，None时使用config.py中的配置
+        """
+        self.credential = credential
+        self.appid = credential.appid if credential is not None else appid
+        sign_start = time.perf_counter()
+        if credential is not None:
+            self.ws_url = generate_url(credential.api_secret, credential.api_key, self.host_url)
+        else:
+            self.ws_url = generate_url(api_secret, api_key, self.host_url)
+        self.metrics.sign_time = time.perf_counter() - sign_start
+    
+    def business_params(self):
+        """
+        构建参数帧(ssb)中的业务参数
+        """
+        business = {
+            "category": self.category,
+            "rstcd": "utf8",
+            "sub": "ise",
+            "group": self.group,
+            "ent": self.ent,
+            "tte": "utf-8",
+            "cmd": "ssb",
+            "auf": "audio/L16;rate=16000",
+            "aue": self.aue,
+            "text": '\uFEFF' + f"[content]\n{self.text}"
+        }
+        
+        # 如果是进阶测评，添加多维度分析参数
+        if "extra_ability" not in business:
+            business["extra_ability"] = "multi_dimension_score"
+        return business
+    
+    @classmethod
+    def from_pcm(cls, audio, sample_rate=TARGET_SAMPLE_RATE, channels=1, test_type="en_sentence",
+                 text=None, **kwargs):
+        """
+        使用内存中的音频创建评测，音频在内存中转换为16kHz单声道后以raw格式上传
+        
+        Args:
+            audio: 小端int16 PCM字节或NumPy数组
+            sample_rate (int): 音频采样率
+            channels (int): 声道数(字节输入时使用)
+            test_type (str): 测评类型
+            text (str): 测评文本
+        
+        Returns:
+            IseTest: 评测对象
+        """
+        from audio_pcm import to_pcm16_mono
+        
+        pcm = to_pcm16_mono(audio, sample_rate, channels)
+        return cls(None, test_type, text, pcm=pcm, **kwargs)
+    
+    @contextmanager
+    def _audio_source(self):
+        """
+        打开供iter_frames逐帧读取的音频源
+        """
+        if self.stream is not None:
+            # 实时录音边录边传，read()阻塞到录满一帧
+            yield self.stream
+        elif self.trim_padding is not None:
+            yield self._trimmed_audio()
+        elif self.pcm is not None:
+            yield pcm_bytes(self.pcm)
+        elif self.aue == "raw":
+            # WAV文件在内存中解码并统一格式，不生成中间文件；预检时已解码的直接复用
+            yield pcm_bytes(self._decoded_wav())
+        else:
+            with open(self.audio_file, "rb") as f:
+                yield f
+    
+    def _decoded_wav(self):
+        """
+        WAV文件解码后的16kHz单声道PCM，启用PCM缓存时为缓存文件的内存映射
+        """
+        if self._wav_pcm is None:
+            if self.pcm_cache is not None:
+                self._wav_pcm = self.pcm_cache.load(self.audio_file)
+            else:
+                from audio_pcm import read_wav_pcm
+                
+                self._wav_pcm = read_wav_pcm(self.audio_file)
+        return self._wav_pcm
+    
+    def _trimmed_audio(self):
+        """
+        在内存中裁剪首尾静音，PCM直接切片，MP3按帧截取
+        """
+        from preflight import decode_audio
+        from vad import trim_pcm, trim_mp3
+        
+        if self.aue == "raw":
+            pcm = self.pcm if self.pcm is not None else self._decoded_wav()
+            trimmed, removed = trim_pcm(pcm, TARGET_SAMPLE_RATE, self.trim_padding)
+            self.trimmed_bytes = removed * 2
+            self.trimmed_seconds = removed / float(TARGET_SAMPLE_RATE)
+            return pcm_bytes(trimmed)
+        
+        with open(self.audio_file, "rb") as f:
+            data = f.read()
+        try:
+            if self.pcm_cache is not None:
+                # MP3仍按原文件上传，缓存的PCM只用于定位语音
+                samples, rate = self.pcm_cache.load(self.audio_file), TARGET_SAMPLE_RATE
+            else:
+                samples, rate, _ = decode_audio(self.audio_file)
+        except Exception as e:
+            print(f"无法解码音频，不裁剪静音: {e}")
+            return data
+        trimmed, self.trimmed_seconds = trim_mp3(data, samples, rate, self.trim_padding)
+        self.trimmed_bytes = len(data) - len(trimmed)
+        return trimmed
+    
+    def load_cached(self):
+        """
+        从结果缓存中读取评测结果
+        
+        Returns:
+            str: 缓存的XML结果，未启用缓存或未命中时返回None
+        """
+        if self.cache is None or self.stream is not None:
+            return None
+        if self._cache_key is None:
+            audio = pcm_bytes(self.pcm) if self.pcm is not None else self.audio_file
+            category_config = CATEGORY_TYPES[self.test_type]
+            if self.trim_padding is not None:
+                # 裁剪后上传的音频不同，与未裁剪的结果分开缓存
+                category_config = dict(category_config, trim_padding=self.trim_padding)
+            self._cache_key = make_cache_key(audio, self.text, category_config, self.business_params())
+            self.result = self.cache.get(self._cache_key)
+        return self.result
+    
+    def check_audio(self):
+        """
+        本地预检音频质量，结果会被保存，重复调用不会重新解码
+        
+        Returns:
+            PreflightReport: 预检结果
+        """
+        from preflight import analyze_samples, check_file
+        
+        if self.preflight_report is None:
+            if self.pcm is not None:
+                self.preflight_report = analyze_samples(self.pcm, TARGET_SAMPLE_RATE, self.audio_file)
+            else:
+                report, samples, rate = check_file(self.audio_file, pcm_cache=self.pcm_cache)
+                if samples is not None and self.aue == "raw":
+                    from audio_pcm import to_pcm16_mono
+                    
+                    self._wav_pcm = to_pcm16_mono(samples, rate)
+                self.preflight_report = report
+        return self.preflight_report
+    
+    def preflight_failed(self):
+        """
+        skip模式下音频是否有高置信度的预计失败
+        """
+        return self.preflight == "skip" and self.check_audio().skippable
+    
     def on_message(self, ws, message):
         """
         接收消息回调
         """
+        self.metrics.mark("first_message")
         data = json.loads(message)
         code = data["code"]
-        sid = data["sid"]
-        status = data["data"]["status"]
+        sid = data.get("sid")
         
+        # 服务端返回错误时不携带评测数据
+        if code != 0:
+            self.error = {"code": code, "message": data.get("message"), "sid": sid}
+            self.metrics.error_code = code
+            print(f"评测失败: sid={sid}, code={code}, message={data.get('message')}")
+            ws.close()
+            return
+        
+        status = data["data"]["status"]
         print(f"接收消息: sid={sid}, status={status}, code={code}")
         
         if status == 2:
+            self.metrics.mark("final_result")
             xml_data = base64.b64decode(data["data"]["data"])
             self.result = xml_data.decode("utf-8")
             print("评测结果已接收")
@@ -119,96 +349,37 @@ class IseTest(object):
         """
         连接建立回调
         """
+        self.metrics.mark("handshake")
         print(f"连接已建立")
         
         # 构建第一帧数据，包含评测参数
         send_dict = {
             "common": {
-                "app_id": appid
-            },
-            "business": {
-                "category": self.category,
-                "rstcd": "utf8",
-                "sub": "ise",
-                "group": self.group,
-                "ent": self.ent,
-                "tte": "utf-8",
-                "cmd": "ssb",
-                "auf": "audio/L16;rate=16000",
-                "aue": "lame",
-                "text": '\uFEFF' + f"[content]\n{self.text}"
+                "app_id": self.appid
             },
+            "business": self.business_params(),
             "data": {
                 "status": 0,
                 "data": ""
             }
         }
         
-        # 如果是进阶测评，添加多维度分析参数
-        if "extra_ability" not in send_dict["business"]:
-            send_dict["business"]["extra_ability"] = "multi_dimension_score"
-        
         # 发送第一帧数据(参数帧)
         ws.send(json.dumps(send_dict))
         
-        # 读取音频文件并发送
-        with open(self.audio_file, "rb") as f:
-            audio_data = f.read()
-            
-        # 计算每一帧大小和数量
-        frame_size = 1280
-        frames = [audio_data[i:i+frame_size] for i in range(0, len(audio_data), frame_size)]
-        
-        # 发送音频数据
-        for i, frame in enumerate(frames):
-            # 第一帧
-            if i == 0:
-                send_dict = {
-                    "business": {
-                        "cmd": "auw",
-                        "aus": 1,
-                        "aue": "lame"
-                    },
-                    "data": {
-                        "status": 1,
-                        "data": str(base64.b64encode(frame).decode()),
-                        "data_type": 1,
-                        "encoding": "raw"
-                    }
-                }
-            # 最后一帧
-            elif i == len(frames) - 1:
-                send_dict = {
-                    "business": {
-                        "cmd": "auw", 
-                        "aus": 4,
-                        "aue": "lame"
-                    },
-                    "data": {
-                        "status": 2, 
-                        "data": str(base64.b64encode(frame).decode())
-                    }
-                }
-                print("发送最后一帧数据")
-            # 中间帧
-            else:
-                send_dict = {
-                    "business": {
-                        "cmd": "auw",
-                        "aus": 2,
-                        "aue": "lame"
-                    },
-                    "data": {
-                        "status": 1,
-                        "data": str(base64.b64encode(frame).decode()),
-                        "data_type": 1,
-                        "encoding": "raw"
-                    }
-                }
-            
-            # 发送音频帧
-            ws.send(json.dumps(send_dict))
-            time.sleep(0.04)  # 控制发送速率
+        # 逐帧读取并发送音频数据，文件不会整个读入内存
+        encoder = FrameEncoder(self.aue)
+        with self._audio_source() as source:
+            messages = encoder.encode_frames(iter_frames(source, self.frame_size))
+            for message, nbytes, aus in prefetch(messages, self.prefetch_frames):
+                if aus == AUS_LAST:
+                    print("发送最后一帧数据")
+                
+                # 发送音频帧，并按节奏模式控制发送速率
+                ws.send(message)
+                self.metrics.sent(nbytes)
+                self.pacer.sent(nbytes)
+        self.metrics.mark("last_frame")
 
     def run(self):
         """
@@ -218,6 +389,28 @@ class IseTest(object):
         print(f"测评类型: {self.test_type}")
         print(f"测评文本: {self.text}")
         
+        # 命中缓存时直接返回，不再请求服务
+        self.metrics.start()
+        if self.load_cached():
+            print("命中结果缓存，跳过评测")
+            self.metrics.finish("cached")
+            return self.result
+        
+        # 预检音频质量，skip模式下预计失败的文件不再请求服务
+        if self.preflight != "off" and self.stream is None:
+            report = self.check_audio()
+            if not report.ok:
+                print(f"预检未通过: {report.describe()}")
+                if self.preflight == "skip" and report.skippable:
+                    print("预计评测失败，跳过评测")
+                    code = next(code for code in report.predicted if code in SKIP_CODES)
+                    self.error = {"code": code, "message": report.describe(), "sid": None}
+                    self.metrics.finish("preflight")
+                    return None
+        
+        # 只在需要请求服务时导入
+        import websocket
+        
         start_time = datetime.now()
         websocket.enableTrace(False)
         
@@ -231,13 +424,49 @@ class IseTest(object):
         )
         
         # 运行WebSocket连接
+        self.metrics.mark("connect")
         ws.run_forever(sslopt={"cert_reqs": ssl.CERT_NONE})
         
         end_time = datetime.now()
-        print(f"评测耗时: {end_time - start_time}")
+        print(f"评测耗时: {end_time - start_time} (节奏模式: {self.pacer.mode}, "
+              f"帧大小: {self.frame_size}, 上传耗时: {self.pacer.upload_time:.3f}秒)")
+        
+        if self.result:
+            status = "ok"
+        elif self.error:
+            status = "error"
+        else:
+            status = "failed"
+        self.metrics.trimmed_bytes = self.trimmed_bytes
+        self.metrics.trimmed_seconds = self.trimmed_seconds
+        self.metrics.finish(status)
+        print(f"分阶段耗时: {self.metrics.describe()}")
+        if self.trim_padding is not None and self.stream is None:
+            print(f"静音裁剪: 去除 {self.trimmed_bytes} 字节, {self.trimmed_seconds:.2f} 秒")
+        
+        if self.result and self.cache is not None and self._cache_key is not None:
+            self.cache.put(self._cache_key, self.result)
         
         return self.result
 
+def evaluate_audio(audio, sample_rate=TARGET_SAMPLE_RATE, channels=1, test_type="en_sentence",
+                   text=None, **kwargs):
+    """
+    评测内存中的音频
+    
+    Args:
+        audio: 小端int16 PCM字节或NumPy数组
+        sample_rate (int): 音频采样率
+        channels (int): 声道数(字节输入时使用)
+        test_type (str): 测评类型
+        text (str): 测评文本
+        **kwargs: 传给IseTest的其他参数
+    
+    Returns:
+        str: XML格式的评测结果
+    """
+    return IseTest.from_pcm(audio, sample_rate, channels, test_type, text, **kwargs).run()
+
 def analyze_result(xml_str):
     """
     分析XML格式的评测结果
@@ -246,18 +475,18 @@ def analyze_result(xml_str):
         return {"error": "未获取到有效结果"}
     
     try:
-        # 解析XML
-        root = ET.fromstring(xml_str)
+        # 流式解析XML，这里只需要顶层节点的属性
+        parsed = parse_result(xml_str, max_depth=1)
         
         # 获取基本信息
         result = {
-            "总分": root.get("total_score"),
+            "总分": parsed.total_score,
         }
         
         # 提取所有属性
-        for child in root:
-            if child.tag == "read_sentence" or child.tag == "read_chapter" or child.tag == "read_word":
-                for attr, value in child.attrib.items():
+        for tag, attrib in parsed.top_nodes:
+            if tag == "read_sentence" or tag == "read_chapter" or tag == "read_word":
+                for attr, value in attrib.items():
                     result[f"{attr}"] = value
         
         # 添加各个维度分数
@@ -317,9 +546,12 @@ def save_result(result, output_path):
     
     print(f"结果已保存到: {output_path}")
 
-def main():
+def main(argv=None):
     """
     主函数
+    
+    Args:
+        argv (list): 命令行参数，None时使用sys.argv
     """
     parser = argparse.ArgumentParser(description="讯飞语音评测测试工具")
     parser.add_argument("--audio", type=str, required=True, help="音频文件路径")
@@ -328,8 +560,26 @@ def main():
                         help="测评类型")
     parser.add_argument("--text", type=str, help="测评文本")
     parser.add_argument("--output", type=str, help="输出文件路径")
+    parser.add_argument("--host-url", type=str, help="评测服务地址(可指向本地模拟服务)")
+    parser.add_argument("--cache", type=str, help="结果缓存数据库路径，相同音频和参数直接返回缓存结果")
+    parser.add_argument("--pcm-cache", type=str, help="解码PCM缓存目录，预检、裁剪、分段和WAV上传共用解码结果")
+    parser.add_argument("--pacing", type=str, default="fixed", choices=PACING_MODES,
+                        help="音频帧发送节奏: fixed固定间隔, realtime按音频码率实时发送, fast不等待")
+    parser.add_argument("--frame-size", type=int, default=DEFAULT_FRAME_SIZE, help="每帧音频字节数")
+    parser.add_argument("--frame-interval", type=float, default=DEFAULT_FRAME_INTERVAL,
+                        help="fixed模式下每帧发送间隔(秒)")
+    parser.add_argument("--prefetch-frames", type=int, default=0,
+                        help="后台线程预先编码的音频帧数，0表示不预取")
+    parser.add_argument("--preflight", type=str, default="off", choices=PREFLIGHT_MODES,
+                        help="本地音频质量预检: off不预检, flag只提示, skip预计失败时不调用评测")
+    parser.add_argument("--trim-silence", action="store_true", help="上传前在内存中裁剪首尾静音")
+    parser.add_argument("--trim-padding", type=float, default=DEFAULT_PADDING,
+                        help="裁剪静音时在语音前后保留的秒数")
+    parser.add_argument("--segmented", action="store_true",
+                        help="篇章类型按停顿切分为多段并发评测，再合并为篇章结果")
+    parser.add_argument("--segment-workers", type=int, default=4, help="分段评测时同时进行的会话数")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # 检查音频文件是否存在
     if not os.path.exists(args.audio):
@@ -354,8 +604,36 @@ def main():
         args.output = f"result_{audio_name.split('.')[0]}_{args.type}.txt"
     
     # 执行测评
-    tester = IseTest(args.audio, args.type, args.text)
-    result = tester.run()
+    cache = ResultCache(args.cache) if args.cache else None
+    pcm_cache = None
+    if args.pcm_cache:
+        from pcm_cache import PcmCache
+
+        pcm_cache = PcmCache(args.pcm_cache)
+    if args.segmented:
+        # 分段评测才需要NumPy
+        from chapter_segmenter import SEGMENT_TYPES, evaluate_chapter
+    if args.segmented and args.type in SEGMENT_TYPES:
+        # 分段的位置按整段音频换算，不对各段做静音裁剪和预检
+        result, _ = evaluate_chapter(args.audio, args.text, args.type, args.segment_workers, ise_kwargs={
+            "host_url": args.host_url, "cache": cache, "pacing": args.pacing, "frame_size": args.frame_size,
+            "frame_interval": args.frame_interval, "prefetch_frames": args.prefetch_frames,
+            "pcm_cache": pcm_cache,
+        })
+    else:
+        if args.segmented:
+            print(f"分段评测只支持篇章类型，{args.type} 按整段评测")
+        tester = IseTest(args.audio, args.type, args.text, host_url=args.host_url, cache=cache,
+                         pacing=args.pacing, frame_size=args.frame_size, frame_interval=args.frame_interval,
+                         prefetch_frames=args.prefetch_frames, preflight=args.preflight,
+                         trim_padding=args.trim_padding if args.trim_silence else None, pcm_cache=pcm_cache)
+        result = tester.run()
+    if cache is not None:
+        cache.print_stats()
+        cache.close()
+    if pcm_cache is not None:
+        pcm_cache.print_stats()
+        pcm_cache.close()
     
     if result:
         # 分析结果
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于帧能量的静音检测与裁剪
+在内存中去掉录音首尾的静音(保留一定余量)后再上传，减少上传的帧数和会话时长；
+PCM直接切片，MP3按帧边界截取，不重新编码
+"""
+
+from pacing import mp3_frames
+
+# 分析帧长(秒)
+FRAME_SECONDS = 0.02
+
+# 裁剪后在语音前后保留的时长(秒)
+DEFAULT_PADDING = 0.2
+
+# 语音帧判定: 高于底噪的dB数，且不低于绝对电平下限
+SPEECH_MARGIN_DB = 10.0
+MIN_SPEECH_DB = -50.0
+
+# 电平下限，避免对全零帧取对数
+FLOOR_DB = -120.0
+
+def to_db(values):
+    """
+    幅度转换为dBFS
+    """
+    import numpy as np
+
+    return 20.0 * np.log10(np.maximum(values, 10 ** (FLOOR_DB / 20.0)))
+
+def to_float_mono(samples):
+    """
+    将整数或浮点样本(形状为(n,)或(n, channels))转换为[-1, 1]的单声道浮点数组
+    """
+    import numpy as np
+
+    samples = np.asarray(samples)
+    if np.issubdtype(samples.dtype, np.integer):
+        data = samples.astype(np.float32) / (float(np.iinfo(samples.dtype).max) + 1)
+    else:
+        data = samples.astype(np.float32)
+    return data.mean(axis=1) if data.ndim > 1 else data
+
+def frame_db(mono, sample_rate, frame_seconds=FRAME_SECONDS):
+    """
+    按帧计算RMS电平，不足一帧的尾部忽略
+
+    Args:
+        mono (np.ndarray): 单声道浮点音频
+        sample_rate (int): 采样率
+        frame_seconds (float): 帧长(秒)
+
+    Returns:
+        tuple: (每帧电平dBFS数组, 帧长样本数)
+    """
+    import numpy as np
+
+    frame_len = max(1, int(sample_rate * frame_seconds))
+    n_frames = len(mono) // frame_len
+    frames = mono[:n_frames * frame_len].reshape(n_frames, frame_len)
+    return to_db(np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))), frame_len
+
+def speech_bounds(samples, sample_rate, padding=DEFAULT_PADDING, margin_db=SPEECH_MARGIN_DB,
+                  min_db=MIN_SPEECH_DB):
+    """
+    检测第一个和最后一个语音帧的位置
+
+    Args:
+        samples (np.ndarray): 整数或浮点样本，形状为(n,)或(n, channels)
+        sample_rate (int): 采样率
+        padding (float): 在语音前后保留的时长(秒)
+        margin_db (float): 语音帧需高于底噪的dB数
+        min_db (float): 语音帧的最低电平(dBFS)
+
+    Returns:
+        tuple: 保留区间的(起始样本, 结束样本)，没有检测到语音时返回None
+    """
+    import numpy as np
+
+    mono = to_float_mono(samples)
+    levels, frame_len = frame_db(mono, sample_rate)
+    if not len(levels):
+        return None
+    threshold = max(np.percentile(levels, 10) + margin_db, min_db)
+    speech = np.flatnonzero(levels > threshold)
+    if not len(speech):
+        return None
+    pad = int(round(padding * sample_rate))
+    start = max(0, speech[0] * frame_len - pad)
+    end = min(len(mono), (speech[-1] + 1) * frame_len + pad)
+    return int(start), int(end)
+
+def trim_pcm(pcm, sample_rate, padding=DEFAULT_PADDING):
+    """
+    裁剪PCM首尾的静音
+
+    Args:
+        pcm (np.ndarray): 一维int16数组
+        sample_rate (int): 采样率
+        padding (float): 在语音前后保留的时长(秒)
+
+    Returns:
+        tuple: (裁剪后的数组视图, 去掉的样本数)
+    """
+    bounds = speech_bounds(pcm, sample_rate, padding)
+    if bounds is None:
+        return pcm, 0
+    start, end = bounds
+    return pcm[start:end], len(pcm) - (end - start)
+
+def trim_mp3(data, samples, sample_rate, padding=DEFAULT_PADDING):
+    """
+    按帧边界截取MP3首尾的静音，不重新编码
+
+    Args:
+        data (bytes): MP3文件内容
+        samples (np.ndarray): 解码后的样本，用于检测语音位置
+        sample_rate (int): 解码后的采样率
+        padding (float): 在语音前后保留的时长(秒)
+
+    Returns:
+        tuple: (截取后的MP3数据, 去掉的时长秒数)
+    """
+    bounds = speech_bounds(samples, sample_rate, padding)
+    if bounds is None:
+        return data, 0.0
+    begin, end = bounds[0] / float(sample_rate), bounds[1] / float(sample_rate)
+
+    kept = []
+    removed = 0.0
+    position = 0.0
+    for offset, length, frame_samples, frame_rate, is_info in mp3_frames(data):
+        duration = frame_samples / float(frame_rate)
+        if is_info:
+            # 信息帧记录的总帧数在截取后不再正确，直接去掉
+            continue
+        # 多保留前一帧，弥补bit reservoir引用前帧数据造成的起始失真
+        if position + duration > begin - duration and position < end:
+            kept.append(bytes(data[offset:offset + length]))
+        else:
+            removed += duration
+        position += duration
+    if not kept:
+        return data, 0.0
+    return b"".join(kept), removed
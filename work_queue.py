@@ -0,0 +1,634 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分布式批量评测任务队列
+任务和结果保存在共享文件系统上的SQLite数据库中，不需要额外的消息服务：
+协调端登记任务，多台机器上的多个工作进程以租约方式领取任务，租约过期(进程退出)的任务重新分配，
+结果以任务ID为主键写入，同一任务只记录一次；全部完成后由协调端合并为comparison.csv等对比报告
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from job_manifest import Job, directory_jobs, iter_manifest
+
+# 默认租约时长(秒)，工作进程在租约期内定期续约
+DEFAULT_LEASE_SECONDS = 120.0
+
+# 一个任务最多尝试的次数，超过后标记为失败
+DEFAULT_MAX_ATTEMPTS = 3
+
+# 没有可领取的任务时的轮询间隔(秒)
+POLL_INTERVAL = 2.0
+
+# 共享文件系统(NFS等)上无法使用WAL需要的共享内存，使用默认的回滚日志模式
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    audio TEXT NOT NULL,
+    text TEXT,
+    test_type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    tags TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_token TEXT,
+    lease_expires REAL,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_unique ON jobs(audio, text, test_type, name);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    job_id INTEGER PRIMARY KEY,
+    worker TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    name TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    xml BLOB
+);
+"""
+
+def worker_id():
+    """
+    当前工作进程的标识: 主机名:进程号
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class Lease(object):
+    """
+    一个已领取的任务
+
+    Attributes:
+        job (Job): 评测任务，index为任务ID
+        token (str): 租约令牌，续约和提交结果时校验
+    """
+
+    __slots__ = ("job", "token")
+
+    def __init__(self, job, token):
+        self.job = job
+        self.token = token
+
+class WorkQueue(object):
+    """
+    基于SQLite的任务队列，可在多个线程和进程间共享
+
+    Args:
+        path (str): 队列数据库路径，多台机器使用时放在共享文件系统上
+        lease_seconds (float): 租约时长(秒)
+        max_attempts (int): 一个任务最多尝试的次数
+    """
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=60)
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self, func):
+        """
+        在写事务中执行func(conn)，BEGIN IMMEDIATE保证多个进程间的领取和提交互斥
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = func(self._conn)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return value
+
+    def enqueue(self, jobs, batch_size=500):
+        """
+        登记任务，已登记的(音频, 文本, 类型, 名称)组合不会重复登记
+
+        Args:
+            jobs: Job的列表或迭代器
+            batch_size (int): 每个事务写入的任务数
+
+        Returns:
+            int: 新登记的任务数
+        """
+        added = 0
+        batch = []
+
+        def insert(conn):
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO jobs (audio, text, test_type, name, tags, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", batch
+            )
+            return cursor.rowcount
+
+        for job in jobs:
+            tags = job.tags()
+            batch.append((os.path.abspath(job.audio), job.text, job.test_type, job.name,
+                          json.dumps(tags, ensure_ascii=False) if tags else None, time.time()))
+            if len(batch) >= batch_size:
+                added += self._transaction(insert)
+                batch = []
+        if batch:
+            added += self._transaction(insert)
+        return added
+
+    def lease(self, owner, limit=1):
+        """
+        领取待处理或租约已过期的任务
+
+        Args:
+            owner (str): 工作进程标识
+            limit (int): 最多领取的任务数
+
+        Returns:
+            list: Lease列表，没有可领取的任务时为空
+        """
+        def take(conn):
+            now = time.time()
+            rows = conn.execute(
+                "SELECT job_id, audio, text, test_type, name, tags FROM jobs "
+                "WHERE (state = 'pending' OR (state = 'leased' AND lease_expires < ?)) "
+                "ORDER BY job_id LIMIT ?", (now, limit)
+            ).fetchall()
+            leases = []
+            for job_id, audio, text, test_type, name, tags in rows:
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_token = ?, lease_expires = ?, updated_at = ? WHERE job_id = ?",
+                    (owner, token, now + self.lease_seconds, now, job_id)
+                )
+                job = QueuedJob(job_id, audio, text, test_type, name, json.loads(tags) if tags else {})
+                leases.append(Lease(job, token))
+            return leases
+        return self._transaction(take)
+
+    def renew(self, leases):
+        """
+        为仍在处理的任务续约
+
+        Returns:
+            int: 续约成功的任务数，租约已被他人接管的任务不计入
+        """
+        def extend(conn):
+            expires = time.time() + self.lease_seconds
+            renewed = 0
+            for lease in leases:
+                renewed += conn.execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND lease_token = ? AND state = 'leased'",
+                    (expires, lease.job.index, lease.token)
+                ).rowcount
+            return renewed
+        return self._transaction(extend) if leases else 0
+
+    def complete(self, lease, owner, analyzed, xml=None):
+        """
+        记录任务结果，结果表以任务ID为主键，同一任务只记录第一次提交的结果；
+        租约过期后被重新分配的任务，先完成的一方的结果有效
+
+        Returns:
+            bool: 本次提交是否被记录
+        """
+        summary = {k: v for k, v in analyzed.items() if k != "原始数据"}
+        blob = zlib.compress(xml.encode("utf-8"), 6) if xml else None
+
+        def record(conn):
+            now = time.time()
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO results (job_id, worker, finished_at, name, summary, xml) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (lease.job.index, owner, now, lease.job.name, json.dumps(summary, ensure_ascii=False), blob)
+            ).rowcount
+            conn.execute(
+                "UPDATE jobs SET state = 'done', lease_owner = NULL, lease_token = NULL, lease_expires = NULL, "
+                "error = NULL, updated_at = ? WHERE job_id = ?", (now, lease.job.index)
+            )
+            return inserted == 1
+        return self._transaction(record)
+
+    def fail(self, lease, error):
+        """
+        任务处理失败，未超过最多尝试次数时放回队列
+
+        Returns:
+            str: 任务的新状态，租约已被他人接管时返回None
+        """
+        def release(conn):
+            row = conn.execute("SELECT attempts FROM jobs WHERE job_id = ? AND lease_token = ? AND state = 'leased'",
+                               (lease.job.index, lease.token)).fetchone()
+            if row is None:
+                return None
+            state = "pending" if row[0] < self.max_attempts else "failed"
+            conn.execute(
+                "UPDATE jobs SET state = ?, lease_owner = NULL, lease_token = NULL, lease_expires = NULL, "
+                "error = ?, updated_at = ? WHERE job_id = ?", (state, error, time.time(), lease.job.index)
+            )
+            return state
+        return self._transaction(release)
+
+    def release(self, lease):
+        """
+        未评测就放弃的任务(如凭证池配额用尽)放回队列，领取时增加的尝试次数一并撤销
+
+        Returns:
+            bool: 是否放回，租约已被他人接管时返回False
+        """
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET state = 'pending', attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+            "lease_token = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE job_id = ? AND lease_token = ? AND state = 'leased'",
+            (time.time(), lease.job.index, lease.token)
+        ).rowcount == 1)
+
+    def requeue_failed(self):
+        """
+        将失败的任务重新放回队列并清零尝试次数
+
+        Returns:
+            int: 放回的任务数
+        """
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET state = 'pending', attempts = 0, error = NULL, updated_at = ? WHERE state = 'failed'",
+            (time.time(),)
+        ).rowcount)
+
+    def counts(self):
+        """
+        各状态的任务数，租约已过期的任务计入expired
+
+        Returns:
+            dict: {状态: 任务数}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CASE WHEN state = 'leased' AND lease_expires < ? THEN 'expired' ELSE state END, COUNT(*) "
+                "FROM jobs GROUP BY 1", (time.time(),)
+            ).fetchall()
+        counts = {"pending": 0, "leased": 0, "expired": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def workers(self):
+        """
+        各工作进程完成的任务数
+
+        Returns:
+            list: [(工作进程, 完成数, 最后完成时间)]
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT worker, COUNT(*), MAX(finished_at) FROM results GROUP BY worker ORDER BY worker"
+            ).fetchall()
+
+    def failures(self):
+        """
+        Returns:
+            list: [(名称, 尝试次数, 错误信息)]
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT name, attempts, error FROM jobs WHERE state = 'failed' ORDER BY job_id"
+            ).fetchall()
+
+    def load_results(self):
+        """
+        按任务登记顺序读取所有结果
+
+        Returns:
+            dict: {结果名称: 分析结果}，与batch_test的返回值格式一致
+        """
+        return dict(self.iter_results())
+
+    def iter_results(self, page_size=1000):
+        """
+        按任务登记顺序分页读取结果
+
+        Yields:
+            tuple: (结果名称, 分析结果)
+        """
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT job_id, name, summary FROM results WHERE job_id > ? ORDER BY job_id LIMIT ?",
+                    (last, page_size)
+                ).fetchall()
+            for _, name, summary in rows:
+                yield name, json.loads(summary)
+            if len(rows) < page_size:
+                return
+            last = rows[-1][0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class QueuedJob(Job):
+    """
+    队列中的任务，名称和附加字段在登记时确定
+    """
+
+    __slots__ = ("_name", "_tags")
+
+    def __init__(self, job_id, audio, text, test_type, name, tags):
+        super(QueuedJob, self).__init__(job_id, audio, text, test_type, tags.get("speaker"), tags.get("row"))
+        self._name = name
+        self._tags = tags
+
+    @property
+    def name(self):
+        return self._name
+
+    def tags(self):
+        return dict(self._tags)
+
+class QueueResultSink(object):
+    """
+    供batch_test.evaluate_file使用的结果写入对象，接口与ResultsStore.append一致，
+    结果按任务ID提交到队列
+
+    Args:
+        queue (WorkQueue): 任务队列
+        owner (str): 工作进程标识
+    """
+
+    def __init__(self, queue, owner):
+        self.queue = queue
+        self.owner = owner
+        self.path = queue.path
+        self._leases = {}
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def hold(self, lease):
+        with self._lock:
+            self._leases[lease.job.index] = lease
+
+    def drop(self, lease):
+        with self._lock:
+            self._leases.pop(lease.job.index, None)
+
+    def held(self):
+        with self._lock:
+            return list(self._leases.values())
+
+    def append(self, run_id, seq, file_name, analyzed, xml=None, audio_path=None, test_type=None, text=None):
+        with self._lock:
+            lease = self._leases[seq]
+        if not self.queue.complete(lease, self.owner, analyzed, xml):
+            self.duplicates += 1
+            print(f"任务 {file_name} 已由其他工作进程完成，本次结果不重复记录")
+
+def run_worker(queue, workers=1, rps=1.0, ise_kwargs=None, cache=None, pool=None, metrics_path=None,
+               wait=True):
+    """
+    从队列领取任务并评测，直到队列中没有未完成的任务
+
+    Args:
+        queue (WorkQueue): 任务队列
+        workers (int): 本进程同时进行的评测会话数
+        rps (float): 本进程每秒最多发起的评测请求数，<= 0 表示不限速
+        ise_kwargs (dict): 传给IseTest的额外参数
+        cache (ResultCache): 评测结果缓存
+        pool (CredentialPool): 凭证池
+        metrics_path (str): 会话耗时明细路径
+        wait (bool): 其他进程持有租约的任务未完成时是否继续等待(以便接管过期的租约)
+
+    Returns:
+        dict: 本进程的统计 {completed, failed, duplicates}
+    """
+    from batch_test import evaluate_file
+    from credential_pool import PoolExhausted
+    from ise_metrics import MetricsCollector
+    from rate_limit import RateLimiter
+
+    owner = worker_id()
+    sink = QueueResultSink(queue, owner)
+    limiter = RateLimiter(rps)
+    metrics = MetricsCollector(metrics_path)
+    in_flight = threading.BoundedSemaphore(max(1, workers))
+    ise_kwargs = dict(ise_kwargs or {})
+    if cache is not None:
+        ise_kwargs["cache"] = cache
+    stats = {"completed": 0, "failed": 0}
+    stats_lock = threading.Lock()
+    stop = threading.Event()
+
+    def heartbeat():
+        # 每隔租约时长的三分之一续约一次
+        while not stop.wait(queue.lease_seconds / 3.0):
+            queue.renew(sink.held())
+
+    def run_one(lease):
+        job = lease.job
+        try:
+            outcome = evaluate_file(job.audio, job.test_type, job.text, None, job.index, None,
+                                    ise_kwargs, limiter, sink, owner, metrics, job.name, job.tags(), pool)
+            if outcome is None:
+                state = queue.fail(lease, "未获取到评测结果")
+                print(f"任务 {job.name} 失败，{'放回队列' if state == 'pending' else '不再重试'}")
+            with stats_lock:
+                stats["completed" if outcome else "failed"] += 1
+        except PoolExhausted:
+            # 未评测的任务不计入尝试次数，配额恢复后重新领取
+            queue.release(lease)
+            stop.set()
+        except Exception as e:
+            queue.fail(lease, str(e))
+            with stats_lock:
+                stats["failed"] += 1
+        finally:
+            sink.drop(lease)
+            in_flight.release()
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    print(f"工作进程 {owner} 开始领取任务: {queue.path}")
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            while not stop.is_set():
+                in_flight.acquire()
+                leases = queue.lease(owner, 1)
+                if not leases:
+                    in_flight.release()
+                    counts = queue.counts()
+                    held = len(sink.held())
+                    if counts["pending"] + counts["expired"] == 0 and (
+                            not wait or counts["leased"] == held):
+                        break
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                sink.hold(leases[0])
+                executor.submit(run_one, leases[0])
+    finally:
+        stop.set()
+        metrics.close()
+
+    stats["duplicates"] = sink.duplicates
+    metrics.print_summary()
+    if pool is not None:
+        pool.print_summary()
+    print(f"\n工作进程 {owner} 结束: 完成 {stats['completed']}，失败 {stats['failed']}，"
+          f"重复提交 {stats['duplicates']}")
+    return stats
+
+def merge_results(queue, output_dir, export=True):
+    """
+    合并队列中的所有结果，生成all_results.json和对比报告；结果逐页读取，
+    all_results.json和报告都逐条写出，不把所有结果载入内存
+
+    Returns:
+        int: 合并的结果数
+    """
+    from report_writer import ReportWriter
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    counts = queue.counts()
+    unfinished = counts["pending"] + counts["leased"] + counts["expired"]
+    if unfinished:
+        print(f"警告: 还有 {unfinished} 个任务未完成，只合并已完成的结果")
+    report = ReportWriter(output_dir) if export else None
+    json_path = os.path.join(output_dir, "all_results.json")
+    merged = 0
+    with open(json_path, "w", encoding="utf-8") as f:
+        # 与json.dump(results, indent=2)的输出一致
+        f.write("{")
+        for name, analyzed in queue.iter_results():
+            f.write(",\n  " if merged else "\n  ")
+            f.write(json.dumps(name, ensure_ascii=False) + ": "
+                    + json.dumps(analyzed, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            if report is not None:
+                report.add(name, analyzed)
+            merged += 1
+        f.write("\n}" if merged else "}")
+    print(f"已合并 {merged} 个结果: {json_path}")
+    if report is not None:
+        report.finish()
+    return merged
+
+def print_status(queue):
+    counts = queue.counts()
+    total = sum(counts.values())
+    print(f"任务总数: {total}")
+    print(", ".join(f"{state} {count}" for state, count in counts.items()))
+    for owner, count, finished_at in queue.workers():
+        finished = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(finished_at))
+        print(f"  {owner}: 完成 {count}，最后完成于 {finished}")
+    for name, attempts, error in queue.failures():
+        print(f"  失败: {name} (尝试 {attempts} 次): {error}")
+
+def main(argv=None):
+    """
+    主函数
+
+    Args:
+        argv (list): 命令行参数，None时使用sys.argv
+    """
+    from test_ise import CATEGORY_TYPES
+    from pacing import PACING_MODES, DEFAULT_FRAME_SIZE, DEFAULT_FRAME_INTERVAL
+
+    parser = argparse.ArgumentParser(description="分布式批量评测任务队列")
+    parser.add_argument("--db", type=str, required=True, help="队列数据库路径(多台机器使用时放在共享文件系统上)")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS, help="任务租约时长(秒)")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="一个任务最多尝试的次数")
+    subparsers = parser.add_subparsers(dest="command", help="命令")
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="登记任务")
+    source = enqueue_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", type=str, help="音频文件目录")
+    source.add_argument("--manifest", type=str, help="任务清单(CSV或JSONL)")
+    enqueue_parser.add_argument("--type", type=str, default="en_sentence", choices=CATEGORY_TYPES.keys(),
+                                help="测评类型(清单模式下为行中缺省时的类型)")
+    enqueue_parser.add_argument("--text", type=str, default="nice to meet you.",
+                                help="测评文本(清单模式下为行中缺省时的文本)")
+
+    worker_parser = subparsers.add_parser("worker", help="领取任务并评测")
+    worker_parser.add_argument("--workers", type=int, help="本进程同时进行的评测会话数(默认为1，使用凭证池时为并发上限之和)")
+    worker_parser.add_argument("--rps", type=float, default=1.0, help="本进程每秒最多发起的评测请求数(<=0不限速)")
+    worker_parser.add_argument("--host-url", type=str, help="评测服务地址(可指向本地模拟服务)")
+    worker_parser.add_argument("--pacing", type=str, default="fixed", choices=PACING_MODES, help="音频帧发送节奏")
+    worker_parser.add_argument("--frame-size", type=int, default=DEFAULT_FRAME_SIZE, help="每帧音频字节数")
+    worker_parser.add_argument("--frame-interval", type=float, default=DEFAULT_FRAME_INTERVAL,
+                               help="fixed模式下每帧发送间隔(秒)")
+    worker_parser.add_argument("--cache", type=str, help="结果缓存数据库路径")
+    worker_parser.add_argument("--pcm-cache", type=str, help="解码PCM缓存目录(各台机器可使用本地目录)")
+    worker_parser.add_argument("--credentials", type=str, help="凭证池配置(JSON)")
+    worker_parser.add_argument("--quota-db", type=str, help="凭证每日配额计数数据库")
+    worker_parser.add_argument("--metrics", type=str, help="会话耗时明细路径(JSON Lines)")
+    worker_parser.add_argument("--no-wait", action="store_true",
+                               help="只剩其他进程正在处理的任务时直接退出，不等待接管过期的租约")
+
+    subparsers.add_parser("status", help="查看任务进度")
+    subparsers.add_parser("requeue", help="将失败的任务重新放回队列")
+
+    merge_parser = subparsers.add_parser("merge", help="合并结果并生成对比报告")
+    merge_parser.add_argument("--output", type=str, required=True, help="输出目录")
+    merge_parser.add_argument("--no-export", action="store_true", help="只生成all_results.json")
+
+    args = parser.parse_args(argv)
+
+    queue = WorkQueue(args.db, args.lease, args.max_attempts)
+    try:
+        if args.command == "enqueue":
+            if args.dir:
+                jobs = directory_jobs(args.dir, args.type, args.text)
+            else:
+                jobs = iter_manifest(args.manifest, args.type, args.text, CATEGORY_TYPES)
+            added = queue.enqueue(jobs)
+            print(f"新登记 {added} 个任务")
+            print_status(queue)
+        elif args.command == "worker":
+            from credential_pool import CredentialPool
+            from result_cache import ResultCache
+
+            pool = CredentialPool.from_file(args.credentials, args.quota_db) if args.credentials else None
+            cache = ResultCache(args.cache) if args.cache else None
+            workers = args.workers or (pool.capacity if pool is not None else 1)
+            ise_kwargs = {
+                "host_url": args.host_url,
+                "pacing": args.pacing,
+                "frame_size": args.frame_size,
+                "frame_interval": args.frame_interval,
+            }
+            pcm_cache = None
+            if args.pcm_cache:
+                from pcm_cache import PcmCache
+
+                pcm_cache = PcmCache(args.pcm_cache)
+                ise_kwargs["pcm_cache"] = pcm_cache
+            run_worker(queue, workers, args.rps, ise_kwargs, cache, pool, args.metrics, not args.no_wait)
+            if cache is not None:
+                cache.close()
+            if pcm_cache is not None:
+                pcm_cache.print_stats()
+                pcm_cache.close()
+            if pool is not None:
+                pool.close()
+        elif args.command == "status":
+            print_status(queue)
+        elif args.command == "requeue":
+            print(f"放回 {queue.requeue_failed()} 个失败的任务")
+        elif args.command == "merge":
+            merge_results(queue, args.output, not args.no_export)
+        else:
+            parser.print_help()
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()